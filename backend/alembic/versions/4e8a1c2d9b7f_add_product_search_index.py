@@ -0,0 +1,97 @@
+"""add product search vector and trigram indexes"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "4e8a1c2d9b7f"
+down_revision = "1b5d2a4e1f3c"
+branch_labels = None
+depends_on = None
+
+
+SEARCH_TRIGGERS = """
+CREATE OR REPLACE FUNCTION products_search_vector_refresh() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.product_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT category_name FROM product_category
+             WHERE id = NEW.product_category_id), '')), 'B') ||
+        setweight(to_tsvector('english',
+            coalesce(NEW.short_description, '') || ' ' ||
+            coalesce(NEW.long_description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_search_vector ON products;
+CREATE TRIGGER products_search_vector
+    BEFORE INSERT OR UPDATE OF
+        product_name, short_description, long_description, product_category_id
+    ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector_refresh();
+
+CREATE OR REPLACE FUNCTION product_category_search_vector_refresh() RETURNS trigger AS $$
+BEGIN
+    UPDATE products SET product_category_id = product_category_id
+    WHERE product_category_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_category_search_vector ON product_category;
+CREATE TRIGGER product_category_search_vector
+    AFTER UPDATE OF category_name ON product_category
+    FOR EACH ROW EXECUTE FUNCTION product_category_search_vector_refresh();
+"""
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "products", sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True)
+    )
+    op.execute(SEARCH_TRIGGERS)
+    # Fire the trigger once for existing rows
+    op.execute("UPDATE products SET product_category_id = product_category_id")
+    op.create_index(
+        "ix_products_search_vector",
+        "products",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+    op.create_index(
+        "ix_products_product_name_trgm",
+        "products",
+        ["product_name"],
+        postgresql_using="gin",
+        postgresql_ops={"product_name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_product_category_category_name_trgm",
+        "product_category",
+        ["category_name"],
+        postgresql_using="gin",
+        postgresql_ops={"category_name": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    # Absent when the schema was created from the models rather than migrated
+    op.drop_index(
+        "ix_product_category_category_name_trgm",
+        table_name="product_category",
+        if_exists=True,
+    )
+    op.drop_index(
+        "ix_products_product_name_trgm", table_name="products", if_exists=True
+    )
+    op.drop_index("ix_products_search_vector", table_name="products")
+    op.execute("DROP TRIGGER IF EXISTS product_category_search_vector ON product_category")
+    op.execute("DROP TRIGGER IF EXISTS products_search_vector ON products")
+    op.execute("DROP FUNCTION IF EXISTS product_category_search_vector_refresh()")
+    op.execute("DROP FUNCTION IF EXISTS products_search_vector_refresh()")
+    op.drop_column("products", "search_vector")
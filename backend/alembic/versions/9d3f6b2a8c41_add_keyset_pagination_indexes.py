@@ -0,0 +1,36 @@
+"""add composite indexes for keyset pagination"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "9d3f6b2a8c41"
+down_revision = "4e8a1c2d9b7f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_products_created_timestamp_id", "products", ["created_timestamp", "id"]
+    )
+    op.create_index(
+        "ix_products_vendor_id_created_timestamp_id",
+        "products",
+        ["vendor_id", "created_timestamp", "id"],
+    )
+    op.create_index("ix_products_price_id", "products", ["price", "id"])
+    op.create_index("ix_orders_customer_id_id", "orders", ["customer_id", "id"])
+    op.create_index(
+        "ix_order_items_vendor_id_created_timestamp_id",
+        "order_items",
+        ["vendor_id", "created_timestamp", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_order_items_vendor_id_created_timestamp_id", table_name="order_items")
+    op.drop_index("ix_orders_customer_id_id", table_name="orders")
+    op.drop_index("ix_products_price_id", table_name="products")
+    op.drop_index("ix_products_vendor_id_created_timestamp_id", table_name="products")
+    op.drop_index("ix_products_created_timestamp_id", table_name="products")
@@ -0,0 +1,62 @@
+"""add rating summaries to products and vendors"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a3d9e1f7c2b4"
+down_revision = "f2c7e9a4b5d8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ("products", "vendors"):
+        op.add_column(
+            table,
+            sa.Column("rating_avg", sa.Float(), server_default="0", nullable=False),
+        )
+        op.add_column(
+            table,
+            sa.Column("rating_count", sa.Integer(), server_default="0", nullable=False),
+        )
+    op.create_index(
+        "ix_product_reviews_product_id_created_timestamp_id",
+        "product_reviews",
+        ["product_id", "created_timestamp", "id"],
+    )
+    op.execute(
+        """
+        UPDATE products SET rating_avg = r.rating_avg, rating_count = r.rating_count
+        FROM (
+            SELECT product_id, avg(rating) AS rating_avg, count(*) AS rating_count
+            FROM product_reviews GROUP BY product_id
+        ) AS r
+        WHERE r.product_id = products.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE vendors SET
+            rating_avg = p.rating_total / p.rating_count,
+            rating_count = p.rating_count
+        FROM (
+            SELECT vendor_id,
+                   sum(rating_avg * rating_count) AS rating_total,
+                   sum(rating_count) AS rating_count
+            FROM products GROUP BY vendor_id HAVING sum(rating_count) > 0
+        ) AS p
+        WHERE p.vendor_id = vendors.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_product_reviews_product_id_created_timestamp_id",
+        table_name="product_reviews",
+    )
+    for table in ("vendors", "products"):
+        op.drop_column(table, "rating_count")
+        op.drop_column(table, "rating_avg")
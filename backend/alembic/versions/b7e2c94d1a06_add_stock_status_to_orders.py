@@ -0,0 +1,21 @@
+"""add stock_status to orders"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b7e2c94d1a06"
+down_revision = "9d3f6b2a8c41"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("orders", sa.Column("stock_status", sa.String(), nullable=True))
+    # Orders placed before this change already had their stock decremented
+    op.execute("UPDATE orders SET stock_status = 'reserved'")
+
+
+def downgrade() -> None:
+    op.drop_column("orders", "stock_status")
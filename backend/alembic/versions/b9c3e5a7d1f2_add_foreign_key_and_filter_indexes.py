@@ -0,0 +1,66 @@
+"""add indexes for foreign keys and CRUD filter columns
+
+Query inventory (CRUD method -> index serving it):
+    CRUDCart.get_cart_items_by_customer_id,
+    CRUDCart.get_by_product_id_and_customer_id,
+    CRUDCart.clear_cart / update_cart_by_customer_id  -> ix_cart_customer_id_product_id
+    cart.product_id (FK, product deletes)              -> ix_cart_product_id
+    CRUDProduct.get_all_products_public                -> ix_products_active_created_timestamp_id
+    products.product_category_id (FK, category rename) -> ix_products_product_category_id
+    ProductReturn image loads                          -> ix_product_image_product_id
+    CRUDProductTemplate.get_templates_by_vendor        -> ix_product_templates_vendor_id_created_timestamp
+    OrderReturn shipping loads                         -> ix_shipping_details_order_id
+    order_items.product_id (FK, product deletes)       -> ix_order_items_product_id
+    CRUDOtp.get_by_auth_id / check_number_of_trials    -> ix_otp_auth_id_id
+    CRUDRefreshToken.check_if_refresh_token_exist      -> ix_refresh_tokens_refresh_token
+    CRUDVendor / CRUDCustomer.get_by_auth_id           -> ix_vendors_auth_id, ix_customers_auth_id
+
+Already covered by earlier revisions: order_items.order_id and .vendor_id,
+orders.customer_id, product_reviews.product_id, payment_details.order_id.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b9c3e5a7d1f2"
+down_revision = "a3d9e1f7c2b4"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_cart_customer_id_product_id", "cart", ["customer_id", "product_id"]),
+    ("ix_cart_product_id", "cart", ["product_id"]),
+    ("ix_products_product_category_id", "products", ["product_category_id"]),
+    ("ix_product_image_product_id", "product_image", ["product_id"]),
+    (
+        "ix_product_templates_vendor_id_created_timestamp",
+        "product_templates",
+        ["vendor_id", "created_timestamp"],
+    ),
+    ("ix_shipping_details_order_id", "shipping_details", ["order_id"]),
+    ("ix_order_items_product_id", "order_items", ["product_id"]),
+    ("ix_otp_auth_id_id", "otp", ["auth_id", "id"]),
+    ("ix_refresh_tokens_refresh_token", "refresh_tokens", ["refresh_token"]),
+    ("ix_vendors_auth_id", "vendors", ["auth_id"]),
+    ("ix_customers_auth_id", "customers", ["auth_id"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+    op.create_index(
+        "ix_products_active_created_timestamp_id",
+        "products",
+        ["created_timestamp", "id"],
+        postgresql_where=sa.text("product_status"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_active_created_timestamp_id", table_name="products")
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,26 @@
+"""add partial index on pending payments for the reconciliation job"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c4e8a2f6b1d3"
+down_revision = "b9c3e5a7d1f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_payment_details_pending_created_timestamp",
+        "payment_details",
+        ["created_timestamp"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_payment_details_pending_created_timestamp", table_name="payment_details"
+    )
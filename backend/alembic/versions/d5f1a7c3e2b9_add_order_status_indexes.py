@@ -0,0 +1,28 @@
+"""add partial index on processing orders and order_items(order_id, status)"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d5f1a7c3e2b9"
+down_revision = "b7e2c94d1a06"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_orders_status_processing",
+        "orders",
+        ["status"],
+        postgresql_where=sa.text("status = 'processing'"),
+    )
+    op.create_index(
+        "ix_order_items_order_id_status", "order_items", ["order_id", "status"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_order_items_order_id_status", table_name="order_items")
+    op.drop_index("ix_orders_status_processing", table_name="orders")
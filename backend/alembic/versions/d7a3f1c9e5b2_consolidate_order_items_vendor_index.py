@@ -0,0 +1,53 @@
+"""fold the sales covering index into the vendor keyset index on order_items
+
+ix_order_items_vendor_id_created_timestamp_sales repeated the leading keys of
+ix_order_items_vendor_id_created_timestamp_id; the latter now carries its
+INCLUDE columns instead. ix_payment_details_order_id_status duplicated the
+unique index on payment_details.order_id.
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "d7a3f1c9e5b2"
+down_revision = "c4e8a2f6b1d3"
+branch_labels = None
+depends_on = None
+
+SALES_COLUMNS = ["order_id", "product_id", "price", "quantity", "status"]
+
+
+def upgrade() -> None:
+    op.drop_index("ix_payment_details_order_id_status", table_name="payment_details")
+    op.drop_index(
+        "ix_order_items_vendor_id_created_timestamp_sales", table_name="order_items"
+    )
+    op.drop_index("ix_order_items_vendor_id_created_timestamp_id", table_name="order_items")
+    op.create_index(
+        "ix_order_items_vendor_id_created_timestamp_id",
+        "order_items",
+        ["vendor_id", "created_timestamp", "id"],
+        postgresql_include=SALES_COLUMNS,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_order_items_vendor_id_created_timestamp_id", table_name="order_items")
+    op.create_index(
+        "ix_order_items_vendor_id_created_timestamp_id",
+        "order_items",
+        ["vendor_id", "created_timestamp", "id"],
+    )
+    op.create_index(
+        "ix_order_items_vendor_id_created_timestamp_sales",
+        "order_items",
+        ["vendor_id", "created_timestamp"],
+        postgresql_include=SALES_COLUMNS,
+    )
+    op.create_index(
+        "ix_payment_details_order_id_status",
+        "payment_details",
+        ["order_id"],
+        postgresql_include=["status"],
+    )
@@ -0,0 +1,24 @@
+"""drop ix_products_created_timestamp_id in favor of the active-only index
+
+The catalog only lists active products, which
+ix_products_active_created_timestamp_id covers on its own.
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e1b6c8d4a9f7"
+down_revision = "d7a3f1c9e5b2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_products_created_timestamp_id", table_name="products")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_products_created_timestamp_id", "products", ["created_timestamp", "id"]
+    )
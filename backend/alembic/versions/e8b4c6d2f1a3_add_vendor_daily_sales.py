@@ -0,0 +1,54 @@
+"""add vendor_daily_sales rollup and backfill it from order_items"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e8b4c6d2f1a3"
+down_revision = "d5f1a7c3e2b9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "vendor_daily_sales",
+        sa.Column("vendor_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("total_sales", sa.BigInteger(), nullable=False),
+        sa.Column("total_orders", sa.Integer(), nullable=False),
+        sa.Column("paid_sales", sa.BigInteger(), nullable=False),
+        sa.Column("paid_orders", sa.Integer(), nullable=False),
+        sa.Column(
+            "updated_timestamp",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+        ),
+        sa.ForeignKeyConstraint(
+            ["vendor_id"], ["vendors.id"], ondelete="CASCADE", onupdate="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("vendor_id", "day"),
+    )
+    op.execute(
+        """
+        INSERT INTO vendor_daily_sales
+            (vendor_id, day, total_sales, total_orders, paid_sales, paid_orders)
+        SELECT
+            order_items.vendor_id,
+            CAST(timezone('UTC', order_items.created_timestamp) AS DATE),
+            COALESCE(SUM(order_items.price * order_items.quantity), 0),
+            COUNT(order_items.id),
+            COALESCE(SUM(order_items.price * order_items.quantity)
+                FILTER (WHERE payment_details.status = 'success'), 0),
+            COUNT(order_items.id) FILTER (WHERE payment_details.status = 'success')
+        FROM order_items
+        LEFT JOIN payment_details ON payment_details.order_id = order_items.order_id
+        WHERE order_items.status != 'refunded'
+        GROUP BY 1, 2
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("vendor_daily_sales")
@@ -0,0 +1,32 @@
+"""add covering indexes for vendor sales analytics"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "f2c7e9a4b5d8"
+down_revision = "e8b4c6d2f1a3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_order_items_vendor_id_created_timestamp_sales",
+        "order_items",
+        ["vendor_id", "created_timestamp"],
+        postgresql_include=["order_id", "product_id", "price", "quantity", "status"],
+    )
+    op.create_index(
+        "ix_payment_details_order_id_status",
+        "payment_details",
+        ["order_id"],
+        postgresql_include=["status"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payment_details_order_id_status", table_name="payment_details")
+    op.drop_index(
+        "ix_order_items_vendor_id_created_timestamp_sales", table_name="order_items"
+    )
@@ -1,7 +1,13 @@
+from typing import Optional
+
 from fastapi import Depends
 
-from core.paystack import get_paystack
-from core.stripe_payment import get_stripe
+from core import settings
+from core.cache import AnalyticsCache, CatalogCache
+from core.cart_store import CartStore
+from core.idempotency import IdempotencyStore
+from core.payments import get_payment_providers
+from core.tokens import get_principal_cache, get_token_revocation_list
 from crud import (
     get_crud_auth_user,
     get_crud_refresh_token,
@@ -29,6 +35,30 @@ from services import (
 from task_queue.main import get_queue_connection
 
 
+def get_catalog_cache(queue_connection=Depends(get_queue_connection)) -> CatalogCache:
+    return CatalogCache(queue_connection)
+
+
+def get_analytics_cache(
+    queue_connection=Depends(get_queue_connection),
+) -> AnalyticsCache:
+    return AnalyticsCache(queue_connection)
+
+
+def get_idempotency_store(
+    queue_connection=Depends(get_queue_connection),
+) -> IdempotencyStore:
+    return IdempotencyStore(queue_connection)
+
+
+def get_cart_store(
+    queue_connection=Depends(get_queue_connection),
+) -> Optional[CartStore]:
+    if settings.CART_STORAGE == "redis":
+        return CartStore(queue_connection)
+    return None
+
+
 def get_auth_user_service(
     crud_auth_user=Depends(get_crud_auth_user),
     crud_refresh_token=Depends(get_crud_refresh_token),
@@ -36,6 +66,8 @@ def get_auth_user_service(
     queue_connection=Depends(get_queue_connection),
     crud_customer=Depends(get_crud_customer),
     crud_vendor=Depends(get_crud_vendor),
+    revocation_list=Depends(get_token_revocation_list),
+    principal_cache=Depends(get_principal_cache),
 ) -> AuthUserService:
     return AuthUserService(
         crud_auth_user=crud_auth_user,
@@ -44,6 +76,8 @@ def get_auth_user_service(
         queue_connection=queue_connection,
         crud_customer=crud_customer,
         crud_vendor=crud_vendor,
+        revocation_list=revocation_list,
+        principal_cache=principal_cache,
     )
 
 
@@ -83,10 +117,12 @@ def get_product_service(
     crud_product_image=Depends(get_crud_product_image),
     crud_product_review=Depends(get_crud_product_review),
     crud_product_template=Depends(get_crud_product_template),
+    catalog_cache=Depends(get_catalog_cache),
 ) -> ProductService:
     return ProductService(
         crud_auth_user=crud_auth_user,
         queue_connection=queue_connection,
+        catalog_cache=catalog_cache,
         crud_product_category=crud_product_category,
         crud_product=crud_product,
         crud_product_image=crud_product_image,
@@ -105,8 +141,8 @@ def get_cart_service(
     crud_payment=Depends(get_crud_payment_details),
     crud_order_item=Depends(get_crud_order_item),
     crud_vendor=Depends(get_crud_vendor),
-    paystack=Depends(get_paystack),
-    stripe=Depends(get_stripe)
+    payment_providers=Depends(get_payment_providers),
+    cart_store=Depends(get_cart_store),
 ) -> CartService:
     return CartService(
         crud_auth_user=crud_auth_user,
@@ -118,8 +154,8 @@ def get_cart_service(
         crud_payment=crud_payment,
         crud_order_item=crud_order_item,
         crud_vendor=crud_vendor,
-        paystack=paystack,
-        stripe=stripe,
+        payment_providers=payment_providers,
+        cart_store=cart_store,
     )
 
 
@@ -127,11 +163,13 @@ def get_order_service(
     crud_customer=Depends(get_crud_customer),
     crud_order=Depends(get_crud_order),
     crud_order_item=Depends(get_crud_order_item),
+    analytics_cache=Depends(get_analytics_cache),
 ) -> OrderService:
     return OrderService(
         crud_customer=crud_customer,
         crud_order=crud_order,
         crud_order_item=crud_order_item,
+        analytics_cache=analytics_cache,
     )
 
 
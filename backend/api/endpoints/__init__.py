@@ -9,6 +9,7 @@ from .order import router as order_router
 from .monitoring import router as monitoring_router
 from .template import router as template_router
 from .stripe import router as stripe_router
+from .webhooks import router as webhooks_router
 
 
 router = APIRouter()
@@ -23,3 +24,4 @@ router.include_router(cart_router)
 router.include_router(monitoring_router)
 router.include_router(template_router)
 router.include_router(stripe_router)
+router.include_router(webhooks_router)
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, BackgroundTasks, Header, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
 
+from core.revocation import TokenRevocationList
 from core.schema import Tokens
 from core.tokens import (
     deactivate_token,
     get_current_auth_user,
+    get_token_revocation_list,
     regenerate_tokens,
     get_current_unverified_auth_user,
 )
@@ -27,6 +29,7 @@ from schemas import (
     UsernameCheck,
     UsernameCheckResponse,
 )
+from crud import CRUDRefreshToken, get_crud_refresh_token
 from models import AuthUser
 from services import AuthUserService
 from api.dependencies.services import get_auth_user_service
@@ -76,8 +79,15 @@ async def login_user(
 async def logout_user(
     token: TokenDeactivate,
     current_user: AuthUser = Depends(get_current_auth_user),
+    crud_refresh_token: CRUDRefreshToken = Depends(get_crud_refresh_token),
+    revocation_list: TokenRevocationList = Depends(get_token_revocation_list),
 ):
-    await deactivate_token(token.access_token, auth_id=current_user.id)
+    await deactivate_token(
+        token.access_token,
+        auth_id=current_user.id,
+        crud_refresh_token=crud_refresh_token,
+        revocation_list=revocation_list,
+    )
     return LogoutResponse(logout=True)
 
 
@@ -116,6 +126,8 @@ async def refresh_access_token(
     token: RefreshTokenSchema,
     current_user: AuthUser = Depends(get_current_auth_user),
     user_agent: str = Header(None, description="Browser Info"),
+    crud_refresh_token: CRUDRefreshToken = Depends(get_crud_refresh_token),
+    revocation_list: TokenRevocationList = Depends(get_token_revocation_list),
 ):
     # TODO: Allow unverified users refresh token
     return await regenerate_tokens(
@@ -123,6 +135,9 @@ async def refresh_access_token(
         user_agent=user_agent,
         auth_id=current_user.id,
         default_role=current_user.default_role,
+        crud_refresh_token=crud_refresh_token,
+        revocation_list=revocation_list,
+        role_id=current_user.role_id,
     )
 
 
@@ -134,7 +149,6 @@ async def change_password(
 ):
     return await auth_user_service.change_password(
         data_obj=data_obj,
-        current_user_password=current_user.password,
         current_user_id=current_user.id,
     )
 
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, status
+from typing import Optional
 
-from api.dependencies.services import get_cart_service
+from fastapi import APIRouter, Depends, Header, status
+
+from api.dependencies.services import get_cart_service, get_idempotency_store
+from core.idempotency import IdempotencyStore
 from core.tokens import (
     get_current_verified_customer,
 )
@@ -11,6 +14,7 @@ from schemas import (
     CartUpdate,
     CartUpdateReturn,
     CartSummary,
+    CartSummaryLite,
     CheckoutCreate,
     PaymentVerified,
 )
@@ -72,14 +76,30 @@ async def get_cart_summary(
     return await cart_service.get_cart_summary(customer_id=current_user.role_id)
 
 
+@router.get("/summary/lite", response_model=CartSummaryLite)
+async def get_cart_summary_lite(
+    current_user: AuthUser = Depends(get_current_verified_customer),
+    cart_service: CartService = Depends(get_cart_service),
+):
+
+    return await cart_service.get_cart_summary_lite(customer_id=current_user.role_id)
+
+
 @router.post("/checkout")
 async def checkout(
     data_obj: CheckoutCreate,
     current_user: AuthUser = Depends(get_current_verified_customer),
     cart_service: CartService = Depends(get_cart_service),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
 
-    return await cart_service.checkout(data_obj, current_user)
+    return await idempotency.run(
+        f"checkout:{current_user.id}",
+        idempotency_key,
+        lambda: cart_service.checkout(data_obj, current_user),
+        request=data_obj,
+    )
 
 
 @router.get("/verify-payment/{payment_ref}", response_model=PaymentVerified)
@@ -87,5 +107,12 @@ async def verify_order_payment(
     payment_ref: str,
     current_user: AuthUser = Depends(get_current_verified_customer),
     cart_service: CartService = Depends(get_cart_service),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
-    return await cart_service.verify_order_payment(payment_ref=payment_ref)
+    return await idempotency.run(
+        f"verify-payment:{current_user.id}",
+        idempotency_key,
+        lambda: cart_service.verify_payment("paystack", payment_ref),
+        request=payment_ref,
+    )
@@ -1,7 +1,15 @@
-from fastapi import APIRouter
+import json
+from typing import List
+
+from arq import ArqRedis
+from fastapi import APIRouter, Depends, Query
 from starlette.responses import JSONResponse
 
-from schemas.base import HealthResponse
+from api.dependencies.services import get_catalog_cache
+from core.cache import CatalogCache
+from schemas.base import CacheStatsResponse, HealthResponse, ReconciliationRun
+from task_queue.cron_jobs.order import RECONCILIATION_RUNS_KEY
+from task_queue.main import get_queue_connection
 
 
 router = APIRouter(prefix="/monitoring")
@@ -10,3 +18,20 @@ router = APIRouter(prefix="/monitoring")
 @router.get("/health", response_model=HealthResponse)
 def check_system_health():
     return JSONResponse(content={"msg": "This is working perfectly"}, status_code=200)
+
+
+@router.get("/cache", response_model=CacheStatsResponse)
+async def catalog_cache_stats(
+    catalog_cache: CatalogCache = Depends(get_catalog_cache),
+):
+    return await catalog_cache.stats()
+
+
+@router.get("/reconciliation", response_model=List[ReconciliationRun])
+async def payment_reconciliation_runs(
+    limit: int = Query(20, ge=1, le=100),
+    queue_connection: ArqRedis = Depends(get_queue_connection),
+):
+    """Counts and phase durations of the latest payment reconciliation runs."""
+    runs = await queue_connection.lrange(RECONCILIATION_RUNS_KEY, 0, limit - 1)
+    return [json.loads(run) for run in runs]
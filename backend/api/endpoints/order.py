@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Response
 
 from api.dependencies.services import get_order_service
+from api.pagination import cursor_query, paginated
 from core.tokens import get_current_verified_vendor, get_current_verified_customer
 from models import AuthUser
 
 
-from schemas import TotalSalesReturn, OrderItemStatus, VendorOrderReturn
+from schemas import (
+    TotalSalesReturn,
+    OrderItemStatus,
+    SalesAnalyticsReturn,
+    VendorOrderReturn,
+)
+from schemas.base import GranularityEnum, SalesBreakdownEnum
 
 from services.order_service import OrderService
 
@@ -15,11 +25,17 @@ router = APIRouter(prefix="/order", tags=["Order"])
 
 @router.get("/")
 async def get_all_orders(
+    response: Response,
+    cursor: str | None = cursor_query,
+    limit: int = Query(default=20, ge=1, le=100),
     current_user: AuthUser = Depends(get_current_verified_customer),
     order_service: OrderService = Depends(get_order_service),
 ):
 
-    return await order_service.get_all_orders(customer_id=current_user.role_id)
+    page = await order_service.get_all_orders(
+        customer_id=current_user.role_id, cursor=cursor, limit=limit
+    )
+    return paginated(response, page)
 
 
 @router.get("/vendor/activity", response_model=TotalSalesReturn)
@@ -42,13 +58,37 @@ async def get_sales_activity_by_date(
     )
 
 
+@router.get("/vendor/analytics", response_model=SalesAnalyticsReturn)
+async def get_sales_analytics(
+    granularity: GranularityEnum = Query(default=GranularityEnum.DAY),
+    breakdown: Optional[SalesBreakdownEnum] = Query(default=None),
+    start: Optional[datetime] = Query(default=None),
+    end: Optional[datetime] = Query(default=None),
+    current_user: AuthUser = Depends(get_current_verified_vendor),
+    order_service: OrderService = Depends(get_order_service),
+):
+    return await order_service.get_sales_analytics(
+        vendor_id=current_user.role_id,
+        granularity=granularity,
+        breakdown=breakdown,
+        start=start,
+        end=end,
+    )
+
+
 @router.get("/vendor/", response_model=list[VendorOrderReturn])
 async def get_vendors_orders_items(
+    response: Response,
+    cursor: str | None = cursor_query,
+    limit: int = Query(default=50, ge=1, le=100),
     current_user: AuthUser = Depends(get_current_verified_vendor),
     order_service: OrderService = Depends(get_order_service),
 ):
 
-    return await order_service.get_vendors_order_items(vendor_id=current_user.role_id)
+    page = await order_service.get_vendors_order_items(
+        vendor_id=current_user.role_id, cursor=cursor, limit=limit
+    )
+    return paginated(response, page)
 
 
 @router.put(
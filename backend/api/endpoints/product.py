@@ -1,6 +1,7 @@
-from fastapi import Depends, APIRouter, Query, status, UploadFile, File
+from fastapi import Depends, APIRouter, Query, Response, status, UploadFile, File
 
 from api.dependencies.services import get_product_service
+from api.pagination import cursor_query, paginated
 from core.tokens import get_current_verified_customer, get_current_verified_vendor
 from models import AuthUser
 from schemas import (
@@ -42,45 +43,51 @@ async def create_product(
 
 @router.get("", response_model=list[ProductsReturn])
 async def get_products_customer(
+    response: Response,
     search: str = Query(
         default="", max_length=20, description="Search products with name or category"
     ),
-    skip: int = Query(default=0),
-    limit: int = Query(default=20),
+    cursor: str | None = cursor_query,
+    limit: int = Query(default=20, ge=1, le=100),
     product_service: ProductService = Depends(get_product_service),
 ):
 
-    return await product_service.get_products_customer(
-        search=search, skip=skip, limit=limit
+    page = await product_service.get_products_customer(
+        search=search, cursor=cursor, limit=limit
     )
+    return paginated(response, page)
 
 
 @router.get("/me", response_model=list[ProductReturn])
 async def get_products_vendor(
+    response: Response,
     search: str = Query(
         default="", max_length=20, description="Search products with name or category"
     ),
-    skip: int = Query(default=0),
-    limit: int = Query(default=10),
+    cursor: str | None = cursor_query,
+    limit: int = Query(default=10, ge=1, le=100),
     current_user: AuthUser = Depends(get_current_verified_vendor),
     product_service: ProductService = Depends(get_product_service),
 ):
 
-    return await product_service.get_products_vendor(
-        search=search, skip=skip, limit=limit, vendor_id=current_user.role_id
+    page = await product_service.get_products_vendor(
+        search=search, cursor=cursor, limit=limit, vendor_id=current_user.role_id
     )
+    return paginated(response, page)
 
 
 @router.get("/price", response_model=list[ProductReturn])
 async def sort_product_by_price(
-    skip: int = Query(default=0),
-    limit: int = Query(default=20),
+    response: Response,
+    cursor: str | None = cursor_query,
+    limit: int = Query(default=20, ge=1, le=100),
     product_service: ProductService = Depends(get_product_service),
 ):
-    return await product_service.sort_product_by_price(
-        skip=skip,
+    page = await product_service.sort_product_by_price(
+        cursor=cursor,
         limit=limit,
     )
+    return paginated(response, page)
 
 
 @router.get("/{id}", response_model=ProductsReturn)
@@ -91,6 +98,20 @@ async def get_one_product(
     return await product_service.get_one_product(product_id=id)
 
 
+@router.get("/{id}/reviews", response_model=list[ProductReviewReturn])
+async def get_product_reviews(
+    id: int,
+    response: Response,
+    cursor: str | None = cursor_query,
+    limit: int = Query(default=20, ge=1, le=100),
+    product_service: ProductService = Depends(get_product_service),
+):
+    page = await product_service.get_product_reviews(
+        product_id=id, cursor=cursor, limit=limit
+    )
+    return paginated(response, page)
+
+
 @router.put("/{id}", response_model=ProductUpdateReturn)
 async def update_product(
     id: int,
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+from core.idempotency import IdempotencyStore
 from services.cart_service import CartService
-from api.dependencies.services import get_cart_service
+from api.dependencies.services import get_cart_service, get_idempotency_store
 from schemas import PaymentVerified
 
 
@@ -11,6 +14,13 @@ router = APIRouter(prefix="/stripe", tags=["Stripe"])
 async def verify_stripe_payment(
     session_id: str,
     cart_service: CartService = Depends(get_cart_service),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     """Verify Stripe payment after checkout session completion"""
-    return await cart_service.verify_stripe_payment(session_id=session_id)
\ No newline at end of file
+    return await idempotency.run(
+        "stripe-verify",
+        idempotency_key,
+        lambda: cart_service.verify_payment("stripe", session_id),
+        request=session_id,
+    )
@@ -0,0 +1,31 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Request
+
+from api.dependencies.services import get_cart_service
+from services.cart_service import CartService
+
+
+router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
+
+
+@router.post("/paystack")
+async def paystack_webhook(
+    request: Request,
+    x_paystack_signature: Optional[str] = Header(None),
+    cart_service: CartService = Depends(get_cart_service),
+):
+    await cart_service.handle_webhook(
+        "paystack", await request.body(), x_paystack_signature
+    )
+    return {"received": True}
+
+
+@router.post("/stripe")
+async def stripe_webhook(
+    request: Request,
+    stripe_signature: Optional[str] = Header(None),
+    cart_service: CartService = Depends(get_cart_service),
+):
+    await cart_service.handle_webhook("stripe", await request.body(), stripe_signature)
+    return {"received": True}
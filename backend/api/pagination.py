@@ -0,0 +1,23 @@
+from typing import Any, List
+
+from fastapi import Query, Response
+
+from crud.base import Page
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+cursor_query = Query(
+    default=None,
+    description=f"Opaque cursor taken from the previous page's {NEXT_CURSOR_HEADER}",
+)
+
+
+def paginated(response: Response, page: Page) -> List[Any]:
+    """Return the page items, exposing the next cursor as a response header.
+
+    Listing bodies stay plain arrays so existing clients keep working; absent
+    header means this was the last page.
+    """
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return page.items
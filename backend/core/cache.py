@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+from typing import Any, Iterable, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core import settings
+from models.auth_user import AuthUser
+from schemas.auth import Principal
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogCache:
+    """Read-through cache for the public catalog, kept in the shared Redis pool.
+
+    Single products live under ``catalog:product:<id>``. Listing pages are keyed
+    by their query and tracked in a set so a catalog change drops all of them.
+    Redis errors are logged and treated as misses; the cache never fails a
+    request.
+    """
+
+    PREFIX = "catalog"
+    LIST_KEYS = f"{PREFIX}:lists"
+    LOOKUPS = f"{PREFIX}:stats:lookups"
+    MISSES = f"{PREFIX}:stats:misses"
+
+    def __init__(self, redis: Redis):
+        self._redis = redis
+
+    def product_key(self, product_id: int) -> str:
+        return f"{self.PREFIX}:product:{product_id}"
+
+    def snapshot_key(self, product_id: int) -> str:
+        return f"{self.PREFIX}:snapshot:{product_id}"
+
+    def stock_key(self, product_id: int) -> str:
+        return f"{self.PREFIX}:stock:{product_id}"
+
+    def list_key(self, **params) -> str:
+        digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{self.PREFIX}:list:{digest}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.get(key).incr(self.LOOKUPS)
+                cached, _ = await pipe.execute()
+            if cached is None:
+                # A miss is followed by a database query anyway
+                await self._redis.incr(self.MISSES)
+                return None
+        except RedisError as error:
+            logger.warning("Catalog cache read failed: %s", error)
+            return None
+        return json.loads(cached)
+
+    async def set(self, key: str, payload: str, ttl: int, listing: bool = False):
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.set(key, payload, ex=ttl)
+                if listing:
+                    pipe.sadd(self.LIST_KEYS, key)
+                await pipe.execute()
+        except RedisError as error:
+            logger.warning("Catalog cache write failed: %s", error)
+
+    async def invalidate(self, product_ids: Iterable[int] = ()):
+        """Drop the given products and every cached listing page."""
+        try:
+            list_keys = await self._redis.smembers(self.LIST_KEYS)
+            keys = [
+                key
+                for id in product_ids
+                for key in (self.product_key(id), self.snapshot_key(id), self.stock_key(id))
+            ]
+            await self._redis.delete(self.LIST_KEYS, *list_keys, *keys)
+        except RedisError as error:
+            logger.warning("Catalog cache invalidation failed: %s", error)
+
+    async def stats(self) -> dict:
+        lookups, misses = await self._redis.mget(self.LOOKUPS, self.MISSES)
+        lookups, misses = int(lookups or 0), int(misses or 0)
+        hits = max(lookups - misses, 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class AnalyticsCache:
+    """Vendor sales analytics responses, keyed by vendor and query.
+
+    Entries simply expire after ANALYTICS_CACHE_TTL; Redis errors are logged
+    and treated as misses.
+    """
+
+    PREFIX = "analytics"
+
+    def __init__(self, redis: Redis):
+        self._redis = redis
+
+    def key(self, vendor_id: int, **params) -> str:
+        digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{self.PREFIX}:{vendor_id}:{digest}"
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            cached = await self._redis.get(key)
+        except RedisError as error:
+            logger.warning("Analytics cache read failed: %s", error)
+            return None
+        return cached
+
+    async def set(self, key: str, payload: str):
+        try:
+            await self._redis.set(key, payload, ex=settings.ANALYTICS_CACHE_TTL)
+        except RedisError as error:
+            logger.warning("Analytics cache write failed: %s", error)
+
+
+class PrincipalCache:
+    """Authenticated users by id, in-process in front of Redis.
+
+    The password hash is never cached. Invalidation clears Redis and this
+    process; other processes drop their copy within PRINCIPAL_LOCAL_CACHE_TTL.
+    Users are returned as detached AuthUser instances.
+    """
+
+    PREFIX = "principal"
+    _local = TTLCache(settings.PRINCIPAL_LOCAL_CACHE_SIZE)
+
+    def __init__(self, redis: Redis):
+        self._redis = redis
+
+    def key(self, auth_id: int) -> str:
+        return f"{self.PREFIX}:{auth_id}"
+
+    async def get(self, auth_id: int) -> Optional[AuthUser]:
+        principal = self._local.get(auth_id)
+        if principal is None:
+            try:
+                cached = await self._redis.get(self.key(auth_id))
+            except RedisError as error:
+                logger.warning("Principal cache read failed: %s", error)
+                return None
+            if cached is None:
+                return None
+            principal = Principal.model_validate_json(cached)
+            self._local.set(auth_id, principal, settings.PRINCIPAL_LOCAL_CACHE_TTL)
+        return AuthUser(**principal.model_dump())
+
+    async def set(self, auth_user: AuthUser):
+        principal = Principal.model_validate(auth_user)
+        self._local.set(principal.id, principal, settings.PRINCIPAL_LOCAL_CACHE_TTL)
+        try:
+            await self._redis.set(
+                self.key(principal.id),
+                principal.model_dump_json(),
+                ex=settings.PRINCIPAL_CACHE_TTL,
+            )
+        except RedisError as error:
+            logger.warning("Principal cache write failed: %s", error)
+
+    async def invalidate(self, auth_id: int):
+        self._local.pop(auth_id)
+        try:
+            await self._redis.delete(self.key(auth_id))
+        except RedisError as error:
+            logger.warning("Principal cache invalidation failed: %s", error)
@@ -0,0 +1,127 @@
+import json
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from arq import ArqRedis
+
+from core import settings
+from core.cache import CatalogCache
+
+
+class CartStore:
+    """Customer carts kept in Redis, written behind to the cart table.
+
+    Each cart is a hash ``cart:<customer_id>`` mapping product ids to JSON lines
+    shaped like CartReturn (without the customer), the product being a snapshot
+    taken when the line was added. The ``loaded`` field marks a cart already
+    hydrated from Postgres, so empty carts are answered from Redis as well.
+    Every write schedules a ``persist_cart`` job for the current
+    CART_PERSIST_WINDOW, which copies the hash to Postgres.
+    """
+
+    PREFIX = "cart"
+    LOADED = b"loaded"
+    LINE_IDS = f"{PREFIX}:line_ids"
+
+    def __init__(self, redis: ArqRedis):
+        self._redis = redis
+        self.catalog = CatalogCache(redis)
+
+    def key(self, customer_id: int) -> str:
+        return f"{self.PREFIX}:{customer_id}"
+
+    async def lines(self, customer_id: int) -> Optional[List[dict]]:
+        """The cart's lines in the order they were added, None if not hydrated."""
+        cart = await self._redis.hgetall(self.key(customer_id))
+        if self.LOADED not in cart:
+            return None
+        lines = [json.loads(line) for field, line in cart.items() if field != self.LOADED]
+        return sorted(lines, key=lambda line: line["id"])
+
+    async def hydrate(self, customer_id: int, lines: List[dict]):
+        # HSETNX: never clobber a line written since the caller read Postgres
+        key = self.key(customer_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            for line in lines:
+                pipe.hsetnx(key, line["product_id"], json.dumps(line))
+            pipe.hset(key, self.LOADED, 1)
+            pipe.expire(key, settings.CART_TTL)
+            await pipe.execute()
+
+    async def add(self, customer_id: int, product: dict, quantity: int) -> Optional[dict]:
+        """Add a line for `product`; None if the cart already holds it."""
+        key = self.key(customer_id)
+        line = {
+            "id": await self._redis.incr(self.LINE_IDS),
+            "product_id": product["id"],
+            "customer_id": customer_id,
+            "quantity": quantity,
+            "product": product,
+            "created_timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hsetnx(key, product["id"], json.dumps(line))
+            pipe.expire(key, settings.CART_TTL)
+            added, _ = await pipe.execute()
+        if not added:
+            return None
+        await self._schedule_persist(customer_id)
+        return line
+
+    async def update(self, customer_id: int, line: dict):
+        line["updated_timestamp"] = datetime.now(timezone.utc).isoformat()
+        key = self.key(customer_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, line["product_id"], json.dumps(line))
+            pipe.expire(key, settings.CART_TTL)
+            await pipe.execute()
+        await self._schedule_persist(customer_id)
+
+    async def remove(self, customer_id: int, product_id: int):
+        await self._redis.hdel(self.key(customer_id), product_id)
+        await self._schedule_persist(customer_id)
+
+    async def clear(self, customer_id: int):
+        key = self.key(customer_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, self.LOADED, 1)
+            pipe.expire(key, settings.CART_TTL)
+            await pipe.execute()
+        await self._schedule_persist(customer_id)
+
+    async def product(self, product_id: int) -> Tuple[Optional[dict], Optional[int]]:
+        """The cached (ProductReturn snapshot, stock counter) of a product."""
+        snapshot, stock = await self._redis.mget(
+            self.catalog.snapshot_key(product_id), self.catalog.stock_key(product_id)
+        )
+        return (
+            json.loads(snapshot) if snapshot is not None else None,
+            int(stock) if stock is not None else None,
+        )
+
+    async def cache_product(self, product: dict, stock: int):
+        # Both keys are dropped by CatalogCache.invalidate on product and stock changes
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(
+                self.catalog.snapshot_key(product["id"]),
+                json.dumps(product),
+                ex=settings.CART_PRODUCT_TTL,
+            )
+            pipe.set(
+                self.catalog.stock_key(product["id"]), stock, ex=settings.CART_STOCK_TTL
+            )
+            await pipe.execute()
+
+    async def _schedule_persist(self, customer_id: int):
+        # One persist job per customer and window; a write made while that job
+        # runs falls in the next window and schedules the next job.
+        window = settings.CART_PERSIST_WINDOW
+        bucket = int(time.time() // window) + 1
+        await self._redis.enqueue_job(
+            "persist_cart",
+            customer_id,
+            _job_id=f"persist-cart:{customer_id}:{bucket}",
+            _defer_until=datetime.fromtimestamp(bucket * window, tz=timezone.utc),
+        )
@@ -10,6 +10,7 @@ env_path = path / ".env"
 class PaystackConfig(BaseSettings):
     BASE_URL: str = "https://api.paystack.co/"
     SECRET_KEY: str = ""
+    CURRENCY: str = "NGN"
     CALLBACK_URL: str = "https://127.0.0.0.1:8000/cart/checkout"
 
     class Config:
@@ -23,21 +24,71 @@ class Settings(BaseSettings):
     SQLALCHEMY_DATABASE_URL: str = ""
     DATABASE_URL: str = ""  # Railway uses this variable name
     TEST_SQLALCHEMY_DATABASE_URL: str = ""
+    # Connection pool tuning for the SQLAlchemy engine
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: int = 5  # Seconds a request waits for a free connection
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    CATALOG_CACHE_TTL: int = 300
+    CATALOG_LIST_CACHE_TTL: int = 60
+    # "redis" keeps carts in Redis (core/cart_store.py), written behind to Postgres
+    CART_STORAGE: str = "postgres"
+    CART_TTL: int = 30 * 24 * 3600
+    CART_PRODUCT_TTL: int = 300
+    CART_STOCK_TTL: int = 30  # Bounds how stale the stock checked on add/update gets
+    CART_PERSIST_WINDOW: int = 2  # Seconds of cart writes coalesced into one persist
+    ANALYTICS_CACHE_TTL: int = 300
+    ANALYTICS_MAX_BUCKETS: int = 1000
+    IDEMPOTENCY_TTL: int = 24 * 3600
+    IDEMPOTENCY_LOCK_TTL: int = 60  # Outlasts a checkout including the provider call
+    IDEMPOTENCY_WAIT: int = 10  # Seconds a duplicate waits for the first response
+    IDEMPOTENCY_POLL_INTERVAL: float = 0.1
+    # Outbound HTTP clients (Paystack, Postmark, notification service)
+    HTTP_TIMEOUT: float = 10.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP_RETRIES: int = 2
+    HTTP_RETRY_BACKOFF: float = 0.25
     JWT_SECRET_KEY: str = ""
     ALGORITHM: str = ""
     ACCESS_TOKEN_EXPIRY_TIME: int = 20
     REFRESH_TOKEN_EXPIRY_TIME: int = 30
     FORGET_PASSWORD_EXPIRY_TIME: int = 5
+    TOKEN_REVOCATION_CACHE_TTL: int = 5  # Seconds a "not revoked" verdict is trusted locally
+    TOKEN_REVOCATION_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 300
+    PRINCIPAL_LOCAL_CACHE_TTL: int = 10  # Bounds staleness across workers after an update
+    PRINCIPAL_LOCAL_CACHE_SIZE: int = 10000
     STRIPE_PUBLISHABLE_KEY: str = ""
     STRIPE_SECRET_KEY: str = ""
+    STRIPE_API_VERSION: str = "2024-06-20"
+    STRIPE_CURRENCY: str = "usd"
+    STRIPE_WEBHOOK_SECRET: str = ""
+    STRIPE_WEBHOOK_TOLERANCE: int = 300
+    # "fake" routes every online payment to core/fake_payment.py, for load tests
+    PAYMENT_PROVIDER: str = ""
+    FAKE_PAYMENT_LATENCY: float = 0.2  # Seconds per simulated provider call
+    FAKE_PAYMENT_FAILURE_RATE: float = 0.0
+    # Online payments still pending this long after checkout get reconciled
+    PAYMENT_RECONCILE_AFTER: int = 3600
+    PAYMENT_RECONCILE_BATCH_SIZE: int = 200
+    PAYMENT_RECONCILE_CONCURRENCY: int = 10  # Provider lookups in flight per run
     POSTMARK_SERVER_TOKEN: str = ""
     POSTMARK_FROM_EMAIL: str = ""
     # Notification Service Configuration
     NOTIFICATION_SERVICE_URL: str = "http://localhost:8001"  # Default to local mock service
     NOTIFICATION_SERVICE_API_KEY: str = ""  # API key for authentication (if needed)
     NOTIFICATION_SERVICE_ENABLED: bool = True  # Toggle to enable/disable notifications
+    NOTIFICATION_BATCH_WINDOW: int = 5  # Seconds order-confirm pushes are batched for
+    NOTIFICATION_MAX_TRIES: int = 5
     paystack_config: PaystackConfig = PaystackConfig()
 
     @property
@@ -51,6 +102,14 @@ class Settings(BaseSettings):
             url = url.replace("postgres://", "postgresql://", 1)
         return url
 
+    @property
+    def async_database_url(self) -> str:
+        """Database URL rewritten for the asyncpg driver used by the async engine."""
+        url = self.database_url
+        _, _, rest = url.partition("://")
+        # asyncpg takes `ssl` where libpq takes `sslmode`
+        return f"postgresql+asyncpg://{rest}".replace("sslmode=", "ssl=")
+
     class Config:
         env_path = env_path
         env_file_encoding = "utf-8"
@@ -22,11 +22,26 @@ class ResourcesExist(HTTPException):
         super().__init__(status_code=status.HTTP_409_CONFLICT, detail=message)
 
 
+class IdempotencyConflict(HTTPException):
+    def __init__(self, message="A request with this Idempotency-Key is in progress"):
+        super().__init__(status_code=status.HTTP_409_CONFLICT, detail=message)
+
+
+class ServiceUnavailable(HTTPException):
+    def __init__(self, message="Service temporarily unavailable, try again later"):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=message)
+
+
 class InvalidRequest(HTTPException):
     def __init__(self, message="Invalid Request"):
         super().__init__(status_code=status.HTTP_403_FORBIDDEN, detail=message)
 
 
+class InvalidCursor(HTTPException):
+    def __init__(self, message="Invalid pagination cursor"):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
+
+
 class CredentialException(HTTPException):
     def __init__(self, detail: str = "Invalid Credentials"):
         super().__init__(
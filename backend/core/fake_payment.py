@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+import random
+import secrets
+from datetime import datetime, timezone
+from typing import Optional
+
+from core import settings
+from core.errors import InvalidRequest, MissingResources
+from core.payment_provider import PaymentProvider
+from models import Customer, Order
+from schemas import ProviderPayment
+from schemas.base import PaymentMethodEnum, StatusEnum
+
+
+class FakePaymentProvider(PaymentProvider):
+    """In-process provider for load tests: no network, simulated latency and failures.
+
+    References are ``fake_<order_id>_<amount in cents>_<nonce>``, so any worker
+    can verify a payment another one initialized. Whether a reference fails is
+    derived from its hash, so repeated verifies of it agree.
+    """
+
+    currency = "NGN"
+
+    def __init__(
+        self,
+        latency: float = settings.FAKE_PAYMENT_LATENCY,
+        failure_rate: float = settings.FAKE_PAYMENT_FAILURE_RATE,
+    ):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    async def _delay(self):
+        if self.latency:
+            # Jitter so concurrent requests don't complete in lockstep
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+
+    def _fails(self, payment_ref: str) -> bool:
+        digest = hashlib.sha1(payment_ref.encode()).digest()
+        return int.from_bytes(digest[:4], "big") / 2**32 < self.failure_rate
+
+    async def initialize_payment(
+        self,
+        amount: float,
+        email: str,
+        order: Order,
+        customer: Customer,
+        payment_method: PaymentMethodEnum,
+    ) -> dict:
+        await self._delay()
+        reference = f"fake_{order.id}_{round(amount * 100)}_{secrets.token_hex(4)}"
+        return {
+            "reference": reference,
+            "session_id": reference,
+            "payment_ref": reference,
+            "url": f"fake://pay/{reference}",
+        }
+
+    async def verify_payment(self, payment_ref: str) -> ProviderPayment:
+        await self._delay()
+        try:
+            prefix, order_id, cents, _ = payment_ref.split("_")
+            if prefix != "fake":
+                raise ValueError
+            order_id, cents = int(order_id), int(cents)
+        except ValueError:
+            raise MissingResources(f"Unknown payment reference {payment_ref}")
+        return ProviderPayment(
+            status=StatusEnum.FAILED if self._fails(payment_ref) else StatusEnum.SUCCESS,
+            order_id=order_id,
+            payment_ref=payment_ref,
+            payment_method=PaymentMethodEnum.CARD,
+            amount=cents / 100,
+            currency=self.currency,
+            paid_at=datetime.now(timezone.utc),
+        )
+
+    def parse_webhook(
+        self, payload: bytes, signature: Optional[str]
+    ) -> Optional[ProviderPayment]:
+        # Load tests confirm through the verify endpoints
+        raise InvalidRequest("The fake payment provider sends no webhooks")
+
+
+fake_payment_provider = FakePaymentProvider()
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from typing import Callable, Dict
+
+import httpx
+
+from core import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """Retry with exponential backoff.
+
+    Connection failures are retried for any method, since nothing reached the
+    server. Overload/gateway statuses are only retried for idempotent methods,
+    or requests carrying an Idempotency-Key, so a payment initialisation is
+    never sent twice.
+    """
+
+    RETRY_STATUSES = {429, 502, 503, 504}
+    IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+    def __init__(
+        self, transport: httpx.AsyncBaseTransport, retries: int, backoff: float
+    ):
+        self._transport = transport
+        self._retries = retries
+        self._backoff = backoff
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = await self._transport.handle_async_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt >= self._retries:
+                    raise
+            else:
+                if (
+                    attempt >= self._retries
+                    or not self._is_idempotent(request)
+                    or response.status_code not in self.RETRY_STATUSES
+                ):
+                    return response
+                await response.aclose()
+            await asyncio.sleep(self._backoff * 2**attempt)
+            attempt += 1
+            logger.warning(
+                "Retrying %s %s (attempt %s)", request.method, request.url, attempt
+            )
+
+    def _is_idempotent(self, request: httpx.Request) -> bool:
+        return (
+            request.method in self.IDEMPOTENT_METHODS
+            or "Idempotency-Key" in request.headers
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def _paystack() -> dict:
+    return {
+        "base_url": settings.paystack_config.BASE_URL,
+        "headers": {"Authorization": f"Bearer {settings.paystack_config.SECRET_KEY}"},
+    }
+
+
+def _postmark() -> dict:
+    return {
+        "base_url": "https://api.postmarkapp.com",
+        "headers": {"X-Postmark-Server-Token": settings.POSTMARK_SERVER_TOKEN},
+    }
+
+
+def _stripe() -> dict:
+    return {
+        "base_url": "https://api.stripe.com/v1",
+        "headers": {
+            "Authorization": f"Bearer {settings.STRIPE_SECRET_KEY}",
+            "Stripe-Version": settings.STRIPE_API_VERSION,
+        },
+    }
+
+
+def _notifications() -> dict:
+    return {"base_url": settings.NOTIFICATION_SERVICE_URL.rstrip("/")}
+
+
+class HTTPClientRegistry:
+    """Long-lived outbound clients, one per integration (and so per host).
+
+    Clients are created on first use and reused afterwards, keeping TLS
+    sessions and HTTP/2 connections warm. The app lifespan and the arq worker
+    close them on shutdown.
+    """
+
+    CLIENTS: Dict[str, Callable[[], dict]] = {
+        "default": dict,
+        "paystack": _paystack,
+        "postmark": _postmark,
+        "stripe": _stripe,
+        "notifications": _notifications,
+    }
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, name: str = "default") -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(**self.CLIENTS[name]())
+        return client
+
+    @staticmethod
+    def _build(**kwargs) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        transport = RetryTransport(
+            httpx.AsyncHTTPTransport(http2=True, limits=limits),
+            retries=settings.HTTP_RETRIES,
+            backoff=settings.HTTP_RETRY_BACKOFF,
+        )
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(
+                settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT
+            ),
+            **kwargs,
+        )
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+http_clients = HTTPClientRegistry()
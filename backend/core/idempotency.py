@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import json
+import logging
+import secrets
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core import settings
+from core.errors import IdempotencyConflict
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyStore:
+    """Responses of non-idempotent requests, replayed for retries with the same key.
+
+    The first request with a key takes ``idempotency:<scope>:<key>:lock`` and,
+    once it succeeds, stores its JSON response under ``idempotency:<scope>:<key>``
+    for IDEMPOTENCY_TTL seconds. Duplicates arriving meanwhile wait up to
+    IDEMPOTENCY_WAIT seconds for that response. Failed requests are not stored,
+    so a retry after an error runs again; calls must undo what they committed
+    before failing, as checkout does with its order. Redis errors are logged
+    and the request runs without deduplication.
+    """
+
+    PREFIX = "idempotency"
+
+    def __init__(self, redis: Redis):
+        self._redis = redis
+
+    def key(self, scope: str, idempotency_key: str) -> str:
+        return f"{self.PREFIX}:{scope}:{idempotency_key}"
+
+    @staticmethod
+    def fingerprint(request: Any) -> str:
+        return hashlib.sha1(
+            json.dumps(jsonable_encoder(request), sort_keys=True).encode()
+        ).hexdigest()
+
+    async def run(
+        self,
+        scope: str,
+        idempotency_key: Optional[str],
+        call: Callable[[], Awaitable[Any]],
+        request: Any = None,
+    ) -> Any:
+        """Run `call` once per key; return its stored response to duplicates."""
+        if not idempotency_key:
+            return await call()
+
+        key = self.key(scope, idempotency_key)
+        fingerprint = self.fingerprint(request)
+        token = secrets.token_hex(8)
+        try:
+            stored = await self._acquire(key, token)
+        except RedisError as error:
+            logger.warning("Idempotency lookup failed for %s: %s", key, error)
+            return await call()
+        if stored is not None:
+            if stored["fingerprint"] != fingerprint:
+                raise IdempotencyConflict(
+                    "Idempotency-Key was already used for a different request"
+                )
+            return stored["response"]
+
+        try:
+            response = jsonable_encoder(await call())
+        except BaseException:
+            await self._release(key, token)
+            raise
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.set(
+                    key,
+                    json.dumps({"fingerprint": fingerprint, "response": response}),
+                    ex=settings.IDEMPOTENCY_TTL,
+                )
+                pipe.delete(f"{key}:lock")
+                await pipe.execute()
+        except RedisError as error:
+            logger.warning("Idempotency store failed for %s: %s", key, error)
+        return response
+
+    async def _acquire(self, key: str, token: str) -> Optional[dict]:
+        """Take the key's lock, or return the response stored under it."""
+        deadline = asyncio.get_running_loop().time() + settings.IDEMPOTENCY_WAIT
+        while True:
+            stored = await self._redis.get(key)
+            if stored is not None:
+                return json.loads(stored)
+            if await self._redis.set(
+                f"{key}:lock", token, ex=settings.IDEMPOTENCY_LOCK_TTL, nx=True
+            ):
+                # The holder may have stored its response between GET and SET
+                stored = await self._redis.get(key)
+                if stored is None:
+                    return None
+                await self._release(key, token)
+                return json.loads(stored)
+            if asyncio.get_running_loop().time() >= deadline:
+                raise IdempotencyConflict()
+            await asyncio.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+    async def _release(self, key: str, token: str):
+        # Only drop our own lock; an expired one may belong to a later request
+        try:
+            lock = await self._redis.get(f"{key}:lock")
+            if lock == token.encode():
+                await self._redis.delete(f"{key}:lock")
+        except RedisError as error:
+            logger.warning("Idempotency lock release failed for %s: %s", key, error)
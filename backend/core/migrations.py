@@ -0,0 +1,64 @@
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import Engine, inspect, text
+
+from core.db import Base, engine
+import models  # noqa: F401  ensure models are imported so metadata is populated
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# pg_advisory_lock key; containers starting together migrate one at a time
+MIGRATION_LOCK = 7302
+# Latest revision shipped while the app still built its schema with create_all;
+# databases created that way have every table up to it but no alembic_version
+BASELINE_REVISION = "1b5d2a4e1f3c"
+
+
+def _alembic_config(connection) -> Config:
+    config = Config(str(BASE_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BASE_DIR / "alembic"))
+    config.attributes["connection"] = connection
+    return config
+
+
+def run_migrations(bind: Engine = engine):
+    """Bring the database schema to the latest Alembic revision.
+
+    The migration history starts from a schema that already existed, so an
+    empty database is built from the models and stamped at head instead of
+    being replayed. The pg_trgm search indexes are migration-only and are
+    skipped on that path. A schema without alembic_version was built by
+    create_all before migrations ran at startup; it is stamped at
+    BASELINE_REVISION and upgraded from there.
+    """
+    with bind.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK})
+        try:
+            config = _alembic_config(connection)
+            inspector = inspect(connection)
+            if inspector.has_table("alembic_version"):
+                command.upgrade(config, "head")
+            elif not inspector.get_table_names():
+                logger.info("Empty database, creating the schema at head")
+                Base.metadata.create_all(bind=connection)
+                command.stamp(config, "head")
+            else:
+                logger.info(
+                    "Schema without alembic_version, upgrading from %s",
+                    BASELINE_REVISION,
+                )
+                command.stamp(config, BASELINE_REVISION)
+                command.upgrade(config, "head")
+            connection.commit()
+        finally:
+            # A failed migration leaves the transaction aborted; end it so the
+            # unlock runs and the original error propagates
+            connection.rollback()
+            connection.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK}
+            )
+            connection.commit()
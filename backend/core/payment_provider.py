@@ -0,0 +1,57 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from models import Customer, Order
+from schemas import ProviderPayment
+from schemas.base import PaymentMethodEnum
+
+
+# Online payment methods and the provider that collects them
+PROVIDER_FOR_METHOD = {
+    PaymentMethodEnum.CARD: "paystack",
+    PaymentMethodEnum.BANK_TRANSFER: "paystack",
+    PaymentMethodEnum.STRIPE: "stripe",
+}
+
+
+class PaymentProvider(ABC):
+    """What checkout and payment confirmation need from a payment provider."""
+
+    # ISO code, upper-case, of the currency initialize_payment charges in
+    currency: str
+
+    @abstractmethod
+    async def initialize_payment(
+        self,
+        amount: float,
+        email: str,
+        order: Order,
+        customer: Customer,
+        payment_method: PaymentMethodEnum,
+    ) -> dict:
+        """Start collecting `amount` for `order`.
+
+        The response goes to the client; its ``payment_ref`` is the reference
+        verify_payment accepts, None if the provider didn't return one.
+        """
+
+    @abstractmethod
+    async def verify_payment(self, payment_ref: str) -> ProviderPayment:
+        """Ask the provider for the state of the payment `payment_ref`."""
+
+    async def expire_payment(self, payment_ref: str) -> Optional[ProviderPayment]:
+        """Stop `payment_ref` from being paid; its state afterwards.
+
+        None when the provider can't expire payments; they then stay pending
+        until the provider settles them.
+        """
+        return None
+
+    @abstractmethod
+    def parse_webhook(
+        self, payload: bytes, signature: Optional[str]
+    ) -> Optional[ProviderPayment]:
+        """The payment a signed webhook reports, None for events we don't handle.
+
+        Raises InvalidRequest when the signature doesn't match.
+        """
@@ -0,0 +1,14 @@
+from typing import Dict
+
+from core import settings
+from core.fake_payment import fake_payment_provider
+from core.payment_provider import PaymentProvider
+from core.paystack import get_paystack
+from core.stripe_payment import get_stripe
+
+
+def get_payment_providers() -> Dict[str, PaymentProvider]:
+    """Providers by name; PAYMENT_PROVIDER=fake swaps every one for the fake."""
+    if settings.PAYMENT_PROVIDER == "fake":
+        return {"paystack": fake_payment_provider, "stripe": fake_payment_provider}
+    return {"paystack": get_paystack(), "stripe": get_stripe()}
@@ -1,23 +1,57 @@
+import hashlib
+import hmac
+import json
+from typing import Optional
+
 from httpx import AsyncClient
 import logging
 
 from core import settings
+from core.errors import InvalidRequest
+from core.http import http_clients
+from core.payment_provider import PaymentProvider
 from models import Customer, Order
+from schemas import ProviderPayment
+from schemas.base import PaymentMethodEnum, StatusEnum
 
 logger = logging.getLogger(__name__)
 
+# Paystack transaction statuses; anything else is treated as failed
+PAYSTACK_STATUSES = {
+    "success": StatusEnum.SUCCESS,
+    "abandoned": StatusEnum.ABADONED,
+    "ongoing": StatusEnum.PENDING,
+    "pending": StatusEnum.PENDING,
+    "processing": StatusEnum.PENDING,
+    "queued": StatusEnum.PENDING,
+}
 
-class PaystackClient:
 
-    def __init__(self, client=AsyncClient):
-        self.client: AsyncClient = client(
-            base_url=settings.paystack_config.BASE_URL,
-            headers={"Authorization": f"Bearer {settings.paystack_config.SECRET_KEY}"},
-        )
+def _payment_method(channel: Optional[str]) -> Optional[PaymentMethodEnum]:
+    # ussd, qr, bank, mobile_money... have no PaymentMethodEnum of their own
+    try:
+        return PaymentMethodEnum(channel)
+    except ValueError:
+        return None
+
+
+class PaystackClient(PaymentProvider):
+
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    @property
+    def currency(self) -> str:
+        return settings.paystack_config.CURRENCY.upper()
 
-    async def initialize_payment(self, email, amount, channel, **kwargs):
-        customer: Customer = kwargs.get("customer")
-        order: Order = kwargs.get("order")
+    async def initialize_payment(
+        self,
+        amount: float,
+        email: str,
+        order: Order,
+        customer: Customer,
+        payment_method: PaymentMethodEnum,
+    ) -> dict:
         metadata = {
             "customer_id": customer.id,
             "customer_first_name": customer.first_name,
@@ -37,28 +71,62 @@ class PaystackClient:
                 "transaction/initialize",
                 json={
                     "email": email,
-                    "amount": amount * 100,
-                    "channel": channel,
+                    "amount": int(amount) * 100,
+                    "currency": self.currency,
+                    "channel": payment_method.value,
                     "callback_url": settings.paystack_config.CALLBACK_URL,
                     "metadata": metadata,
                 },
             )
+            data = rsp.json()
         except Exception as e:
-            logger.error(e)
-            return {"error": str(e)}
+            logger.error(f"Paystack payment initialization failed: {e}")
+            raise ValueError(f"Paystack payment init failed: {str(e)}")
+        # Paystack reports rejected requests with "status": false
+        if rsp.is_error or not data.get("status"):
+            message = data.get("message", rsp.text)
+            logger.error(f"Paystack payment initialization failed: {message}")
+            raise ValueError(f"Paystack payment init failed: {message}")
 
-        return rsp.json()
+        data["payment_ref"] = (data.get("data") or {}).get("reference")
+        return data
 
-    async def verify_payment(self, payment_ref):
+    async def verify_payment(self, payment_ref: str) -> ProviderPayment:
         try:
             rsp = await self.client.get(url=f"transaction/verify/{payment_ref}")
-            rsp_data = rsp.json()["data"]
-
+            return self._payment(rsp.json()["data"])
         except Exception as e:
             logger.error(e)
+            raise ValueError(f"Paystack payment verification failed: {str(e)}")
+
+    def parse_webhook(
+        self, payload: bytes, signature: Optional[str]
+    ) -> Optional[ProviderPayment]:
+        # x-paystack-signature is the HMAC-SHA512 of the body under the secret key
+        secret = settings.paystack_config.SECRET_KEY
+        expected = hmac.new(secret.encode(), payload, hashlib.sha512).hexdigest()
+        if not secret or not signature or not hmac.compare_digest(expected, signature):
+            raise InvalidRequest("Invalid webhook signature")
 
-        return rsp_data
+        event = json.loads(payload)
+        if event.get("event") != "charge.success":
+            return None
+        return self._payment(event.get("data") or {})
+
+    @staticmethod
+    def _payment(data: dict) -> ProviderPayment:
+        metadata = data.get("metadata") or {}
+        return ProviderPayment(
+            status=PAYSTACK_STATUSES.get(data.get("status"), StatusEnum.FAILED),
+            order_id=metadata.get("order_id") or None,
+            payment_ref=data.get("reference"),
+            payment_method=_payment_method(data.get("channel")),
+            amount=data["amount"] / 100 if data.get("amount") is not None else None,
+            currency=data.get("currency"),
+            paid_at=data.get("paid_at"),
+            customer_email=(data.get("customer") or {}).get("email"),
+        )
 
 
 def get_paystack():
-    return PaystackClient()
+    return PaystackClient(http_clients.get("paystack"))
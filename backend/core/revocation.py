@@ -0,0 +1,65 @@
+import logging
+from datetime import datetime, timezone
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core import settings
+from core.errors import ServiceUnavailable
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRevocationList:
+    """Revoked JWT ids, shared by every worker through Redis.
+
+    Each revoked jti is stored under ``revoked:jti:<jti>`` and expires with the
+    token itself. Verdicts are cached in-process: a revocation until the token
+    expires, a "not revoked" for TOKEN_REVOCATION_CACHE_TTL seconds, which
+    bounds how long a logout on another worker takes to be seen here.
+    """
+
+    PREFIX = "revoked:jti"
+    _verdicts = TTLCache(settings.TOKEN_REVOCATION_CACHE_SIZE)
+
+    def __init__(self, redis: Redis):
+        self._redis = redis
+
+    def key(self, jti: str) -> str:
+        return f"{self.PREFIX}:{jti}"
+
+    async def revoke(self, jti: str, expires_at: datetime) -> bool:
+        """Revoke until `expires_at`; False if the jti was already revoked.
+
+        Raises ServiceUnavailable when Redis can't record the revocation, so the
+        token is never treated as revoked by this worker alone.
+        """
+        ttl = max(int((expires_at - datetime.now(timezone.utc)).total_seconds()), 1)
+        try:
+            created = await self._redis.set(self.key(jti), 1, ex=ttl, nx=True)
+        except RedisError:
+            logger.exception("Token revocation failed for %s", jti)
+            raise ServiceUnavailable("Could not revoke the token, try again later")
+        self._verdicts.set(jti, True, ttl)
+        return bool(created)
+
+    async def is_revoked(self, jti: str) -> bool:
+        """Whether `jti` was revoked.
+
+        Fails closed: raises ServiceUnavailable when Redis can't be asked and
+        no cached verdict is at hand, rather than accept a possibly revoked token.
+        """
+        revoked = self._verdicts.get(jti)
+        if revoked is not None:
+            return revoked
+        try:
+            ttl = await self._redis.ttl(self.key(jti))
+        except RedisError:
+            logger.exception("Token revocation lookup failed for %s", jti)
+            raise ServiceUnavailable("Could not check the token, try again later")
+        revoked = ttl != -2
+        self._verdicts.set(
+            jti, revoked, ttl if ttl > 0 else settings.TOKEN_REVOCATION_CACHE_TTL
+        )
+        return revoked
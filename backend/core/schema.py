@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel
 
 from schemas.base import Roles
@@ -12,6 +15,10 @@ class Tokens(BaseModel):
 class TokenData(BaseModel):
     user_id: int
     user_agent: str
+    jti: str
+    expires_at: datetime
+    default_role: Optional[Roles] = None
+    role_id: Optional[int] = None
 
 
 class RefreshTokenCreate(BaseModel):
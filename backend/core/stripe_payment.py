@@ -1,15 +1,62 @@
-import stripe
+import hashlib
+import hmac
+import json
+import time
+from time import perf_counter
+from typing import Optional
 
+from httpx import AsyncClient
 import logging
 from core import settings
+from core.errors import InvalidRequest
+from core.http import http_clients
+from core.payment_provider import PaymentProvider
 from models import Customer, Order
+from schemas import ProviderPayment
+from schemas.base import PaymentMethodEnum, StatusEnum
 
 logger = logging.getLogger(__name__)
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
+def _form_encode(params: dict, prefix: str = "") -> dict:
+    """Flatten nested params into Stripe's `a[b][0][c]=...` form fields."""
+    fields = {}
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else key
+        if isinstance(value, list):
+            value = dict(enumerate(value))
+        if isinstance(value, dict):
+            fields.update(_form_encode(value, name))
+        else:
+            fields[name] = str(value)
+    return fields
+
+
+class StripeClient(PaymentProvider):
+
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    @property
+    def currency(self) -> str:
+        return settings.STRIPE_CURRENCY.upper()
+
+    async def _request(self, method: str, url: str, **kwargs) -> dict:
+        start = perf_counter()
+        try:
+            rsp = await self.client.request(method, url, **kwargs)
+        finally:
+            logger.info(
+                "Stripe %s %s took %.2fms",
+                method,
+                url,
+                (perf_counter() - start) * 1000,
+            )
+        data = rsp.json()
+        if rsp.is_error:
+            raise ValueError(data.get("error", {}).get("message", rsp.text))
+        return data
 
-class StripeClient:
     async def create_checkout_session(
         self,
         amount: float,
@@ -19,70 +66,138 @@ class StripeClient:
         success_url: str,
         cancel_url: str
     ):
-        try:
-            session = stripe.checkout.Session.create(
-                payment_method_types=["card"],
-                line_items=[
-                    {
-                        "price_data": {
-                            "currency": "usd",
-                            "product_data": {
-                                "name": f"Order #{order.customer_order_number}",
-                            },
-                            "unit_amount": int(amount * 100),
+        params = {
+            "payment_method_types": ["card"],
+            "line_items": [
+                {
+                    "price_data": {
+                        "currency": settings.STRIPE_CURRENCY,
+                        "product_data": {
+                            "name": f"Order #{order.customer_order_number}",
                         },
-                        "quantity": 1,
-                    }
-                ],
-
-                mode="payment",
-                customer_email=email,
-                success_url=success_url,
-                cancel_url=cancel_url,
-                metadata={
-                    "order_id": str(order.id),
-                    "customer_id": str(customer.id),
-                    "pickup_code": order.pickup_code
-                },
-
+                        "unit_amount": int(amount * 100),
+                    },
+                    "quantity": 1,
+                }
+            ],
+            "mode": "payment",
+            "customer_email": email,
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+            "metadata": {
+                "order_id": str(order.id),
+                "customer_id": str(customer.id),
+                "pickup_code": order.pickup_code
+            },
+        }
+        try:
+            session = await self._request(
+                "POST",
+                "checkout/sessions",
+                data=_form_encode(params),
+                # A retried checkout for the same order gets the same session
+                headers={"Idempotency-Key": f"checkout-session:{order.id}"},
             )
             return {
-                "id": session.id,
-                "url": session.url,
-                "session_id": session.id,
+                "id": session["id"],
+                "url": session["url"],
+                "session_id": session["id"],
+                "payment_ref": session["id"],
             }
         except Exception as e:
             logger.error(f"Stripe checkout session creation failed: {e}")
             raise ValueError(f"Stripe payment init failed: {str(e)}")
-    
 
-    async def verify_payment(self, session_id: str):
+    async def initialize_payment(
+        self,
+        amount: float,
+        email: str,
+        order: Order,
+        customer: Customer,
+        payment_method: PaymentMethodEnum,
+    ) -> dict:
+        return await self.create_checkout_session(
+            amount=amount,
+            email=email,
+            order=order,
+            customer=customer,
+            success_url="frontend://checkout/success?session_id={CHECKOUT_SESSION_ID}",
+            cancel_url="frontend://checkout/cancel",
+        )
 
+    async def verify_payment(self, payment_ref: str) -> ProviderPayment:
         try:
-            session = stripe.checkout.Session.retrieve(session_id)
-
-
-            if session.payment_status == "paid":
-                return {
-                    "status": "success",
-                    "amount": session.amount_total / 100,
-                    "reference": session.payment_intent,
-                    "channel": "card",
-                    "paid_at": session.payment_intent.created if session.payment_intent else None,
-                    "metadata": session.metadata,
-                }
-            elif session.payment_status == "unpaid":
-                return {
-                    "status": "abandoned",
-                }
-            else:
-                return {
-                    "status": "failed",
-                }
+            session = await self._request(
+                "GET",
+                f"checkout/sessions/{payment_ref}",
+                params={"expand[]": "payment_intent"},
+            )
         except Exception as e:
             logger.error(f"Stripe payment verification failed: {e}")
             raise ValueError(f"Stripe payment verification failed: {str(e)}")
+        payment_intent = session.get("payment_intent") or {}
+        return self._payment(session, paid_at=payment_intent.get("created"))
+
+    async def expire_payment(self, payment_ref: str) -> ProviderPayment:
+        # Fails once the session is complete, so a paid order is never expired
+        try:
+            session = await self._request(
+                "POST", f"checkout/sessions/{payment_ref}/expire"
+            )
+        except Exception as e:
+            logger.error(f"Stripe session expiry failed: {e}")
+            raise ValueError(f"Stripe session expiry failed: {str(e)}")
+        return self._payment(session)
+
+    def parse_webhook(
+        self, payload: bytes, signature: Optional[str]
+    ) -> Optional[ProviderPayment]:
+        # Stripe-Signature: t=<timestamp>,v1=<HMAC-SHA256 of "<timestamp>.<body>">
+        fields = [
+            item.split("=", 1) for item in (signature or "").split(",") if "=" in item
+        ]
+        timestamp = next((value for key, value in fields if key == "t"), "")
+        signatures = [value for key, value in fields if key == "v1"]
+        secret = settings.STRIPE_WEBHOOK_SECRET
+        if not secret or not timestamp.isdigit() or not signatures:
+            raise InvalidRequest("Invalid webhook signature")
+
+        expected = hmac.new(
+            secret.encode(), timestamp.encode() + b"." + payload, hashlib.sha256
+        ).hexdigest()
+        if not any(hmac.compare_digest(expected, sig) for sig in signatures):
+            raise InvalidRequest("Invalid webhook signature")
+        # Rejects replays of an old, validly signed event
+        if abs(time.time() - int(timestamp)) > settings.STRIPE_WEBHOOK_TOLERANCE:
+            raise InvalidRequest("Webhook timestamp outside the tolerance")
+
+        event = json.loads(payload)
+        if event.get("type") != "checkout.session.completed":
+            return None
+        return self._payment(event["data"]["object"], paid_at=event.get("created"))
+
+    @staticmethod
+    def _payment(session: dict, paid_at=None) -> ProviderPayment:
+        # The session id, not the payment intent, is stored as payment_ref
+        if session.get("payment_status") == "paid":
+            status = StatusEnum.SUCCESS
+        elif session.get("status") == "expired":
+            status = StatusEnum.ABADONED
+        else:
+            # Open sessions stay payable until they expire (24h by default);
+            # complete but unpaid ones wait on a delayed payment method
+            status = StatusEnum.PENDING
+        return ProviderPayment(
+            status=status,
+            order_id=(session.get("metadata") or {}).get("order_id"),
+            payment_ref=session["id"],
+            payment_method=PaymentMethodEnum.CARD,
+            amount=(session.get("amount_total") or 0) / 100,
+            currency=session.get("currency"),
+            paid_at=paid_at,
+            customer_email=(session.get("customer_details") or {}).get("email"),
+        )
 
 
 def get_stripe():
-    return StripeClient()
\ No newline at end of file
+    return StripeClient(http_clients.get("stripe"))
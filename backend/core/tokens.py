@@ -1,55 +1,65 @@
-from datetime import datetime, timedelta
-import threading
+from datetime import datetime, timedelta, timezone
+import hashlib
+from typing import Optional
+import uuid
 
 from fastapi import Depends
-from sqlalchemy.orm import Session
 import jwt
 from jwt.exceptions import InvalidTokenError
 from fastapi.security import OAuth2PasswordBearer
 
 from core import settings
-from core.db import get_db
-from core.errors import CredentialException, InvalidRequest
-from crud import CRUDAuthUser, get_crud_auth_user, crud_refresh_token
+from core.cache import PrincipalCache
+from core.errors import CredentialException, InvalidRequest, MissingResources
+from core.revocation import TokenRevocationList
+from crud import CRUDAuthUser, CRUDRefreshToken, get_crud_auth_user
 from models.auth_user import AuthUser
 from schemas.base import Roles
+from task_queue.main import get_queue_connection
 from .schema import Tokens, TokenData, RefreshTokenCreate
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-BLACKLISTED_TOKEN = []
 
-lock = threading.Lock()
+def get_token_revocation_list(
+    queue_connection=Depends(get_queue_connection),
+) -> TokenRevocationList:
+    return TokenRevocationList(queue_connection)
 
 
-async def deactivate_token(token, auth_id):
-    if token in BLACKLISTED_TOKEN:
-        raise InvalidRequest("Already Logged Out")
-    verify_access_token(token)
-    with lock:
-        BLACKLISTED_TOKEN.append(token)
-        await crud_refresh_token.delete_by_auth_id(auth_id=auth_id)
+def get_principal_cache(
+    queue_connection=Depends(get_queue_connection),
+) -> PrincipalCache:
+    return PrincipalCache(queue_connection)
 
 
-def is_token_blacklisted(token: str) -> bool:
-    with lock:
-        return token in BLACKLISTED_TOKEN
+async def deactivate_token(
+    token,
+    auth_id,
+    crud_refresh_token: CRUDRefreshToken,
+    revocation_list: TokenRevocationList,
+):
+    token_data = verify_access_token(token)
+    if not await revocation_list.revoke(token_data.jti, token_data.expires_at):
+        raise InvalidRequest("Already Logged Out")
+    await crud_refresh_token.delete_by_auth_id(auth_id=auth_id)
 
 
 def encode_jwt(payload: dict, expiry_time: timedelta):
     data_to_encode = payload.copy()
     expiration_time = datetime.utcnow() + expiry_time
-    data_to_encode.update({"exp": expiration_time})
+    data_to_encode.update({"exp": expiration_time, "jti": uuid.uuid4().hex})
     token = jwt.encode(data_to_encode, settings.JWT_SECRET_KEY, settings.ALGORITHM)
     return token
 
 
-def generate_access_token(user_id, user_agent, default_role):
+def generate_access_token(user_id, user_agent, default_role, role_id=None):
     payload = {
         "user_id": user_id,
         "type": "access",
         "user_agent": user_agent,
         "default_role": default_role,
+        "role_id": role_id,
     }
     access_token = encode_jwt(
         payload=payload,
@@ -58,12 +68,13 @@ def generate_access_token(user_id, user_agent, default_role):
     return access_token
 
 
-def generate_refresh_token(user_id, user_agent, default_role):
+def generate_refresh_token(user_id, user_agent, default_role, role_id=None):
     payload = {
         "user_id": user_id,
         "type": "refresh",
         "user_agent": user_agent,
         "default_role": default_role,
+        "role_id": role_id,
     }
     refresh_token = encode_jwt(
         payload=payload, expiry_time=timedelta(days=settings.REFRESH_TOKEN_EXPIRY_TIME)
@@ -71,9 +82,9 @@ def generate_refresh_token(user_id, user_agent, default_role):
     return refresh_token
 
 
-def generate_tokens(user_id, user_agent, default_role):
-    access_token = generate_access_token(user_id, user_agent, default_role)
-    refresh_token = generate_refresh_token(user_id, user_agent, default_role)
+def generate_tokens(user_id, user_agent, default_role, role_id=None):
+    access_token = generate_access_token(user_id, user_agent, default_role, role_id)
+    refresh_token = generate_refresh_token(user_id, user_agent, default_role, role_id)
     return Tokens(
         access_token=access_token,
         refresh_token=refresh_token,
@@ -82,77 +93,134 @@ def generate_tokens(user_id, user_agent, default_role):
 
 
 def verify_access_token(token):
-    if is_token_blacklisted(token):
-        raise InvalidRequest("User logged out")
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, settings.ALGORITHM)
         user_id = payload.get("user_id")
         user_agent = payload.get("user_agent")
         if not user_id:
             CredentialException("invalid token")
-        token_data = TokenData(user_id=user_id, user_agent=user_agent)
+        token_data = TokenData(
+            user_id=user_id,
+            user_agent=user_agent,
+            # Tokens issued before jti was added are revoked by their digest
+            jti=payload.get("jti") or hashlib.sha256(token.encode()).hexdigest(),
+            expires_at=datetime.fromtimestamp(payload["exp"], tz=timezone.utc),
+            default_role=payload.get("default_role"),
+            role_id=payload.get("role_id"),
+        )
     except InvalidTokenError:
         raise CredentialException("Invalid token")
     return token_data
 
 
-def get_current_auth_user(
-    token=Depends(oauth2_scheme), db: Session = Depends(get_db)
+async def verify_active_token(
+    token, revocation_list: TokenRevocationList
+) -> TokenData:
+    token_data = verify_access_token(token)
+    if await revocation_list.is_revoked(token_data.jti):
+        raise InvalidRequest("User logged out")
+    return token_data
+
+
+async def get_token_data(
+    token=Depends(oauth2_scheme),
+    revocation_list: TokenRevocationList = Depends(get_token_revocation_list),
+) -> TokenData:
+    return await verify_active_token(token, revocation_list)
+
+
+async def _load_auth_user(
+    user_id: int,
+    crud_auth_user: CRUDAuthUser,
+    principal_cache: PrincipalCache,
+    fresh: bool = False,
+) -> Optional[AuthUser]:
+    auth_user = None if fresh else await principal_cache.get(user_id)
+    if auth_user is None:
+        auth_user = await crud_auth_user.get(id=user_id)
+        if auth_user:
+            await principal_cache.set(auth_user)
+    return auth_user
+
+
+async def get_principal(
+    token_data: TokenData = Depends(get_token_data),
+    crud_auth_user: CRUDAuthUser = Depends(get_crud_auth_user),
+    principal_cache: PrincipalCache = Depends(get_principal_cache),
+) -> Optional[AuthUser]:
+    # FastAPI caches dependencies per request, so this runs at most once each
+    return await _load_auth_user(token_data.user_id, crud_auth_user, principal_cache)
+
+
+async def get_current_auth_user(
+    auth_user: Optional[AuthUser] = Depends(get_principal),
 ) -> AuthUser:
     # TODO: Change this to accept only verified emails when i deploy completely with background worker
-
-    token = verify_access_token(token)
-    auth_user = db.query(AuthUser).filter(AuthUser.id == token.user_id).first()
     if not auth_user:
         raise CredentialException("User not found")
     return auth_user
 
 
-def get_current_unverified_auth_user(
-    token=Depends(oauth2_scheme), db: Session = Depends(get_db)
+async def get_current_unverified_auth_user(
+    auth_user: Optional[AuthUser] = Depends(get_principal),
 ) -> AuthUser:
-    token = verify_access_token(token)
-    auth_user = db.query(AuthUser).filter(AuthUser.id == token.user_id).first()
     if not auth_user:
         raise CredentialException("User not found")
 
     return auth_user
 
 
-def get_current_verified_vendor(
-    token=Depends(oauth2_scheme),
-    crud_auth_user: CRUDAuthUser = Depends(get_crud_auth_user),
+async def _get_verified_role_user(
+    role: Roles,
+    token_data: TokenData,
+    auth_user: Optional[AuthUser],
+    crud_auth_user: CRUDAuthUser,
+    principal_cache: PrincipalCache,
 ) -> AuthUser:
     # TODO: Change this to accept only verified emails and phone numbers  when i deploy completely with background worker
-    token = verify_access_token(token)
-    auth_user = crud_auth_user.get_or_raise_exception(id=token.user_id)
-    if not (auth_user.default_role == Roles.VENDOR):
-        raise InvalidRequest("Customer cannot perform this action")
+    if token_data.default_role and token_data.default_role != role:
+        raise InvalidRequest(
+            f"{token_data.default_role.value.title()} cannot perform this action"
+        )
+    if auth_user and not auth_user.role_id:
+        # role_id is set by a worker job once the account is created; the
+        # cached copy may predate it
+        auth_user = await _load_auth_user(
+            token_data.user_id, crud_auth_user, principal_cache, fresh=True
+        )
+    if not auth_user:
+        raise MissingResources
+    if not (auth_user.default_role == role):
+        raise InvalidRequest(
+            f"{Roles(auth_user.default_role).value.title()} cannot perform this action"
+        )
     if not auth_user.role_id:
         raise InvalidRequest(
-            "Complete your registration by creating your vendor account"
+            f"Complete your registration by creating your {role.value} account"
         )
-
     return auth_user
 
 
-def get_current_verified_customer(
-    token=Depends(oauth2_scheme),
+async def get_current_verified_vendor(
+    token_data: TokenData = Depends(get_token_data),
+    auth_user: Optional[AuthUser] = Depends(get_principal),
     crud_auth_user: CRUDAuthUser = Depends(get_crud_auth_user),
+    principal_cache: PrincipalCache = Depends(get_principal_cache),
 ) -> AuthUser:
-    # TODO: Change this to accept only verified emails and phone numbers  when i deploy completely with background worker
-
-    token = verify_access_token(token)
-    auth_user = crud_auth_user.get_or_raise_exception(id=token.user_id)
+    return await _get_verified_role_user(
+        Roles.VENDOR, token_data, auth_user, crud_auth_user, principal_cache
+    )
 
-    if not (auth_user.default_role == Roles.CUSTOMER):
-        raise InvalidRequest("Vendor cannot perform this action")
 
-    if not auth_user.role_id:
-        raise InvalidRequest(
-            "Complete your registration by creating your customer account"
-        )
-    return auth_user
+async def get_current_verified_customer(
+    token_data: TokenData = Depends(get_token_data),
+    auth_user: Optional[AuthUser] = Depends(get_principal),
+    crud_auth_user: CRUDAuthUser = Depends(get_crud_auth_user),
+    principal_cache: PrincipalCache = Depends(get_principal_cache),
+) -> AuthUser:
+    return await _get_verified_role_user(
+        Roles.CUSTOMER, token_data, auth_user, crud_auth_user, principal_cache
+    )
 
 
 def create_forget_password_token(auth_id, user_agent):
@@ -162,14 +230,30 @@ def create_forget_password_token(auth_id, user_agent):
     )
 
 
-async def regenerate_tokens(token, user_agent, auth_id, default_role):
+async def regenerate_tokens(
+    token,
+    user_agent,
+    auth_id,
+    default_role,
+    crud_refresh_token: CRUDRefreshToken,
+    revocation_list: TokenRevocationList,
+    role_id=None,
+):
 
-    crud_refresh_token.check_if_refresh_token_exist(token)
+    await crud_refresh_token.check_if_refresh_token_exist(token)
 
-    token = await deactivate_token(token, auth_id=auth_id)
+    token = await deactivate_token(
+        token,
+        auth_id=auth_id,
+        crud_refresh_token=crud_refresh_token,
+        revocation_list=revocation_list,
+    )
 
     tokens = generate_tokens(
-        user_agent=user_agent, user_id=auth_id, default_role=default_role
+        user_agent=user_agent,
+        user_id=auth_id,
+        default_role=default_role,
+        role_id=role_id,
     )
     token_obj = RefreshTokenCreate(
         auth_id=auth_id, refresh_token=tokens.refresh_token, user_agent=user_agent
@@ -1,113 +1,243 @@
+import base64
+import binascii
+import json
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Dict, Generic, Optional, Type, TypeVar, Union
+from inspect import isawaitable
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+)
+from sqlalchemy import DateTime, delete, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from core.db import Base
-from core.errors import MissingResources
+from core.errors import InvalidCursor, MissingResources
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(values: List[Any]) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, keys: Mapping[str, Any]) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if isinstance(key.type, DateTime) else value
+            for key, value in zip(keys.values(), values)
+        ]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise InvalidCursor
+
+
+async def _resolve(result):
+    """Await results coming from an AsyncSession, pass sync Session results through."""
+    if isawaitable(result):
+        return await result
+    return result
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelType], db: Session):
+    """Data access for one model.
+
+    The API hands every CRUD class an ``AsyncSession`` so queries never block the
+    event loop; the arq worker and scripts may still pass a sync ``Session``.
+    """
+
+    # Named loader options, one entry per response schema the class serves.
+    # Collections go through selectinload (one extra IN query, no row fan-out);
+    # joinedload is kept to many-to-one, where the join adds no rows.
+    LOAD_PROFILES: Dict[str, tuple] = {}
+
+    def __init__(self, model: Type[ModelType], db: Union[AsyncSession, Session]):
         self._db = db
         self.model = model
 
-    def get_or_raise_exception(self, id: int) -> ModelType:
-        query_result = self._db.query(self.model).filter(self.model.id == id).first()
+    def _select(self, profile: Optional[str] = None):
+        statement = select(self.model)
+        if profile is not None:
+            statement = statement.options(*self.LOAD_PROFILES[profile])
+        return statement
+
+    async def _execute(self, statement, params=None):
+        return await _resolve(self._db.execute(statement, params))
+
+    async def _first(self, statement) -> Optional[Any]:
+        result = await self._execute(statement)
+        return result.unique().scalars().first()
+
+    async def _all(self, statement) -> List[Any]:
+        result = await self._execute(statement)
+        return list(result.unique().scalars().all())
+
+    async def _paginate(
+        self, statement, keys: Mapping[str, Any], cursor: Optional[str], limit: int
+    ) -> Page:
+        """Keyset page of `statement` ordered by `keys`, newest/highest first.
+
+        `keys` maps row attribute names to the expressions they are sorted on and
+        must end in a unique column. The cursor holds the last row's key values,
+        so deep pages seek through the matching index instead of skipping rows.
+        """
+        if cursor:
+            values = decode_cursor(cursor, keys)
+            statement = statement.where(tuple_(*keys.values()) < tuple_(*values))
+        rows = await self._all(
+            statement.order_by(*(key.desc() for key in keys.values())).limit(limit + 1)
+        )
+        if len(rows) <= limit:
+            return Page(rows)
+        rows = rows[:limit]
+        return Page(rows, encode_cursor([getattr(rows[-1], name) for name in keys]))
+
+    @property
+    def _in_transaction(self) -> bool:
+        return self._db.info.get("in_transaction", False)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Group writes from every CRUD class sharing this session into one commit.
+
+        Inside the block ``_commit`` only flushes, so generated ids are still
+        available; the block commits once at the end and rolls back on error.
+        """
+        self._db.info["in_transaction"] = True
+        try:
+            yield
+        except BaseException:
+            self._db.info["in_transaction"] = False
+            await self._rollback()
+            raise
+        self._db.info["in_transaction"] = False
+        await self._commit()
+
+    async def _commit(self):
+        if self._in_transaction:
+            await _resolve(self._db.flush())
+        else:
+            await _resolve(self._db.commit())
+
+    async def _rollback(self):
+        await _resolve(self._db.rollback())
+
+    async def _refresh(self, instance):
+        await _resolve(self._db.refresh(instance))
+
+    async def get_or_raise_exception(self, id: int) -> ModelType:
+        query_result = await self.get(id)
         if not query_result:
             raise MissingResources
         return query_result
 
-    def get(self, id: int) -> Optional[ModelType]:
-        query_result = self._db.query(self.model).filter(self.model.id == id).first()
+    async def get(self, id: int) -> Optional[ModelType]:
+        query_result = await self._first(select(self.model).where(self.model.id == id))
 
         return query_result if query_result else None
 
-    def get_multi(
-        self, id: int, skip: int = 0, limit: int = 20
-    ) -> Optional[list[ModelType]]:
-        query_result = (
-            self._db.query(self.model)
-            .filter(self.model.id == id)
-            .offset(skip)
-            .limit(limit)
-            .all()
+    async def get_multi(self, skip: int = 0, limit: int = 20) -> List[ModelType]:
+        return await self._all(
+            select(self.model).order_by(self.model.id).offset(skip).limit(limit)
         )
 
-        return query_result if query_result else None
-
-    def get_by_auth_id(self, auth_id) -> Optional[ModelType]:
-        query_result = (
-            self._db.query(self.model).filter(self.model.auth_id == auth_id).first()
+    async def get_by_auth_id(self, auth_id) -> Optional[ModelType]:
+        query_result = await self._first(
+            select(self.model).where(self.model.auth_id == auth_id)
         )
         return query_result if query_result else None
 
-    def _get_query_by_id(self, id):
-        query_result = self._db.query(self.model).filter(self.model.id == id)
-        if not query_result.first():
+    async def _ensure_exists(self, id):
+        exists = await self._execute(select(self.model.id).where(self.model.id == id))
+        if exists.first() is None:
             raise MissingResources("Item with ID doesn't exist")
-        return query_result
 
     async def create(self, data_obj: Union[CreateSchemaType, dict]) -> ModelType:
         if isinstance(data_obj, dict):
             rsp_result = self.model(**data_obj)
-            self._db.add(rsp_result)
-            self._db.commit()
-            self._db.refresh(rsp_result)
-            return rsp_result
-
-        data_dict = data_obj.model_dump(exclude_none=True)
-        rsp_result = self.model(**data_dict)
+        else:
+            rsp_result = self.model(**data_obj.model_dump(exclude_none=True))
         self._db.add(rsp_result)
-        self._db.commit()
-        self._db.refresh(rsp_result)
+        await self._commit()
+        if not self._in_transaction:
+            # Inside a transaction the INSERT already returned server defaults
+            await self._refresh(rsp_result)
 
         return rsp_result
 
     async def delete(self, id) -> bool:
-        query = self._get_query_by_id(id)
-        query.delete(synchronize_session=False)
-        self._db.commit()
+        await self._ensure_exists(id)
+        await self._execute(
+            delete(self.model)
+            .where(self.model.id == id)
+            .execution_options(synchronize_session=False)
+        )
+        await self._commit()
         return True
 
     async def update(
         self, id, data_obj: Union[UpdateSchemaType, dict]
     ) -> Dict[str, Any]:
-        query = self._get_query_by_id(id)
+        await self._ensure_exists(id)
         if isinstance(data_obj, dict):
-            data_obj["updated_timestamp"] = datetime.utcnow()
-            query.update(data_obj, synchronize_session=False)
-            self._db.commit()
-            return data_obj
-        data_dict = data_obj.model_dump(exclude_unset=True)
+            data_dict = data_obj
+        else:
+            data_dict = data_obj.model_dump(exclude_unset=True)
         data_dict["updated_timestamp"] = datetime.utcnow()
-        query.update(data_dict, synchronize_session=False)
-        self._db.commit()
+        await self._execute(
+            update(self.model)
+            .where(self.model.id == id)
+            .values(**data_dict)
+            .execution_options(synchronize_session=False)
+        )
+        await self._commit()
         return data_dict
 
-    def get_by_username(self, username: str) -> bool:
-        username_query = (
-            self._db.query(self.model).filter(self.model.username == username).first()
+    async def get_by_username(self, username: str) -> bool:
+        username_query = await self._first(
+            select(self.model).where(self.model.username == username)
         )
         if not username_query:
             return False
         return True
 
     async def delete_by_auth_id(self, auth_id):
-        query = (
-            self._db.query(self.model)
-            .filter(self.model.auth_id == auth_id)
-            .delete(synchronize_session=False)
+        await self._execute(
+            delete(self.model)
+            .where(self.model.auth_id == auth_id)
+            .execution_options(synchronize_session=False)
         )
-        self._db.commit()
+        await self._commit()
         return
 
-    async def bulk_insert(self, data_objs: Union[CreateSchemaType]):
-        data_list = [self.model(**data_obj.model_dump()) for data_obj in data_objs]
-        datas = self._db.bulk_save_objects(data_list)
-        self._db.commit()
-        return datas
+    async def bulk_insert(self, data_objs: List[CreateSchemaType]) -> List[ModelType]:
+        """Insert all rows in one batched INSERT ... RETURNING round trip."""
+        if not data_objs:
+            return []
+        result = await self._execute(
+            insert(self.model).returning(self.model),
+            [data_obj.model_dump(exclude_none=True) for data_obj in data_objs],
+        )
+        rows = list(result.scalars().all())
+        await self._commit()
+        return rows
@@ -2,108 +2,178 @@ from datetime import datetime
 
 from typing import Dict, List, Optional
 from fastapi import Depends
+from sqlalchemy import delete, func, select, update
 
-from core.db import get_db
+import sqlalchemy
+import sqlalchemy.orm
+
+from core.db import get_async_db
 from core.errors import InvalidRequest, MissingResources
 from crud.base import CRUDBase
-from models import Cart, Product
+from models import Cart, Product, ProductImage
 from schemas import CartCreate, CartUpdate
 
 
 class CRUDCart(CRUDBase[Cart, CartCreate, CartUpdate]):
 
+    LOAD_PROFILES = {
+        "CartReturn": (
+            sqlalchemy.orm.joinedload(Cart.product).options(
+                sqlalchemy.orm.selectinload(Product.product_images),
+                sqlalchemy.orm.joinedload(Product.category),
+            ),
+            sqlalchemy.orm.joinedload(Cart.customer),
+        ),
+        # Checkout only needs each line's product (price, stock, vendor)
+        "Checkout": (sqlalchemy.orm.joinedload(Cart.product),),
+    }
+
     async def clear_cart(self, customer_id):
-        cart_query = self._db.query(self.model).filter(
-            self.model.customer_id == customer_id
+        await self._execute(
+            delete(self.model)
+            .where(self.model.customer_id == customer_id)
+            .execution_options(synchronize_session=False)
         )
-        cart_query.delete(synchronize_session=False)
-        self._db.commit()
-
-    async def delete_cart_item_by_product_id(self, product_id):
-        cart_query = self._db.query(self.model).filter(
-            self.model.product_id == product_id
+        await self._commit()
+
+    async def replace_cart(self, customer_id: int, quantities: Dict[int, int]):
+        """Make the customer's cart rows match `quantities` (product id -> quantity)."""
+        async with self.transaction():
+            await self._execute(
+                delete(self.model)
+                .where(self.model.customer_id == customer_id)
+                .execution_options(synchronize_session=False)
+            )
+            await self.bulk_insert(
+                [
+                    CartCreate(
+                        customer_id=customer_id, product_id=product_id, quantity=quantity
+                    )
+                    for product_id, quantity in quantities.items()
+                ]
+            )
+
+    async def delete_cart_item_by_product_id(self, product_id, customer_id):
+        await self._execute(
+            delete(self.model)
+            .where(self.model.customer_id == customer_id)
+            .where(self.model.product_id == product_id)
+            .execution_options(synchronize_session=False)
+        )
+        await self._commit()
+
+    async def get_cart_totals(self, customer_id: int) -> Dict:
+        totals = await self._execute(
+            select(
+                func.coalesce(func.sum(self.model.quantity), 0).label(
+                    "total_items_quantity"
+                ),
+                func.coalesce(func.sum(self.model.quantity * Product.price), 0).label(
+                    "total_amount"
+                ),
+            )
+            .join(Product, Product.id == self.model.product_id)
+            .where(self.model.customer_id == customer_id)
         )
-        cart_query.delete(synchronize_session=False)
-        self._db.commit()
+        return dict(totals.one()._mapping)
 
     async def get_cart_summary(
         self,
         customer_id: int,
+        profile: str = "CartReturn",
     ) -> Dict:
-        cart_items = self.get_cart_items_by_customer_id(customer_id)
+        cart_items = await self.get_cart_items_by_customer_id(customer_id, profile)
         if not cart_items:
             raise MissingResources("No items in cart")
 
-        total_amount = sum(item.quantity * item.product.price for item in cart_items)
-        total_items_quantity = sum(item.quantity for item in cart_items)
+        return {**await self.get_cart_totals(customer_id), "cart_items": cart_items}
+
+    async def get_cart_summary_lite(self, customer_id: int) -> Dict:
+        """Cart lines with their product's name, price and first image, and the
+        cart totals, all from one query."""
+        line_total = self.model.quantity * Product.price
+        product_image = (
+            select(ProductImage.product_image)
+            .where(ProductImage.product_id == Product.id)
+            .order_by(ProductImage.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        lines = await self._execute(
+            select(
+                self.model.product_id,
+                Product.product_name,
+                Product.price,
+                Product.stock,
+                self.model.quantity,
+                line_total.label("line_total"),
+                product_image.label("product_image"),
+                func.sum(self.model.quantity).over().label("total_items_quantity"),
+                func.sum(line_total).over().label("total_amount"),
+            )
+            .join(Product, Product.id == self.model.product_id)
+            .where(self.model.customer_id == customer_id)
+            .order_by(self.model.id)
+        )
+        cart_items = lines.mappings().all()
+        if not cart_items:
+            raise MissingResources("No items in cart")
 
-        summary = {
-            "total_items_quantity": total_items_quantity,
-            "total_amount": total_amount,
+        return {
+            "total_items_quantity": cart_items[0]["total_items_quantity"],
+            "total_amount": cart_items[0]["total_amount"],
             "cart_items": cart_items,
         }
 
-        return summary
-
-    def get_by_product_id_and_customer_id(
+    async def get_by_product_id_and_customer_id(
         self, product_id: int, customer_id: int
     ) -> Optional[Cart]:
 
-        query_result = (
-            self._db.query(self.model)
-            .filter(self.model.product_id == product_id)
-            .filter(self.model.customer_id == customer_id)
-            .first()
+        query_result = await self._first(
+            self._select("CartReturn")
+            .where(self.model.product_id == product_id)
+            .where(self.model.customer_id == customer_id)
         )
 
         return query_result if query_result else None
 
-    def get_cart_items_by_customer_id(self, customer_id: int) -> Optional[List[Cart]]:
-        query_result = (
-            self._db.query(self.model)
-            .filter(self.model.customer_id == customer_id)
-            .all()
+    async def get_cart_items_by_customer_id(
+        self, customer_id: int, profile: str = "CartReturn"
+    ) -> Optional[List[Cart]]:
+        query_result = await self._all(
+            self._select(profile)
+            .where(self.model.customer_id == customer_id)
+            .order_by(self.model.id)
         )
         return query_result if query_result else None
 
     async def update_cart_by_customer_id(
         self, customer_id: int, product_id: int, data_obj: CartUpdate
     ) -> Dict:
-        query = (
-            self._db.query(self.model)
-            .filter(self.model.customer_id == customer_id)
-            .filter(self.model.product_id == product_id)
-        )
-
         data_dict = data_obj.model_dump(exclude_unset=True)
         data_dict["updated_timestamp"] = datetime.utcnow()
-        query.update(data_dict, synchronize_session=False)
-        self._db.commit()
+        await self._execute(
+            update(self.model)
+            .where(self.model.customer_id == customer_id)
+            .where(self.model.product_id == product_id)
+            .values(**data_dict)
+            .execution_options(synchronize_session=False)
+        )
+        await self._commit()
         return data_dict
 
     async def check_if_product_id_exist_in_cart(
         self, customer_id, product_id
-    ) -> List[Product]:
-        cart_item = self.get_cart_items_by_customer_id(customer_id=customer_id)
-
+    ) -> Product:
+        cart_item = await self._first(
+            self._select("Checkout")
+            .where(self.model.customer_id == customer_id)
+            .where(self.model.product_id == product_id)
+        )
         if not cart_item:
-            raise InvalidRequest("No Cart Item")
-
-        try:
-            # Filter the cart items to get a list of products that match the given product ID
-            product_list = [
-                item.product for item in cart_item if item.product_id == product_id
-            ]
-            # Create an iterator for the filtered products list
-            product_iter = iter(product_list)
-            # Advance the iterator to the first item to check if there is at least one matching product
-            next(product_iter)
-            # If the product is found, return the list of matching products
-            return product_list[0]
-
-        except StopIteration:
             raise InvalidRequest("Product doesn't exist in cart")
+        return cart_item.product
 
 
-def get_crud_cart(db=Depends(get_db)) -> CRUDCart:
+def get_crud_cart(db=Depends(get_async_db)) -> CRUDCart:
     return CRUDCart(db=db, model=Cart)
@@ -1,6 +1,6 @@
 from fastapi import Depends
 
-from core.db import get_db
+from core.db import get_async_db
 from crud.base import CRUDBase
 from models import Customer
 from schemas import CustomerCreate
@@ -10,5 +10,5 @@ class CRUDCustomer(CRUDBase[Customer, CustomerCreate, CustomerCreate]):
     pass
 
 
-def get_crud_customer(db=Depends(get_db)):
+def get_crud_customer(db=Depends(get_async_db)):
     return CRUDCustomer(db=db, model=Customer)
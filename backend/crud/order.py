@@ -1,14 +1,29 @@
-from datetime import datetime, timedelta
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
 
 from fastapi import Depends
+from sqlalchemy import Date, DateTime, Integer, and_, cast, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
 import sqlalchemy
 import sqlalchemy.orm
 
-from core.db import get_db
-from crud.base import CRUDBase
-from models import Order, OrderItem, ShippingDetails, PaymentDetails
-from schemas.base import StatusEnum
+from core.db import get_async_db
+from crud.base import CRUDBase, Page
+from models import (
+    Order,
+    OrderItem,
+    PaymentDetails,
+    Product,
+    ProductCategory,
+    ShippingDetails,
+    VendorDailySales,
+)
+from schemas.base import (
+    GranularityEnum,
+    OrderStatusEnum,
+    SalesBreakdownEnum,
+    StatusEnum,
+)
 from schemas import (
     OrderCreate,
     PaymentDetailsCreate,
@@ -19,85 +34,283 @@ from schemas import (
 
 class CRUDOrder(CRUDBase[Order, OrderCreate, OrderCreate]):
 
-    async def get_all_orders(self) -> List[Order]:
-        query = (
-            self._db.query(self.model)
-            .options(
-                sqlalchemy.orm.joinedload(Order.order_items).joinedload(OrderItem.product),
-                sqlalchemy.orm.joinedload(Order.order_items).joinedload(OrderItem.vendor),
-                sqlalchemy.orm.joinedload(Order.payment_details),
-                sqlalchemy.orm.joinedload(Order.shipping_details),
-                sqlalchemy.orm.joinedload(Order.customer),
+    LOAD_PROFILES = {
+        "OrderReturn": (
+            sqlalchemy.orm.selectinload(Order.order_items).options(
+                sqlalchemy.orm.joinedload(OrderItem.product),
+                sqlalchemy.orm.joinedload(OrderItem.vendor),
+            ),
+            sqlalchemy.orm.joinedload(Order.payment_details),
+            sqlalchemy.orm.selectinload(Order.shipping_details),
+            sqlalchemy.orm.joinedload(Order.customer),
+        ),
+    }
+
+    async def delete_orders(self, order_ids: List[int]) -> List[int]:
+        deleted = await self._execute(
+            delete(self.model)
+            .where(self.model.id.in_(order_ids))
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        order_ids = list(deleted.scalars().all())
+        await self._commit()
+        return order_ids
+
+    async def promote_shipped_orders(
+        self, order_ids: Optional[List[int]] = None
+    ) -> List[int]:
+        """Mark processing orders shipped once none of their items still are
+        processing or refunded. Limited to `order_ids` when given."""
+        open_items = (
+            select(OrderItem.id)
+            .where(OrderItem.order_id == Order.id)
+            .where(
+                OrderItem.status.in_(
+                    [OrderStatusEnum.PROCESSING.value, OrderStatusEnum.REFUNDED.value]
+                )
             )
-            .all()
-        )
-        return query
-
-    async def get_orders_by_customer(self, customer_id: int) -> List[Order]:
-        query = (
-            self._db.query(self.model)
-            .filter(Order.customer_id == customer_id)
-            .options(
-                sqlalchemy.orm.joinedload(Order.order_items).joinedload(OrderItem.product),
-                sqlalchemy.orm.joinedload(Order.order_items).joinedload(OrderItem.vendor),
-                sqlalchemy.orm.joinedload(Order.payment_details),
-                sqlalchemy.orm.joinedload(Order.shipping_details),
-                sqlalchemy.orm.joinedload(Order.customer),
+        )
+        any_items = select(OrderItem.id).where(OrderItem.order_id == Order.id)
+        statement = (
+            update(self.model)
+            .where(self.model.status == OrderStatusEnum.PROCESSING.value)
+            .where(any_items.exists())
+            .where(~open_items.exists())
+            .values(
+                {Order.STATUS: OrderStatusEnum.SHIPPED.value, "updated_timestamp": func.now()}
             )
-            .order_by(Order.id.desc())
-            .all()
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
         )
-        return query
+        if order_ids is not None:
+            statement = statement.where(self.model.id.in_(order_ids))
+        promoted = await self._execute(statement)
+        order_ids = list(promoted.scalars().all())
+        await self._commit()
+        return order_ids
 
-    def get_customer_order_count(self, customer_id: int) -> int:
-        
-        count = (
-            self._db.query(self.model)
-            .filter(Order.customer_id == customer_id)
-            .count()
+    async def get_orders_by_customer(
+        self, customer_id: int, cursor: Optional[str] = None, limit: int = 20
+    ) -> Page:
+        return await self._paginate(
+            self._select("OrderReturn").where(Order.customer_id == customer_id),
+            {"id": Order.id},
+            cursor,
+            limit,
         )
-        return count
+
+    async def get_customer_order_count(self, customer_id: int) -> int:
+
+        count = await self._execute(
+            select(func.count(self.model.id)).where(Order.customer_id == customer_id)
+        )
+        return count.scalar_one()
 
 
 class CRUDOrderItem(CRUDBase[OrderItem, OrderItemsCreate, OrderItemsCreate]):
 
-    def get_by_order_id(self, order_id: int) -> Optional[List[OrderItem]]:
-        query = self._db.query(self.model).filter(self.model.order_id == order_id).all()
+    LOAD_PROFILES = {
+        "VendorOrderReturn": (
+            sqlalchemy.orm.joinedload(OrderItem.order).joinedload(Order.customer),
+            sqlalchemy.orm.joinedload(OrderItem.product),
+        ),
+    }
+
+    async def get_by_order_id(self, order_id: int) -> Optional[List[OrderItem]]:
+        query = await self._all(
+            select(self.model).where(self.model.order_id == order_id)
+        )
         return query if query else None
 
-    async def get_order_items_by_vendor_id(
-        self, vendor_id: int
-    ) -> List[OrderItem]:
-        query = (
-            self._db.query(self.model)
-            .filter(self.model.vendor_id == vendor_id)
-            .options(
-                sqlalchemy.orm.joinedload(self.model.order).joinedload(Order.customer),
-                sqlalchemy.orm.joinedload(self.model.product),
+    def _vendor_keys(self):
+        return {
+            "created_timestamp": self.model.created_timestamp,
+            "id": self.model.id,
+        }
+
+    async def get_order_items_page_by_vendor_id(
+        self, vendor_id: int, cursor: Optional[str] = None, limit: int = 20
+    ) -> Page:
+        return await self._paginate(
+            self._select("VendorOrderReturn").where(self.model.vendor_id == vendor_id),
+            self._vendor_keys(),
+            cursor,
+            limit,
+        )
+
+    # pg_advisory_xact_lock(class, vendor_id) namespace for rollup refreshes
+    SALES_LOCK_CLASS = 7301
+
+    def _sales_day(self):
+        return cast(func.timezone("UTC", self.model.created_timestamp), Date)
+
+    def _sales(self, paid: Optional[bool] = None):
+        amount = self.model.price * self.model.quantity
+        is_paid = PaymentDetails.status == StatusEnum.SUCCESS.value
+        if paid:
+            return (
+                func.coalesce(func.sum(amount).filter(is_paid), 0),
+                func.count(self.model.id).filter(is_paid),
             )
-            .join(Order, self.model.order)
-            .order_by(self.model.id.desc())
-            .all()
-        )
-        return query
-
-    async def get_order_items_by_vendor_id_and_date(
-        self, vendor_id, days: int = 30, limit: int = 20, skip: int = 0
-    ) -> Optional[List[OrderItem]]:
-        query_date = datetime.utcnow() - timedelta(days=days)
-
-        query = (
-            self._db.query(self.model)
-            .filter(self.model.vendor_id == vendor_id)
-            .filter(self.model.created_timestamp >= query_date)
-            .join(Order, self.model.order)
-            .join(PaymentDetails, Order.payment_details)
-            .filter(PaymentDetails.status == StatusEnum.SUCCESS)
-            .limit(limit)
-            .offset(skip)
-            .all()
+        return func.coalesce(func.sum(amount), 0), func.count(self.model.id)
+
+    def _not_refunded(self):
+        return self.model.status != OrderStatusEnum.REFUNDED.value
+
+    async def get_sales_days(self, *order_ids: int) -> List[Tuple[int, date]]:
+        rows = await self._execute(
+            select(self.model.vendor_id, self._sales_day())
+            .where(self.model.order_id.in_(order_ids))
+            .distinct()
         )
-        return query if query else None
+        return [tuple(row) for row in rows.all()]
+
+    async def refresh_vendor_sales(self, vendor_days: Iterable[Tuple[int, date]]):
+        """Recompute the vendor_daily_sales rows for the given (vendor, day) pairs."""
+        vendor_days = sorted(set(vendor_days))
+        if not vendor_days:
+            return
+        # Serialise refreshes per vendor; each statement then sees every
+        # item committed before it got the lock
+        for vendor_id in sorted({vendor_id for vendor_id, _ in vendor_days}):
+            await self._execute(
+                select(func.pg_advisory_xact_lock(self.SALES_LOCK_CLASS, vendor_id))
+            )
+
+        keys = sqlalchemy.values(
+            sqlalchemy.column("vendor_id", Integer),
+            sqlalchemy.column("day", Date),
+            name="keys",
+        ).data(vendor_days)
+        day_start = func.timezone("UTC", cast(keys.c.day, DateTime))
+        total_sales, total_orders = self._sales()
+        paid_sales, paid_orders = self._sales(paid=True)
+        rollup = (
+            select(
+                keys.c.vendor_id,
+                keys.c.day,
+                total_sales,
+                total_orders,
+                paid_sales,
+                paid_orders,
+            )
+            .select_from(keys)
+            .outerjoin(
+                self.model,
+                and_(
+                    self.model.vendor_id == keys.c.vendor_id,
+                    self.model.created_timestamp >= day_start,
+                    self.model.created_timestamp < day_start + timedelta(days=1),
+                    self._not_refunded(),
+                ),
+            )
+            .outerjoin(PaymentDetails, PaymentDetails.order_id == self.model.order_id)
+            .group_by(keys.c.vendor_id, keys.c.day)
+        )
+        columns = [
+            "vendor_id",
+            "day",
+            "total_sales",
+            "total_orders",
+            "paid_sales",
+            "paid_orders",
+        ]
+        statement = insert(VendorDailySales).from_select(columns, rollup)
+        statement = statement.on_conflict_do_update(
+            index_elements=[VendorDailySales.vendor_id, VendorDailySales.day],
+            set_={
+                **{column: statement.excluded[column] for column in columns[2:]},
+                "updated_timestamp": func.now(),
+            },
+        )
+        await self._execute(statement)
+        await self._commit()
+
+    async def refresh_vendor_sales_for_order(self, order_id: int):
+        await self.refresh_vendor_sales(await self.get_sales_days(order_id))
+
+    async def get_vendor_sales(
+        self, vendor_id: int, since: Optional[date] = None, paid: bool = False
+    ) -> Tuple[int, int]:
+        """Total sales and item count for a vendor, from the daily rollup."""
+        sales, orders = (
+            (VendorDailySales.paid_sales, VendorDailySales.paid_orders)
+            if paid
+            else (VendorDailySales.total_sales, VendorDailySales.total_orders)
+        )
+        statement = select(
+            func.coalesce(func.sum(sales), 0),
+            func.coalesce(func.sum(orders), 0),
+            func.count(),
+        ).where(VendorDailySales.vendor_id == vendor_id)
+        if since:
+            statement = statement.where(VendorDailySales.day >= since)
+        total_sales, total_orders, days = (await self._execute(statement)).one()
+        if days:
+            return int(total_sales), int(total_orders)
+
+        # Nothing rolled up for the vendor yet: aggregate the items directly
+        statement = (
+            select(*self._sales(paid=paid))
+            .outerjoin(PaymentDetails, PaymentDetails.order_id == self.model.order_id)
+            .where(self.model.vendor_id == vendor_id)
+            .where(self._not_refunded())
+        )
+        if since:
+            statement = statement.where(self._sales_day() >= since)
+        total_sales, total_orders = (await self._execute(statement)).one()
+        return int(total_sales), int(total_orders)
+
+    async def get_sales_series(
+        self,
+        vendor_id: int,
+        start: datetime,
+        end: datetime,
+        granularity: GranularityEnum,
+        breakdown: Optional[SalesBreakdownEnum] = None,
+    ) -> List:
+        """Paid, non-refunded sales in [start, end) per UTC `granularity` bucket,
+        optionally per product or category."""
+        bucket = func.date_trunc(
+            granularity.value, func.timezone("UTC", self.model.created_timestamp)
+        ).label("bucket")
+        group = []
+        if breakdown == SalesBreakdownEnum.PRODUCT:
+            group = [
+                self.model.product_id.label("group_id"),
+                Product.product_name.label("group_name"),
+            ]
+        elif breakdown == SalesBreakdownEnum.CATEGORY:
+            group = [
+                ProductCategory.id.label("group_id"),
+                ProductCategory.category_name.label("group_name"),
+            ]
+        statement = (
+            select(
+                bucket,
+                *group,
+                func.sum(self.model.price * self.model.quantity).label("sales"),
+                func.sum(self.model.quantity).label("units"),
+                func.count(self.model.order_id.distinct()).label("orders"),
+            )
+            .join(PaymentDetails, PaymentDetails.order_id == self.model.order_id)
+            .where(PaymentDetails.status == StatusEnum.SUCCESS.value)
+            .where(self.model.vendor_id == vendor_id)
+            .where(self.model.created_timestamp >= start)
+            .where(self.model.created_timestamp < end)
+            .where(self._not_refunded())
+            .group_by(bucket, *group)
+            .order_by(bucket, *group)
+        )
+        if breakdown is not None:
+            statement = statement.join(Product, Product.id == self.model.product_id)
+        if breakdown == SalesBreakdownEnum.CATEGORY:
+            statement = statement.outerjoin(
+                ProductCategory, ProductCategory.id == Product.product_category_id
+            )
+        rows = await self._execute(statement)
+        return rows.all()
 
 
 class CRUDShippingDetails(
@@ -110,29 +323,109 @@ class CRUDPaymentDetails(
     CRUDBase[PaymentDetails, PaymentDetailsCreate, PaymentDetailsCreate]
 ):
 
-    def get_by_payment_ref(self, payment_ref: str) -> Optional[PaymentDetails]:
-        query = (
-            self._db.query(self.model)
-            .filter(self.model.payment_ref == payment_ref)
-            .first()
+    async def get_by_payment_ref(self, payment_ref: str) -> Optional[PaymentDetails]:
+        query = await self._first(
+            select(self.model).where(self.model.payment_ref == payment_ref)
         )
         return query if query else None
 
+    async def get_confirmation(self, payment_ref: str):
+        """The (order_id, pickup_code) paid by `payment_ref`, None if not recorded."""
+        result = await self._execute(
+            select(self.model.order_id, Order.pickup_code)
+            .join(Order, Order.id == self.model.order_id)
+            .where(self.model.payment_ref == payment_ref)
+            .where(self.model.status == StatusEnum.SUCCESS.value)
+        )
+        return result.first()
+
+    async def get_payment_method(self, order_id: int) -> Optional[str]:
+        """The payment method checkout recorded for `order_id`."""
+        result = await self._execute(
+            select(self.model.payment_method).where(self.model.order_id == order_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def record_payment(
+        self, data_obj: PaymentDetailsCreate
+    ) -> Optional[PaymentDetails]:
+        """Record the order's payment as successful; None if it already was.
+
+        Checkout leaves a pending row for online payments, which this turns
+        successful. Webhooks and verify polls race to confirm the same payment;
+        the conditional upsert lets only one of them change the row.
+        """
+        values = data_obj.model_dump(exclude_none=True)
+        statement = insert(self.model).values(**values)
+        result = await self._execute(
+            statement.on_conflict_do_update(
+                index_elements=[self.model.order_id],
+                set_={
+                    **{
+                        column: statement.excluded[column]
+                        for column in values
+                        if column != "order_id"
+                    },
+                    "updated_timestamp": func.now(),
+                },
+                where=self.model.status != StatusEnum.SUCCESS.value,
+            ).returning(self.model)
+        )
+        payment = result.scalars().first()
+        await self._commit()
+        return payment
+
+    async def set_payment_ref(self, order_id: int, payment_ref: str):
+        await self._execute(
+            update(self.model)
+            .where(self.model.order_id == order_id)
+            .values(payment_ref=payment_ref, updated_timestamp=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        await self._commit()
+
+    async def lock_pending(
+        self,
+        order_ids: List[int],
+        statuses: Iterable[StatusEnum] = (StatusEnum.PENDING,),
+    ) -> List[int]:
+        """Lock the payments of `order_ids` whose status is in `statuses`.
+
+        Returns the orders of the locked payments.
+        """
+        locked = await self._execute(
+            select(self.model.order_id)
+            .where(self.model.order_id.in_(order_ids))
+            .where(self.model.status.in_([status.value for status in statuses]))
+            .order_by(self.model.order_id)
+            .with_for_update()
+        )
+        return list(locked.scalars().all())
 
-crud_order = CRUDOrder(db=get_db(), model=Order)
+    async def get_stale_pending(
+        self, before: datetime, limit: int
+    ) -> List[PaymentDetails]:
+        """Online payments still pending since before `before`, oldest first."""
+        return await self._all(
+            select(self.model)
+            .where(self.model.status == StatusEnum.PENDING.value)
+            .where(self.model.created_timestamp < before)
+            .order_by(self.model.created_timestamp)
+            .limit(limit)
+        )
 
 
-def get_crud_order(db=Depends(get_db)) -> CRUDOrder:
+def get_crud_order(db=Depends(get_async_db)) -> CRUDOrder:
     return CRUDOrder(db=db, model=Order)
 
 
-def get_crud_order_item(db=Depends(get_db)) -> CRUDOrderItem:
+def get_crud_order_item(db=Depends(get_async_db)) -> CRUDOrderItem:
     return CRUDOrderItem(db=db, model=OrderItem)
 
 
-def get_crud_shipping_details(db=Depends(get_db)) -> CRUDShippingDetails:
+def get_crud_shipping_details(db=Depends(get_async_db)) -> CRUDShippingDetails:
     return CRUDShippingDetails(db=db, model=ShippingDetails)
 
 
-def get_crud_payment_details(db=Depends(get_db)) -> CRUDPaymentDetails:
+def get_crud_payment_details(db=Depends(get_async_db)) -> CRUDPaymentDetails:
     return CRUDPaymentDetails(db=db, model=PaymentDetails)
@@ -1,8 +1,8 @@
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends
-from sqlalchemy import desc
+from sqlalchemy import desc, select
 
-from core.db import get_db
+from core.db import get_async_db
 from core.errors import InvalidRequest
 from crud.base import CRUDBase
 from models.auth_user import OTP
@@ -26,12 +26,12 @@ class CRUDOtp(CRUDBase[OTP, OTPCreate, OTPCreate]):
             no_of_tries=no_of_tries + 1,
         )
         self._db.add(new_otp)
-        self._db.commit()
-        self._db.refresh(new_otp)
+        await self._commit()
+        await self._refresh(new_otp)
         return True
 
     async def verify_otp(self, token, auth_id, otp_type) -> bool:
-        otp_query = self.get_by_auth_id(auth_id)
+        otp_query = await self.get_by_auth_id(auth_id)
         if otp_query is None or otp_query.otp != token:
             return False
         if otp_query.otp_type != otp_type:
@@ -48,17 +48,13 @@ class CRUDOtp(CRUDBase[OTP, OTPCreate, OTPCreate]):
         return True
 
     async def check_number_of_trials(self, auth_id):
-        otp_query = (
-            self._db.query(self.model)
-            .filter(self.model.auth_id == auth_id)
+        otp_query = await self._first(
+            select(self.model)
+            .where(self.model.auth_id == auth_id)
             .order_by(desc(self.model.id))
-            .first()
         )
         return otp_query
 
 
-crud_otp = CRUDOtp(db=get_db(), model=OTP)
-
-
-def get_crud_otp(db=Depends(get_db)):
+def get_crud_otp(db=Depends(get_async_db)):
     return CRUDOtp(db=db, model=OTP)
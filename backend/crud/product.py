@@ -1,14 +1,25 @@
-from typing import List, Union
+import re
+from typing import List, Optional, Union
 from fastapi import Depends
-from sqlalchemy import desc
+from sqlalchemy import Float, case, desc, func, or_, select, update
 
 import sqlalchemy
 import sqlalchemy.orm
 
-from core.db import get_db
-from core.errors import MissingResources
-from crud.base import CRUDBase
-from models import Product, ProductCategory, ProductImage, ProductReview, ProductTemplate
+from core.db import get_async_db
+from core.errors import InvalidRequest, MissingResources
+from crud.base import CRUDBase, Page
+from models import (
+    Order,
+    OrderItem,
+    Product,
+    ProductCategory,
+    ProductImage,
+    ProductReview,
+    ProductTemplate,
+    Vendor,
+)
+from schemas.base import StockStatusEnum
 from schemas import (
     ProductCreate,
     ProductUpdate,
@@ -23,80 +34,301 @@ from schemas import (
 
 class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
 
-    def get_all_products_public(
-        self, search: str | None, skip=0, limit=10
-    ) -> Union[List[Product], None]:
-
-        product_query = (
-            self._db.query(self.model)
-            .filter(self.model.product_name.ilike(f"%{search}%"))
-            .filter(self.model.product_status == True)
-            .order_by(desc(self.model.created_timestamp))
-            .offset(skip)
-            .limit(limit)
-            .options(sqlalchemy.orm.joinedload(self.model.reviews))
-            .options(sqlalchemy.orm.joinedload(self.model.vendor))
-        ).all()
-
-        return product_query if product_query else None
-
-    def get_products_for_vendor(
-        self, vendor_id: int, search: str | None, skip=0, limit=10
-    ) -> Union[List[Product], None]:
-
-        product_query = (
-            self._db.query(self.model)
-            .filter(self.model.vendor_id == vendor_id)
-            .filter(self.model.product_name.ilike(f"%{search}%"))
-            .filter(self.model.product_status == True)
-            .order_by(desc(self.model.created_timestamp))
-            .offset(skip)
-            .limit(limit)
-            .all()
+    LOAD_PROFILES = {
+        "ProductReturn": (
+            sqlalchemy.orm.selectinload(Product.product_images),
+            sqlalchemy.orm.joinedload(Product.category),
+        ),
+        "ProductsReturn": (
+            sqlalchemy.orm.selectinload(Product.product_images),
+            sqlalchemy.orm.joinedload(Product.category),
+            sqlalchemy.orm.joinedload(Product.vendor),
+        ),
+    }
+
+    def _search(self, statement, search: str | None):
+        """Filter by `search` and return the statement with its pagination keys.
+
+        Every word is prefix-matched (`iph` finds "Iphone") against the
+        search_vector index, ranked by ts_rank. Substring matches on the name
+        are kept as a fallback; those are served by the pg_trgm index in
+        production.
+        """
+        keys = {
+            "created_timestamp": self.model.created_timestamp,
+            "id": self.model.id,
+        }
+        if not search or not search.strip():
+            return statement, keys
+
+        terms = re.findall(r"\w+", search.lower())
+        name_match = self.model.product_name.icontains(search.strip(), autoescape=True)
+        if not terms:
+            return statement.where(name_match), keys
+
+        query = func.to_tsquery("english", " & ".join(f"{term}:*" for term in terms))
+        rank = func.coalesce(func.ts_rank(self.model.search_vector, query), 0).cast(
+            Float
         )
-
-        return product_query if product_query else None
-
-    def sort_product_by_price(self, skip: int = 0, limit: int = 20) -> List[Product]:
-        product_query = (
-            self._db.query(self.model)
-            .order_by(desc(self.model.price))
-            .offset(skip)
-            .limit(limit)
-            .all()
+        statement = statement.where(
+            or_(self.model.search_vector.op("@@")(query), name_match)
+        ).options(sqlalchemy.orm.with_expression(self.model.search_rank, rank))
+        return statement, {"search_rank": rank, **keys}
+
+    async def get_all_products_public(
+        self, search: str | None, cursor: str | None = None, limit=10
+    ) -> Page:
+        statement, keys = self._search(
+            self._select("ProductsReturn").where(self.model.product_status == True),
+            search,
+        )
+        return await self._paginate(statement, keys, cursor, limit)
+
+    async def get_products_for_vendor(
+        self, vendor_id: int, search: str | None, cursor: str | None = None, limit=10
+    ) -> Page:
+        statement, keys = self._search(
+            self._select("ProductReturn")
+            .where(self.model.vendor_id == vendor_id)
+            .where(self.model.product_status == True),
+            search,
+        )
+        return await self._paginate(statement, keys, cursor, limit)
+
+    async def sort_product_by_price(
+        self, cursor: str | None = None, limit: int = 20
+    ) -> Page:
+        return await self._paginate(
+            self._select("ProductReturn"),
+            {"price": self.model.price, "id": self.model.id},
+            cursor,
+            limit,
         )
-        return product_query
 
-    def get_active_products(self, id: int) -> Product:
-        query_result = (
-            self._db.query(self.model)
-            .options(sqlalchemy.orm.joinedload(self.model.product_images))
-            .options(sqlalchemy.orm.joinedload(self.model.category))
-            .options(sqlalchemy.orm.joinedload(self.model.reviews))
-            .options(sqlalchemy.orm.joinedload(self.model.vendor))
-            .filter(self.model.id == id)
-            .first()
+    async def get_active_products(self, id: int) -> Product:
+        query_result = await self._first(
+            self._select("ProductsReturn").where(self.model.id == id)
         )
         if not query_result or not query_result.product_status:
             raise MissingResources
         return query_result
 
-    def get_single_product_by_id(self, id: int):
-        query_result = (
-            self._db.query(Product)
-            .options(sqlalchemy.orm.joinedload(Product.product_images))
-            .options(sqlalchemy.orm.joinedload(Product.category))
-            .filter(Product.id == id)
-            .first()
+    async def get_by_ids(self, ids: List[int]) -> List[Product]:
+        return await self._all(select(self.model).where(self.model.id.in_(ids)))
+
+    async def get_single_product_by_id(self, id: int):
+        query_result = await self._first(
+            self._select("ProductReturn").where(Product.id == id)
         )
 
         return query_result if query_result else None
 
+    def _order_quantities(self, order_ids: List[int]):
+        return (
+            select(OrderItem.product_id, func.sum(OrderItem.quantity).label("quantity"))
+            .where(OrderItem.order_id.in_(order_ids))
+            .group_by(OrderItem.product_id)
+            .subquery()
+        )
+
+    async def _claim_orders(self, order_ids: List[int], current, new) -> List[int]:
+        claimed = await self._execute(
+            update(Order)
+            .where(Order.id.in_(order_ids))
+            .where(
+                Order.stock_status.is_(None)
+                if current is None
+                else Order.stock_status == current.value
+            )
+            .values({Order.STOCK_STATUS: new.value})
+            .returning(Order.id)
+        )
+        return list(claimed.scalars().all())
+
+    async def reserve_stock(self, order_id: int) -> List[int]:
+        """Decrement stock for every item of an order in one transaction.
+
+        All-or-nothing: if any product is short the transaction is rolled back
+        (the caller's whole transaction block, if inside one) and InvalidRequest
+        is raised. Idempotent per order; a repeat call returns [].
+        """
+        if not await self._claim_orders([order_id], None, StockStatusEnum.RESERVED):
+            await self._commit()
+            return []
+
+        quantities = self._order_quantities([order_id])
+        # Lock in id order so concurrent checkouts can't deadlock each other
+        locked = await self._execute(
+            select(self.model.id)
+            .where(self.model.id.in_(select(quantities.c.product_id)))
+            .order_by(self.model.id)
+            .with_for_update()
+        )
+        product_ids = list(locked.scalars().all())
+        reserved = await self._execute(
+            update(self.model)
+            .where(self.model.id == quantities.c.product_id)
+            .where(self.model.stock >= quantities.c.quantity)
+            .values(stock=self.model.stock - quantities.c.quantity)
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        if len(reserved.scalars().all()) != len(product_ids):
+            short = await self._execute(
+                select(self.model.product_name)
+                .where(self.model.id == quantities.c.product_id)
+                .where(self.model.stock < quantities.c.quantity)
+            )
+            names = ", ".join(short.scalars().all())
+            await self._rollback()
+            raise InvalidRequest(f"Not enough stock left for: {names}")
+        await self._commit()
+        return product_ids
+
+    async def release_stock(self, *order_ids: int) -> List[int]:
+        """Give back the stock of reserved orders in one statement.
+
+        Orders whose stock isn't reserved are skipped, so this is idempotent;
+        returns the ids of the products restocked.
+        """
+        claimed = await self._claim_orders(
+            list(order_ids), StockStatusEnum.RESERVED, StockStatusEnum.RELEASED
+        )
+        if not claimed:
+            await self._commit()
+            return []
+
+        quantities = self._order_quantities(claimed)
+        # Same lock order as reserve_stock, so a release can't deadlock a checkout
+        await self._execute(
+            select(self.model.id)
+            .where(self.model.id.in_(select(quantities.c.product_id)))
+            .order_by(self.model.id)
+            .with_for_update()
+        )
+        released = await self._execute(
+            update(self.model)
+            .where(self.model.id == quantities.c.product_id)
+            .values(stock=self.model.stock + quantities.c.quantity)
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        product_ids = list(released.scalars().all())
+        await self._commit()
+        return product_ids
+
+    def _rating_summary(self, model, total_delta: float, count_delta: int):
+        # Both expressions read the row's current values, so the update is
+        # atomic and concurrent reviews can't lose each other's increments
+        count = model.rating_count + count_delta
+        return {
+            model.rating_count: count,
+            model.rating_avg: case(
+                (count == 0, 0.0),
+                else_=(model.rating_avg * model.rating_count + total_delta) / count,
+            ),
+        }
+
+    async def apply_review_rating(
+        self, product_id: int, total_delta: float, count_delta: int = 0
+    ):
+        """Fold a review change into the product's and its vendor's rating summary.
+
+        `total_delta` is the change in the sum of ratings, `count_delta` the
+        change in the number of reviews: (rating, 1) for a new review,
+        (new - old, 0) for an edited one.
+        """
+        updated = await self._execute(
+            update(self.model)
+            .where(self.model.id == product_id)
+            .values(self._rating_summary(self.model, total_delta, count_delta))
+            .returning(self.model.vendor_id)
+            .execution_options(synchronize_session=False)
+        )
+        vendor_id = updated.scalar_one()
+        await self._execute(
+            update(Vendor)
+            .where(Vendor.id == vendor_id)
+            .values(self._rating_summary(Vendor, total_delta, count_delta))
+            .execution_options(synchronize_session=False)
+        )
+        await self._commit()
+
+    async def refresh_rating_summaries(self) -> int:
+        """Recompute every rating summary from the reviews, correcting drift.
+
+        Only rows whose summary differs are written. Returns how many products
+        were corrected.
+        """
+        count = (
+            select(func.count(ProductReview.id))
+            .where(ProductReview.product_id == self.model.id)
+            .scalar_subquery()
+        )
+        avg = (
+            select(func.coalesce(func.avg(ProductReview.rating), 0.0))
+            .where(ProductReview.product_id == self.model.id)
+            .scalar_subquery()
+        )
+        products = await self._execute(
+            update(self.model)
+            .where(or_(self.model.rating_count != count, self.model.rating_avg != avg))
+            .values({self.model.rating_count: count, self.model.rating_avg: avg})
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        corrected = len(products.scalars().all())
+
+        vendor_count = (
+            select(func.coalesce(func.sum(self.model.rating_count), 0))
+            .where(self.model.vendor_id == Vendor.id)
+            .scalar_subquery()
+        )
+        vendor_avg = (
+            select(
+                func.coalesce(
+                    func.sum(self.model.rating_avg * self.model.rating_count)
+                    / func.nullif(func.sum(self.model.rating_count), 0),
+                    0.0,
+                )
+            )
+            .where(self.model.vendor_id == Vendor.id)
+            .scalar_subquery()
+        )
+        await self._execute(
+            update(Vendor)
+            .where(or_(Vendor.rating_count != vendor_count, Vendor.rating_avg != vendor_avg))
+            .values({Vendor.rating_count: vendor_count, Vendor.rating_avg: vendor_avg})
+            .execution_options(synchronize_session=False)
+        )
+        await self._commit()
+        return corrected
+
 
 class CRUDProductReview(
     CRUDBase[ProductReview, ProductReviewCreate, ProductReviewUpdate]
 ):
-    pass
+    async def lock_rating(self, review_id: int):
+        """Lock a review for an edit, returning its (product_id, rating)."""
+        review = await self._execute(
+            select(self.model.product_id, self.model.rating)
+            .where(self.model.id == review_id)
+            .with_for_update()
+        )
+        row = review.first()
+        if row is None:
+            raise MissingResources
+        return row
+
+    async def get_reviews_page(
+        self, product_id: int, cursor: Optional[str] = None, limit: int = 20
+    ) -> Page:
+        return await self._paginate(
+            select(self.model).where(self.model.product_id == product_id),
+            {"created_timestamp": self.model.created_timestamp, "id": self.model.id},
+            cursor,
+            limit,
+        )
 
 
 class CRUDProductImage(CRUDBase[ProductImage, ProductImageCreate, ProductImageCreate]):
@@ -106,57 +338,49 @@ class CRUDProductImage(CRUDBase[ProductImage, ProductImageCreate, ProductImageCr
 class CRUDProductCategory(
     CRUDBase[ProductCategory, ProductCategoryCreate, ProductCategoryCreate]
 ):
-    def get_by_category_name(self, category_name):
-        query = (
-            self._db.query(self.model)
-            .filter(self.model.category_name == category_name)
-            .first()
+    async def get_by_category_name(self, category_name):
+        query = await self._first(
+            select(self.model).where(self.model.category_name == category_name)
         )
         return query if query else None
 
 class CRUDProductTemplate(CRUDBase[ProductTemplate, ProductTemplateCreate, ProductTemplateUpdate]):
-    def get_templates_by_vendor(
+    async def get_templates_by_vendor(
         self, vendor_id: int
     ) -> Union[List[ProductTemplate], None]:
-        templates = (
-            self._db.query(self.model)
-            .filter(self.model.vendor_id == vendor_id)
+        templates = await self._all(
+            select(self.model)
+            .where(self.model.vendor_id == vendor_id)
             .order_by(desc(self.model.created_timestamp))
-            .all()
         )
         return templates if templates else None
 
-    def get_template_by_id_and_vendor(
+    async def get_template_by_id_and_vendor(
         self, template_id: int, vendor_id: int
     ) -> Union[ProductTemplate, None]:
-        template = (
-            self._db.query(self.model)
-            .filter(self.model.id == template_id)
-            .filter(self.model.vendor_id == vendor_id)
-            .first()
+        template = await self._first(
+            select(self.model)
+            .where(self.model.id == template_id)
+            .where(self.model.vendor_id == vendor_id)
         )
         return template if template else None
 
 
-crud_product_image = CRUDProductImage(db=get_db(), model=ProductImage)
-crud_product_category = CRUDProductCategory(db=get_db(), model=ProductCategory)
-
-
-def get_crud_product(db=Depends(get_db)) -> CRUDProduct:
+def get_crud_product(db=Depends(get_async_db)) -> CRUDProduct:
     return CRUDProduct(db=db, model=Product)
 
 
-def get_crud_product_image(db=Depends(get_db)) -> CRUDProductImage:
+def get_crud_product_image(db=Depends(get_async_db)) -> CRUDProductImage:
     return CRUDProductImage(db=db, model=ProductImage)
 
 
-def get_crud_product_category(db=Depends(get_db)) -> CRUDProductCategory:
+def get_crud_product_category(db=Depends(get_async_db)) -> CRUDProductCategory:
     return CRUDProductCategory(db=db, model=ProductCategory)
 
 
-def get_crud_product_review(db=Depends(get_db)) -> CRUDProductReview:
+def get_crud_product_review(db=Depends(get_async_db)) -> CRUDProductReview:
     return CRUDProductReview(db=db, model=ProductReview)
 
 
-def get_crud_product_template(db=Depends(get_db)) -> CRUDProductTemplate:
+def get_crud_product_template(db=Depends(get_async_db)) -> CRUDProductTemplate:
     return CRUDProductTemplate(db=db, model=ProductTemplate)
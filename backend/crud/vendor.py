@@ -1,6 +1,6 @@
 from fastapi import Depends
 
-from core.db import get_db
+from core.db import get_async_db
 from crud.base import CRUDBase
 from models import Vendor
 from schemas import VendorCreate
@@ -10,5 +10,5 @@ class CRUDVendor(CRUDBase[Vendor, VendorCreate, VendorCreate]):
     pass
 
 
-def get_crud_vendor(db=Depends(get_db)):
+def get_crud_vendor(db=Depends(get_async_db)):
     return CRUDVendor(db=db, model=Vendor)
@@ -1,22 +1,29 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from core.middleware import start_up_db
-from core.db import Base, engine
-import models  # ensure models are imported so metadata is populated
+from core.http import http_clients
+from core.migrations import run_migrations
 from api.endpoints import router
+from task_queue.main import close_queue_pool, create_queue_pool
 from pathlib import Path
 
-app = FastAPI()
-
 
-@app.on_event("startup")
-def start_up():
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     start_up_db()
-    # Create all tables once at startup (no Alembic usage).
-    Base.metadata.create_all(bind=engine)
+    run_migrations()
+    app.state.queue_connection = await create_queue_pool()
+    yield
+    await close_queue_pool(app.state.queue_connection)
+    await http_clients.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.include_router(router)
 
 Path("static/uploads").mkdir(parents=True, exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
\ No newline at end of file
+app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -7,7 +7,7 @@ from .vendor import *
 
 from core.db import engine  # noqa: F401
 
-# Table creation is handled at app startup (see main.py) to avoid
+# The schema is migrated at app startup (see core/migrations.py) to avoid
 # concurrent create_all calls from multiple containers.
 # Uncomment the lines below if you want to force create_all here (not recommended in multi-container setups).
 # auth_user.Base.metadata.create_all(bind=engine)
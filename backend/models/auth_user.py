@@ -6,6 +6,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     TIMESTAMP,
@@ -55,7 +56,7 @@ class RefreshToken(Base):
         ForeignKey("auth_details.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
     )
-    refresh_token = Column(String, nullable=False)
+    refresh_token = Column(String, nullable=False, index=True)
     active = Column(Boolean, default=True)
     user_agent = Column(String, nullable=True)
     created_timestamp = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
@@ -80,3 +81,8 @@ class OTP(Base):
     expires_on = Column(
         TIMESTAMP(timezone=True), server_default=text("now() + interval '14 days'")
     )
+
+    __table_args__ = (
+        # verify_otp / check_number_of_trials read an account's latest OTP
+        Index("ix_otp_auth_id_id", auth_id, id),
+    )
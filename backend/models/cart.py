@@ -5,6 +5,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     TIMESTAMP,
     text,
@@ -20,6 +21,7 @@ class Cart(Base):
     product_id = Column(
         ForeignKey(column="products.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
     )
     customer_id = Column(
         ForeignKey(column="customers.id", ondelete="CASCADE", onupdate="CASCADE"),
@@ -31,3 +33,7 @@ class Cart(Base):
 
     customer = relationship("Customer", back_populates="cart_items")
     product = relationship(Product, back_populates="cart_items")
+
+    __table_args__ = (
+        Index("ix_cart_customer_id_product_id", customer_id, product_id),
+    )
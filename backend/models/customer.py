@@ -20,6 +20,7 @@ class Customer(Base):
     auth_id = Column(
         ForeignKey(column="auth_details.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
     )
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
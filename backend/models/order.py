@@ -3,8 +3,11 @@ from typing import ClassVar
 
 from core.db import Base
 from sqlalchemy import (
+    BigInteger,
     Column,
+    Date,
     ForeignKey,
+    Index,
     Integer,
     String,
     TIMESTAMP,
@@ -18,6 +21,7 @@ class Order(Base):
     __tablename__ = "orders"
 
     STATUS: ClassVar[str] = "status"
+    STOCK_STATUS: ClassVar[str] = "stock_status"
 
     id = Column(Integer, primary_key=True, nullable=False)
 
@@ -30,6 +34,8 @@ class Order(Base):
     total_amount = Column(Integer, nullable=False)
     pickup_code = Column(String, nullable=True, unique=True)
     status = Column(String, default="processing")
+    # Null until checkout reserves stock, see CRUDProduct.reserve_stock
+    stock_status = Column(String, nullable=True)
     order_date = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
     updated_timestamp = Column(TIMESTAMP(timezone=True), nullable=True)
 
@@ -40,6 +46,16 @@ class Order(Base):
     shipping_details = relationship("ShippingDetails", back_populates="order")
     customer = relationship(Customer)
 
+    __table_args__ = (
+        Index("ix_orders_customer_id_id", customer_id, id),
+        # Only processing orders are candidates for promotion to shipped
+        Index(
+            "ix_orders_status_processing",
+            status,
+            postgresql_where=text("status = 'processing'"),
+        ),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -54,6 +70,7 @@ class OrderItem(Base):
         Integer,
         ForeignKey("products.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
     )
     vendor_id = Column(
         Integer,
@@ -70,6 +87,41 @@ class OrderItem(Base):
     product = relationship("Product")
     vendor = relationship("Vendor")
 
+    __table_args__ = (
+        # Keyset pages of a vendor's items; the included columns also let the
+        # vendor sales analytics aggregates run as index-only scans
+        Index(
+            "ix_order_items_vendor_id_created_timestamp_id",
+            vendor_id,
+            created_timestamp,
+            id,
+            postgresql_include=["order_id", "product_id", "price", "quantity", "status"],
+        ),
+        Index("ix_order_items_order_id_status", order_id, status),
+    )
+
+
+class VendorDailySales(Base):
+    """Per-vendor, per-day (UTC) sales rollup of order_items, excluding refunds.
+
+    `total_*` counts every item still on an order, `paid_*` only items whose
+    payment succeeded. Rows are recomputed by CRUDOrderItem.refresh_vendor_sales.
+    """
+
+    __tablename__ = "vendor_daily_sales"
+
+    vendor_id = Column(
+        Integer,
+        ForeignKey("vendors.id", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    day = Column(Date, primary_key=True)
+    total_sales = Column(BigInteger, nullable=False, default=0)
+    total_orders = Column(Integer, nullable=False, default=0)
+    paid_sales = Column(BigInteger, nullable=False, default=0)
+    paid_orders = Column(Integer, nullable=False, default=0)
+    updated_timestamp = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
+
 
 class PaymentDetails(Base):
     __tablename__ = "payment_details"
@@ -90,6 +142,15 @@ class PaymentDetails(Base):
 
     order = relationship("Order", back_populates="payment_details")
 
+    __table_args__ = (
+        # Online payments awaiting the provider, swept by the reconciliation job
+        Index(
+            "ix_payment_details_pending_created_timestamp",
+            created_timestamp,
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
 
 class ShippingDetails(Base):
     __tablename__ = "shipping_details"
@@ -98,6 +159,7 @@ class ShippingDetails(Base):
         Integer,
         ForeignKey(column="orders.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
     )
     contact_information = Column(String, nullable=False)
     additional_note = Column(String, nullable=True)
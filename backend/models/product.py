@@ -2,16 +2,20 @@ from __future__ import annotations
 from email.policy import default
 from typing import ClassVar
 
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import query_expression, relationship
 from sqlalchemy import (
+    DDL,
     TEXT,
     Boolean,
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     TIMESTAMP,
+    event,
     text,
     Float,
 )
@@ -38,13 +42,21 @@ class Product(Base):
     stock = Column(Integer, nullable=False)
     price = Column(Integer, nullable=False)
     pickup_time = Column(String, nullable=True)  # e.g., "10:00-14:00" or "After 5PM"
+    # Review summary, kept in step by CRUDProduct.apply_review_rating
+    rating_avg = Column(Float, nullable=False, server_default=text("0"))
+    rating_count = Column(Integer, nullable=False, server_default=text("0"))
     created_timestamp = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
     updated_timestamp = Column(DateTime, nullable=True)
     product_category_id = Column(
         Integer,
         ForeignKey("product_category.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
     )
+    # Maintained by the products_search_vector trigger, see PRODUCT_SEARCH_DDL
+    search_vector = Column(TSVECTOR, nullable=True)
+    # Populated with ts_rank by search queries, used as their pagination key
+    search_rank = query_expression()
 
     vendor = relationship("Vendor", backref="products")
     cart_items = relationship("Cart", back_populates="product")
@@ -52,6 +64,26 @@ class Product(Base):
     category = relationship("ProductCategory", back_populates="products")
     reviews = relationship("ProductReview")
 
+    # The pg_trgm indexes on product_name / category_name are migration-only,
+    # since they need the extension installed.
+    __table_args__ = (
+        Index("ix_products_search_vector", search_vector, postgresql_using="gin"),
+        Index(
+            "ix_products_vendor_id_created_timestamp_id",
+            vendor_id,
+            created_timestamp,
+            id,
+        ),
+        Index("ix_products_price_id", price, id),
+        # The public catalog only ever lists active products
+        Index(
+            "ix_products_active_created_timestamp_id",
+            created_timestamp,
+            id,
+            postgresql_where=text("product_status"),
+        ),
+    )
+
 
 class ProductCategory(Base):
     __tablename__ = "product_category"
@@ -65,6 +97,48 @@ class ProductCategory(Base):
     products = relationship(Product, back_populates="category")
 
 
+# Weighted document: name (A) > category name (B) > descriptions (C). The
+# category name lives in another table, so a generated column can't hold it;
+# renaming a category touches product_category_id to re-fire the trigger.
+PRODUCT_SEARCH_DDL = """
+CREATE OR REPLACE FUNCTION products_search_vector_refresh() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.product_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT category_name FROM product_category
+             WHERE id = NEW.product_category_id), '')), 'B') ||
+        setweight(to_tsvector('english',
+            coalesce(NEW.short_description, '') || ' ' ||
+            coalesce(NEW.long_description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_search_vector ON products;
+CREATE TRIGGER products_search_vector
+    BEFORE INSERT OR UPDATE OF
+        product_name, short_description, long_description, product_category_id
+    ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector_refresh();
+
+CREATE OR REPLACE FUNCTION product_category_search_vector_refresh() RETURNS trigger AS $$
+BEGIN
+    UPDATE products SET product_category_id = product_category_id
+    WHERE product_category_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_category_search_vector ON product_category;
+CREATE TRIGGER product_category_search_vector
+    AFTER UPDATE OF category_name ON product_category
+    FOR EACH ROW EXECUTE FUNCTION product_category_search_vector_refresh();
+"""
+
+event.listen(Product.__table__, "after_create", DDL(PRODUCT_SEARCH_DDL))
+
+
 class ProductImage(Base):
     __tablename__ = "product_image"
 
@@ -74,6 +148,7 @@ class ProductImage(Base):
         Integer,
         ForeignKey("products.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
     )
     created_timestamp = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
     updated_timestamp = Column(DateTime, nullable=True)
@@ -95,6 +170,15 @@ class ProductReview(Base):
     created_timestamp = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
     updated_timestamp = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index(
+            "ix_product_reviews_product_id_created_timestamp_id",
+            product_id,
+            created_timestamp,
+            id,
+        ),
+    )
+
 class ProductTemplate(Base):
     __tablename__ = "product_templates"
 
@@ -120,4 +204,12 @@ class ProductTemplate(Base):
     updated_timestamp = Column(DateTime, nullable=True)
 
     vendor = relationship("Vendor", backref="product_templates")
-    category = relationship("ProductCategory", backref="product_templates")
\ No newline at end of file
+    category = relationship("ProductCategory", backref="product_templates")
+
+    __table_args__ = (
+        Index(
+            "ix_product_templates_vendor_id_created_timestamp",
+            vendor_id,
+            created_timestamp,
+        ),
+    )
@@ -3,6 +3,7 @@ from __future__ import annotations
 from sqlalchemy import (
     Column,
     DateTime,
+    Float,
     ForeignKey,
     Integer,
     String,
@@ -20,6 +21,7 @@ class Vendor(Base):
         Integer,
         ForeignKey(column="auth_details.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
     )
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
@@ -31,6 +33,9 @@ class Vendor(Base):
     bio = Column(String, nullable=False)
     profile_picture = Column(String, nullable=True)
     ratings = Column(Integer, nullable=True)
+    # Summary of the reviews on all of the vendor's products
+    rating_avg = Column(Float, nullable=False, server_default=text("0"))
+    rating_count = Column(Integer, nullable=False, server_default=text("0"))
     order_time = Column(String, nullable=True)
     created_timestamp = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
     updated_timestamp = Column(DateTime, nullable=True)
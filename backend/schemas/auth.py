@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import ClassVar, Optional
 
-from pydantic import BaseModel, EmailStr, Field, model_validator
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, model_validator
 
 from core.errors import InvalidRequest
 from core.schema import Tokens
@@ -51,6 +52,25 @@ class AuthUserResponse(ReturnBaseModel):
     is_superuser: bool = Field(False, hidden_from_schema=True)
 
 
+class Principal(BaseModel):
+    """Cacheable view of an AuthUser; everything but the password hash."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    role_id: Optional[int] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: str
+    phone_number: Optional[str] = None
+    email_verified: bool = False
+    phone_verified: bool = False
+    default_role: Roles
+    is_superuser: bool = False
+    created_timestamp: Optional[datetime] = None
+    updated_timestamp: Optional[datetime] = None
+
+
 class RegisterAuthUserResponse(BaseModel):
     auth_user: AuthUserResponse
     tokens: Tokens
@@ -2,7 +2,7 @@
 
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Dict, Optional
 from typing_extensions import Annotated
 from pydantic import BaseModel, StringConstraints
 
@@ -73,6 +73,11 @@ class StatusEnum(str, Enum):
     PENDING = "pending"
 
 
+class StockStatusEnum(str, Enum):
+    RESERVED = "reserved"
+    RELEASED = "released"
+
+
 class OrderStatusEnum(str, Enum):
     PROCESSING = "processing"
     SHIPPED = "shipped"
@@ -80,6 +85,17 @@ class OrderStatusEnum(str, Enum):
     REFUNDED = "refunded"
 
 
+class GranularityEnum(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+
+
+class SalesBreakdownEnum(str, Enum):
+    PRODUCT = "product"
+    CATEGORY = "category"
+
+
 class ProductOptionalBase(BaseModel):
     sku: Optional[str] = None
     product_category_id: Optional[int] = None
@@ -99,3 +115,22 @@ class CustomerVendorReturnBase(ReturnBaseModel):
 
 class HealthResponse(BaseModel):
     msg: str
+
+
+class CacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    hit_ratio: float
+
+
+class ReconciliationRun(BaseModel):
+    started_at: datetime
+    checked: int
+    confirmed: int
+    expired: int
+    waiting: int
+    # Paid, but not the order's amount or currency; left pending for review
+    mismatched: int = 0
+    errors: int
+    released_products: int
+    timings_ms: Dict[str, float]
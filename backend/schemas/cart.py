@@ -24,7 +24,8 @@ class CartReturn(ReturnBaseModel):
     customer_id: int
     total_amount: Optional[float] = None
     product: ProductReturn
-    customer: CustomerReturn
+    # Not loaded for carts kept in Redis
+    customer: Optional[CustomerReturn] = None
 
 
 class CartTotalAmount(CartReturn):
@@ -38,6 +39,22 @@ class CartSummary(BaseModel):
     cart_items: List[CartReturn]
 
 
+class CartLine(BaseModel):
+    product_id: int
+    product_name: str
+    price: int
+    stock: int
+    quantity: int
+    line_total: int
+    product_image: Optional[str] = None
+
+
+class CartSummaryLite(BaseModel):
+    total_items_quantity: int
+    total_amount: float
+    cart_items: List[CartLine]
+
+
 class CartUpdateReturn(BaseModel):
     product_id: int
     quantity: int
@@ -74,6 +74,19 @@ class CheckoutCreate(BaseModel):
     shipping_details: Optional[ShippingDetailsCreate] = None
 
 
+class ProviderPayment(BaseModel):
+    """A payment as reported by the provider's verify API or webhook."""
+
+    status: StatusEnum
+    order_id: Optional[int] = None
+    payment_ref: Optional[str] = None
+    payment_method: Optional[PaymentMethodEnum] = None
+    amount: Optional[float] = None
+    currency: Optional[str] = None
+    paid_at: Optional[datetime] = None
+    customer_email: Optional[str] = None
+
+
 class PaymentVerified(BaseModel):
     payment_verified: bool = True
     order_id: Optional[int] = None
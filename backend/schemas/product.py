@@ -14,6 +14,8 @@ class VendorLocationInfo(BaseModel):
     state: str
     country: str
     order_time: Optional[str] = None
+    rating_avg: float = 0
+    rating_count: int = 0
 
 
 class ProductImageCreate(BaseModel):
@@ -57,7 +59,8 @@ class ProductReturn(ReturnBaseModel, ProductCreate):
 
 
 class ProductsReturn(ProductReturn):
-    reviews: Optional[list["ProductReviewReturn"]] = []
+    rating_avg: float = 0
+    rating_count: int = 0
     vendor: Optional[VendorLocationInfo] = None
 
 
@@ -1,10 +1,16 @@
 """Vendor Schema"""
 
 from __future__ import annotations
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
 from pydantic import AnyHttpUrl, BaseModel, Field
 
-from schemas.base import CreateBaseModel, CustomerVendorReturnBase
+from schemas.base import (
+    CreateBaseModel,
+    CustomerVendorReturnBase,
+    GranularityEnum,
+    SalesBreakdownEnum,
+)
 from schemas.order import OrderItemsReturn, OrderReturn
 
 
@@ -20,6 +26,8 @@ class VendorReturn(CustomerVendorReturnBase):
     profile_picture: Optional[AnyHttpUrl] = None
     ratings: Optional[int] = None
     order_time: Optional[str] = None
+    rating_avg: float = 0
+    rating_count: int = 0
 
 
 class VendorUpdate(BaseModel):
@@ -41,6 +49,23 @@ class TotalSalesReturn(BaseModel):
     total_orders: int
 
 
+class SalesSeriesPoint(BaseModel):
+    bucket: datetime
+    group_id: Optional[int] = None
+    group_name: Optional[str] = None
+    sales: int
+    units: int
+    orders: int
+
+
+class SalesAnalyticsReturn(BaseModel):
+    start: datetime
+    end: datetime
+    granularity: GranularityEnum
+    breakdown: Optional[SalesBreakdownEnum] = None
+    points: List[SalesSeriesPoint]
+
+
 class OrdersWithCustomerDetails(OrderItemsReturn):
 
     order: OrderReturn
@@ -2,13 +2,15 @@ from arq import ArqRedis
 from fastapi import BackgroundTasks, Header
 from fastapi.security import OAuth2PasswordRequestForm
 
+from core.cache import PrincipalCache
 from core.errors import InvalidRequest, MissingResources, ResourcesExist
+from core.revocation import TokenRevocationList
 from core.schema import RefreshTokenCreate
 from core.tokens import (
     create_forget_password_token,
     deactivate_token,
     generate_tokens,
-    verify_access_token,
+    verify_active_token,
 )
 from crud import CRUDAuthUser, CRUDRefreshToken, CRUDOtp, CRUDCustomer, CRUDVendor
 from models import AuthUser
@@ -40,6 +42,8 @@ class AuthUserService:
         queue_connection: ArqRedis,
         crud_customer: CRUDCustomer,
         crud_vendor: CRUDVendor,
+        revocation_list: TokenRevocationList,
+        principal_cache: PrincipalCache,
     ):
         self.crud_auth_user = crud_auth_user
         self.crud_refresh_token = crud_refresh_token
@@ -47,6 +51,8 @@ class AuthUserService:
         self.queue_connection = queue_connection
         self.crud_customer = crud_customer
         self.crud_vendor = crud_vendor
+        self.revocation_list = revocation_list
+        self.principal_cache = principal_cache
 
     async def register_auth_user(
         self,
@@ -55,7 +61,7 @@ class AuthUserService:
         user_agent: str = Header(None),
     ):
         data_obj.email = data_obj.email.lower()
-        email = self.crud_auth_user.get_by_email(data_obj.email)
+        email = await self.crud_auth_user.get_by_email(data_obj.email)
         if email:
             raise ResourcesExist("Email Exists")
         data_obj.password = hash_password(data_obj.password)
@@ -86,7 +92,9 @@ class AuthUserService:
         form_data: OAuth2PasswordRequestForm,
         user_agent: str = Header(None),
     ):
-        user_query = self.crud_auth_user.get_by_email(email=form_data.username.lower())
+        user_query = await self.crud_auth_user.get_by_email(
+            email=form_data.username.lower()
+        )
         if not user_query:
             raise InvalidRequest("Incorrect Credentials")
 
@@ -98,6 +106,7 @@ class AuthUserService:
             user_id=user_query.id,
             user_agent=user_agent,
             default_role=user_query.default_role,
+            role_id=user_query.role_id,
         )
         token_obj = RefreshTokenCreate(
             refresh_token=tokens.refresh_token,
@@ -111,7 +120,7 @@ class AuthUserService:
         self,
         data_obj: OTPCreate,
     ):
-        self.crud_auth_user.get_or_raise_exception(id=data_obj.auth_id)
+        await self.crud_auth_user.get_or_raise_exception(id=data_obj.auth_id)
         otp_verify = await self.crud_otp.verify_otp(
             auth_id=data_obj.auth_id, token=data_obj.token, otp_type=data_obj.otp_type
         )
@@ -125,6 +134,7 @@ class AuthUserService:
             await self.crud_auth_user.update(
                 id=data_obj.auth_id, data_obj={AuthUser.PHONE_VERIFIED: True}
             )
+        await self.principal_cache.invalidate(data_obj.auth_id)
         return OtpVerified(verified=True)
 
     async def forget_password(
@@ -133,7 +143,7 @@ class AuthUserService:
         user_agent: str,
         background_tasks: BackgroundTasks,
     ):
-        user_query = self.crud_auth_user.get_by_email(data_obj.email.lower())
+        user_query = await self.crud_auth_user.get_by_email(data_obj.email.lower())
         if not user_query:
             raise MissingResources()
         otp_query = await self.crud_otp.check_number_of_trials(user_query.id)
@@ -161,20 +171,30 @@ class AuthUserService:
 
     async def reset_password(self, data_obj: NewPassword, token: str):
 
-        token_data = verify_access_token(token)
-        user_query = self.crud_auth_user.get_or_raise_exception(id=token_data.user_id)
+        token_data = await verify_active_token(token, self.revocation_list)
+        user_query = await self.crud_auth_user.get_or_raise_exception(
+            id=token_data.user_id
+        )
         if verify_password(data_obj.password, hashed_password=user_query.password):
             raise InvalidRequest("Can't change password to old password")
         data_obj.password = hash_password(data_obj.password)
         await self.crud_auth_user.update(id=token_data.user_id, data_obj=data_obj)
-        deactivate_token(auth_id=user_query.id, token=token)
+        await deactivate_token(
+            auth_id=user_query.id,
+            token=token,
+            crud_refresh_token=self.crud_refresh_token,
+            revocation_list=self.revocation_list,
+        )
         await self.crud_otp.delete_by_auth_id(auth_id=token_data.user_id)
 
         return ResetPassword()
 
-    async def change_password(
-        self, data_obj: ChangePassword, current_user_id: int, current_user_password: str
-    ):
+    async def change_password(self, data_obj: ChangePassword, current_user_id: int):
+        # The cached principal carries no password hash
+        user_query = await self.crud_auth_user.get_or_raise_exception(
+            id=current_user_id
+        )
+        current_user_password = user_query.password
         if not verify_password(
             plain_password=data_obj.old_password, hashed_password=current_user_password
         ):
@@ -194,8 +214,8 @@ class AuthUserService:
 
     async def check_if_username_exists(self, username: str):
 
-        if self.crud_customer.get_by_username(
+        if await self.crud_customer.get_by_username(
             username
-        ) or self.crud_vendor.get_by_username(username):
+        ) or await self.crud_vendor.get_by_username(username):
             return True
         return False
@@ -1,9 +1,11 @@
-from typing import List, Tuple
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 from arq import ArqRedis
 
-from core.errors import InvalidRequest
-from core.paystack import PaystackClient
-from core.stripe_payment import StripeClient
+from core.cart_store import CartStore
+from core.errors import InvalidRequest, MissingResources
+from core.payment_provider import PROVIDER_FOR_METHOD, PaymentProvider
 from crud import (
     CRUDAuthUser,
     CRUDProduct,
@@ -14,21 +16,23 @@ from crud import (
     CRUDOrderItem,
     CRUDVendor,
 )
-from models import AuthUser
-from schemas.base import PaymentMethodEnum, StatusEnum
+from models import AuthUser, PaymentDetails, Product
+from schemas.base import PaymentMethodEnum, StatusEnum, StockStatusEnum
 from schemas import (
     CartCreate,
+    CartReturn,
     CartUpdate,
     CheckoutCreate,
     OrderCreate,
     OrderItemsCreate,
     PaymentDetailsCreate,
     PaymentVerified,
+    ProductReturn,
+    ProviderPayment,
 )
 import logging
-import httpx
 from utils.random_id import generate_pickup_code
-from utils.postmark_client import send_postmark_email
+from utils.timing import PhaseTimer
 from core import settings
 
 
@@ -45,8 +49,8 @@ class CartService:
         crud_payment: CRUDPaymentDetails,
         crud_order_item: CRUDOrderItem,
         crud_vendor: CRUDVendor,
-        paystack: PaystackClient,
-        stripe: StripeClient,
+        payment_providers: Dict[str, PaymentProvider],
+        cart_store: Optional[CartStore] = None,
     ):
         self.crud_auth_user = crud_auth_user
         self.crud_product = crud_product
@@ -56,13 +60,24 @@ class CartService:
         self.crud_payment = crud_payment
         self.crud_order_item = crud_order_item
         self.crud_vendor = crud_vendor
-        self.paystack = paystack
         self.queue_connection = queue_connection
-        self.stripe = stripe
+        self.payment_providers = payment_providers
+        # Set when CART_STORAGE is "redis"; carts then live in Redis
+        self.cart_store = cart_store
 
     async def create_cart(self, data_obj: CartCreate, customer_id: int):
-        product = self.crud_product.get_or_raise_exception(data_obj.product_id)
-        cart_item = self.crud_cart.get_by_product_id_and_customer_id(
+        if self.cart_store is not None:
+            await self._load_cart(customer_id)
+            product, stock = await self._cart_product(data_obj.product_id)
+            if data_obj.quantity > stock:
+                raise InvalidRequest(f"Stocks Available: {stock}")
+            line = await self.cart_store.add(customer_id, product, data_obj.quantity)
+            if line is None:
+                raise InvalidRequest("Already add item to cart")
+            return line
+
+        product = await self.crud_product.get_or_raise_exception(data_obj.product_id)
+        cart_item = await self.crud_cart.get_by_product_id_and_customer_id(
             product_id=data_obj.product_id, customer_id=customer_id
         )
 
@@ -71,11 +86,22 @@ class CartService:
         data_obj.customer_id = customer_id
         if data_obj.quantity > product.stock:
             raise InvalidRequest(f"Stocks Available: {product.stock}")
-        cart = await self.crud_cart.create(data_obj)
+        await self.crud_cart.create(data_obj)
 
-        return cart
+        return await self.crud_cart.get_by_product_id_and_customer_id(
+            product_id=data_obj.product_id, customer_id=customer_id
+        )
 
     async def update_cart(self, data_obj: CartUpdate, customer_id: int):
+        if self.cart_store is not None:
+            line = await self._cart_line(customer_id, data_obj.product_id)
+            _, stock = await self._cart_product(data_obj.product_id)
+            if data_obj.quantity > stock:
+                raise InvalidRequest(f"{stock} item stock Left")
+            line["quantity"] = data_obj.quantity
+            await self.cart_store.update(customer_id, line)
+            return line
+
         product = await self.crud_cart.check_if_product_id_exist_in_cart(
             customer_id=customer_id, product_id=data_obj.product_id
         )
@@ -93,33 +119,149 @@ class CartService:
         return updated_cart
 
     async def delete_cart_item(self, product_id: int, customer_id: int):
+        if self.cart_store is not None:
+            await self._cart_line(customer_id, product_id)
+            await self.cart_store.remove(customer_id, product_id)
+            return
+
         await self.crud_cart.check_if_product_id_exist_in_cart(
             customer_id=customer_id, product_id=product_id
         )
 
-        await self.crud_cart.delete_cart_item_by_product_id(product_id=product_id)
+        await self.crud_cart.delete_cart_item_by_product_id(
+            product_id=product_id, customer_id=customer_id
+        )
 
     async def clear_cart(self, customer_id: int):
+        if self.cart_store is not None:
+            await self.cart_store.clear(customer_id)
         await self.crud_cart.clear_cart(customer_id)
 
     async def get_cart_summary(self, customer_id: int):
-        cart_summary = await self.crud_cart.get_cart_summary(customer_id=customer_id)
-        return cart_summary
+        if self.cart_store is None:
+            return await self.crud_cart.get_cart_summary(customer_id=customer_id)
+
+        lines = await self._load_cart(customer_id)
+        if not lines:
+            raise MissingResources("No items in cart")
+        return {
+            "total_items_quantity": sum(line["quantity"] for line in lines),
+            "total_amount": sum(
+                line["quantity"] * line["product"]["price"] for line in lines
+            ),
+            "cart_items": lines,
+        }
+
+    async def get_cart_summary_lite(self, customer_id: int):
+        if self.cart_store is None:
+            return await self.crud_cart.get_cart_summary_lite(customer_id=customer_id)
+
+        summary = await self.get_cart_summary(customer_id)
+        summary["cart_items"] = [
+            {
+                "product_id": line["product_id"],
+                "product_name": line["product"]["product_name"],
+                "price": line["product"]["price"],
+                "stock": line["product"]["stock"],
+                "quantity": line["quantity"],
+                "line_total": line["quantity"] * line["product"]["price"],
+                "product_image": next(
+                    (
+                        image["product_image"]
+                        for image in line["product"]["product_images"]
+                    ),
+                    None,
+                ),
+            }
+            for line in summary["cart_items"]
+        ]
+        return summary
+
+    async def _load_cart(self, customer_id: int) -> List[dict]:
+        """The customer's Redis cart, hydrated from the cart table on first use."""
+        lines = await self.cart_store.lines(customer_id)
+        if lines is None:
+            items = await self.crud_cart.get_cart_items_by_customer_id(customer_id)
+            lines = [
+                CartReturn.model_validate(item, from_attributes=True).model_dump(
+                    mode="json", exclude={"customer"}
+                )
+                for item in items or []
+            ]
+            await self.cart_store.hydrate(customer_id, lines)
+        return lines
+
+    async def _cart_line(self, customer_id: int, product_id: int) -> dict:
+        for line in await self._load_cart(customer_id):
+            if line["product_id"] == product_id:
+                return line
+        raise InvalidRequest("Product doesn't exist in cart")
+
+    async def _cart_product(self, product_id: int) -> Tuple[dict, int]:
+        """A product's snapshot and stock, from Redis or else Postgres."""
+        product, stock = await self.cart_store.product(product_id)
+        if product is None or stock is None:
+            found = await self.crud_product.get_single_product_by_id(product_id)
+            if not found:
+                raise MissingResources
+            product = ProductReturn.model_validate(found, from_attributes=True).model_dump(
+                mode="json"
+            )
+            stock = found.stock
+            await self.cart_store.cache_product(product, stock)
+        return product, stock
+
+    async def _checkout_lines(
+        self, customer_id: int
+    ) -> Tuple[List[Tuple[Product, int]], int]:
+        """The cart's (product, quantity) pairs and total, priced from Postgres."""
+        if self.cart_store is None:
+            cart_summary = await self.crud_cart.get_cart_summary(
+                customer_id=customer_id, profile="Checkout"
+            )
+            return [
+                (item.product, item.quantity) for item in cart_summary["cart_items"]
+            ], cart_summary["total_amount"]
+
+        lines = await self._load_cart(customer_id)
+        if not lines:
+            raise MissingResources("No items in cart")
+        # Snapshots may be stale: reconcile with the current products
+        products = {
+            product.id: product
+            for product in await self.crud_product.get_by_ids(
+                [line["product_id"] for line in lines]
+            )
+        }
+        products_and_quantity = []
+        for line in lines:
+            product = products.get(line["product_id"])
+            if product is None or not product.product_status:
+                raise InvalidRequest(
+                    f"{line['product']['product_name']} is no longer available"
+                )
+            products_and_quantity.append((product, line["quantity"]))
+        total_amount = sum(
+            product.price * quantity for product, quantity in products_and_quantity
+        )
+        return products_and_quantity, total_amount
 
     async def checkout(
         self,
         data_obj: CheckoutCreate,
         current_user: AuthUser,
     ):
+        timer = PhaseTimer()
 
-        cart_summary = await self.crud_cart.get_cart_summary(
-            customer_id=current_user.role_id
-        )
-        customer = self.crud_customer.get(id=current_user.role_id)
+        with timer.phase("load"):
+            products_and_quantity_in_cart, total_amount = await self._checkout_lines(
+                current_user.role_id
+            )
+            customer = await self.crud_customer.get(id=current_user.role_id)
 
-        existing_order_count = self.crud_order.get_customer_order_count(
-            customer_id=current_user.role_id
-        )
+            existing_order_count = await self.crud_order.get_customer_order_count(
+                customer_id=current_user.role_id
+            )
 
         next_order_number = existing_order_count + 1
 
@@ -127,13 +269,9 @@ class CartService:
         order_data_obj = OrderCreate(
             customer_id=current_user.role_id,
             customer_order_number=next_order_number,
-            total_amount=cart_summary["total_amount"],
+            total_amount=total_amount,
             pickup_code=generate_pickup_code(),
         )
-        products_and_quantity_in_cart: List[Tuple] = [
-            (products.product, products.quantity)
-            for products in cart_summary["cart_items"]
-        ]
 
         for product, quantity in products_and_quantity_in_cart:
             if quantity > product.stock:
@@ -141,248 +279,373 @@ class CartService:
                     f"{product.product_name} has: {product.stock} stocks left"
                 )
 
-        order = await self.crud_order.create(order_data_obj)
-        
-        # Create order items SYNCHRONOUSLY before clearing cart
-        for product, quantity in products_and_quantity_in_cart:
-            order_item = OrderItemsCreate(
-                order_id=order.id,
-                vendor_id=product.vendor_id,
-                price=product.price,
-                quantity=quantity,
-                product_id=product.id,
-            )
-            await self.crud_order_item.create(order_item)
-        
-        # Shipping details can still be async (pass order.id, not the object)
-        await self.queue_connection.enqueue_job(
-            "add_shipping_details", order.id, data_obj.shipping_details
-        )
-        
-        paystack_metadata = {"order": order, "customer": customer}
-        if (
-            data_obj.payment_details.payment_method == PaymentMethodEnum.CARD
-            or data_obj.payment_details.payment_method
-            == PaymentMethodEnum.BANK_TRANSFER
-        ):
-            paystack_rsp = await self.paystack.initialize_payment(
-                amount=int(cart_summary["total_amount"]),
-                email=current_user.email,
-                channel=data_obj.payment_details.payment_method,
-                **paystack_metadata,
-            )
-            # surface order tracking details along with the payment init response
-            paystack_rsp["order_id"] = order.id
-            paystack_rsp["pickup_code"] = order.pickup_code
-            await self.queue_connection.enqueue_job("update_stock_after_checkout", order.id)
-            await self.crud_cart.clear_cart(current_user.role_id)
-            return paystack_rsp
-        elif data_obj.payment_details.payment_method == PaymentMethodEnum.STRIPE:
-            stripe_rsp = await self.stripe.create_checkout_session(
-                amount=cart_summary["total_amount"],
-                email=current_user.email,
-                order=order,
-                customer=customer,
-                success_url=f"frontend://checkout/success?session_id={{CHECKOUT_SESSION_ID}}",
-                cancel_url="frontend://checkout/cancel",
-            )
-
-            stripe_rsp["order_id"] = order.id
-            stripe_rsp["pickup_code"] = order.pickup_code
-            await self.queue_connection.enqueue_job("update_stock_after_checkout", order.id)
-            await self.crud_cart.clear_cart(current_user.role_id)
-
-            return stripe_rsp
-        payment_details_obj = PaymentDetailsCreate(
-            order_id=order.id,
-            payment_method=data_obj.payment_details.payment_method,
-            amount=order.total_amount,
-        )
-        await self.crud_payment.create(payment_details_obj)
-
-        await self.queue_connection.enqueue_job("update_stock_after_checkout", order.id)
-        await self.crud_cart.clear_cart(current_user.role_id)
-        return order
-
-    async def verify_order_payment(
-        self,
-        payment_ref: str,
-    ):
-        payment_details = self.crud_payment.get_by_payment_ref(payment_ref=payment_ref)
-
-        if payment_details:
-            raise InvalidRequest("Payment Already Successful")
+        payment_method = data_obj.payment_details.payment_method
+        # None for payments collected offline (cash)
+        provider = PROVIDER_FOR_METHOD.get(payment_method)
+
+        # Order, items, stock reservation and payment row: one commit
+        with timer.phase("persist"):
+            async with self.crud_order.transaction():
+                order = await self.crud_order.create(order_data_obj)
+                await self.crud_order_item.bulk_insert(
+                    [
+                        OrderItemsCreate(
+                            order_id=order.id,
+                            vendor_id=product.vendor_id,
+                            price=product.price,
+                            quantity=quantity,
+                            product_id=product.id,
+                        )
+                        for product, quantity in products_and_quantity_in_cart
+                    ]
+                )
+                reserved_product_ids = await self.crud_product.reserve_stock(order.id)
+                # Online payments stay pending until the provider confirms them
+                await self.crud_payment.create(
+                    PaymentDetailsCreate(
+                        order_id=order.id,
+                        payment_method=payment_method,
+                        amount=order.total_amount,
+                        status=(
+                            StatusEnum.PROCESSING
+                            if provider is None
+                            else StatusEnum.PENDING
+                        ),
+                    )
+                )
 
-        payment_rsp = await self.paystack.verify_payment(payment_ref=payment_ref)
-        order_id = payment_rsp["metadata"]["order_id"]
-        pickup_code = payment_rsp["metadata"].get("pickup_code")
-        pay_method = payment_rsp.get("channel")
+        # Failing past the commit cancels the order, so a retry (with the same
+        # Idempotency-Key or not) doesn't reserve the stock a second time
+        try:
+            with timer.phase("sales_rollup"):
+                await self.crud_order_item.refresh_vendor_sales_for_order(order.id)
+
+            with timer.phase("enqueue"):
+                if reserved_product_ids:
+                    await self.queue_connection.enqueue_job(
+                        "stock_event",
+                        StockStatusEnum.RESERVED.value,
+                        order.id,
+                        reserved_product_ids,
+                    )
+                # Shipping details can still be async (pass order.id, not the object)
+                await self.queue_connection.enqueue_job(
+                    "add_shipping_details", order.id, data_obj.shipping_details
+                )
 
-        match payment_rsp["status"]:
-            case StatusEnum.ABADONED:
+            with timer.phase("payment"):
+                if provider is not None:
+                    rsp = await self.payment_providers[provider].initialize_payment(
+                        amount=total_amount,
+                        email=current_user.email,
+                        order=order,
+                        customer=customer,
+                        payment_method=payment_method,
+                    )
+                    if rsp.get("payment_ref"):
+                        await self.crud_payment.set_payment_ref(
+                            order.id, rsp["payment_ref"]
+                        )
+                    # surface order tracking details with the payment init response
+                    rsp["order_id"] = order.id
+                    rsp["pickup_code"] = order.pickup_code
+                else:
+                    rsp = order
+        except BaseException:
+            await self._abort_checkout(order.id)
+            raise
+
+        with timer.phase("clear_cart"):
+            # The order stands now that payment started; a leftover cart is
+            # better than failing a checkout the customer may already be paying
+            try:
+                await self.clear_cart(current_user.role_id)
+            except Exception:
+                logging.exception("Clearing the cart after order %s failed", order.id)
+
+        logging.info("Checkout order=%s timings_ms=%s", order.id, timer.timings)
+        return rsp
+
+    async def verify_payment(self, provider: str, payment_ref: str) -> PaymentVerified:
+        # A webhook normally recorded the payment already; ask the provider if not
+        verified = await self._recorded_payment(payment_ref)
+        if verified:
+            return verified
+
+        payment = await self.payment_providers[provider].verify_payment(payment_ref)
+        match payment.status:
+            case StatusEnum.SUCCESS:
+                return await self.confirm_payment(provider, payment)
+            case StatusEnum.ABADONED | StatusEnum.PENDING:
                 raise InvalidRequest(
                     "You have a pending transaction, Complete Your Payment"
                 )
-            case StatusEnum.FAILED:
-                await self.crud_order.delete(id=order_id)
+            case _:
+                # Only cancels the order while its payment is still pending: a
+                # stale reference or a racing webhook may have confirmed it
+                if payment.order_id:
+                    await self._expire_orders([payment.order_id])
                 raise InvalidRequest(
                     "Payment Failed, Checkout again and complete Payment "
                 )
-            case StatusEnum.SUCCESS:
-                pass
-            case _:
-                await self.crud_order.delete(id=order_id)
-                raise InvalidRequest("Contact Paystack and try again")
-
-        payment_details_obj = PaymentDetailsCreate(
-            order_id=order_id,
-            payment_method=payment_rsp["channel"],
-            amount=payment_rsp["amount"] / 100,
-            payment_ref=payment_rsp["reference"],
-            status=StatusEnum.SUCCESS,
-            paid_at=payment_rsp["paid_at"],
+
+    async def handle_webhook(
+        self, provider: str, payload: bytes, signature: Optional[str]
+    ):
+        """Confirm the order paid in a signed provider webhook, ignore other events."""
+        payment = self.payment_providers[provider].parse_webhook(payload, signature)
+        if payment is None or payment.status != StatusEnum.SUCCESS or not payment.order_id:
+            return
+        try:
+            await self.confirm_payment(provider, payment)
+        except MissingResources:
+            # Acknowledge anyway: a redelivery can't bring a cancelled order back
+            logging.warning(
+                "Payment %s confirmed for missing order %s",
+                payment.payment_ref,
+                payment.order_id,
+            )
+        except InvalidRequest:
+            # Logged by confirm_payment; a redelivery would report the same amount
+            pass
+
+    async def reconcile_pending_payments(self, timer: PhaseTimer) -> Dict[str, int]:
+        """Settle online payments still pending PAYMENT_RECONCILE_AFTER after checkout.
+
+        Paid ones are confirmed as a verify would. Pending ones are expired at
+        the provider where it supports that. Abandoned, expired or failed ones,
+        and those that never got a provider reference, have their orders
+        cancelled and their stock released in bulk. Payments still pending, or
+        whose provider couldn't be reached, are left for the next run.
+        """
+        before = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.PAYMENT_RECONCILE_AFTER
         )
-        await self.queue_connection.enqueue_job("update_stock_after_checkout", order_id)
-        await self.crud_payment.create(payment_details_obj)
+        with timer.phase("load"):
+            pending = await self.crud_payment.get_stale_pending(
+                before, settings.PAYMENT_RECONCILE_BATCH_SIZE
+            )
 
-        order = self.crud_order.get(order_id)
-        order_items = self.crud_order_item.get_by_order_id(order_id=order_id) or []
-        vendor = None
-        if order_items:
-            vendor = self.crud_vendor.get(order_items[0].vendor_id)
+        def provider_for(payment: PaymentDetails) -> str:
+            return PROVIDER_FOR_METHOD[PaymentMethodEnum(payment.payment_method)]
+
+        with timer.phase("provider"):
+            limit = asyncio.Semaphore(settings.PAYMENT_RECONCILE_CONCURRENCY)
+
+            async def provider_status(payment: PaymentDetails) -> ProviderPayment:
+                if not payment.payment_ref:
+                    return ProviderPayment(status=StatusEnum.ABADONED)
+                provider = self.payment_providers[provider_for(payment)]
+                async with limit:
+                    status = await provider.verify_payment(payment.payment_ref)
+                    if status.status == StatusEnum.PENDING:
+                        # Close a still payable checkout before its order is
+                        # cancelled, so the customer can't pay for a deleted order
+                        status = (
+                            await provider.expire_payment(payment.payment_ref)
+                            or status
+                        )
+                    return status
+
+            statuses = await asyncio.gather(
+                *(provider_status(payment) for payment in pending),
+                return_exceptions=True,
+            )
 
-        seller_name = (
-            f"{vendor.first_name} {vendor.last_name}" if vendor else "the store"
-        )
-        order_time = vendor.order_time if vendor else None
-        total_price = order.total_amount if order else payment_details_obj.amount
+        counts = dict.fromkeys(["confirmed", "waiting", "mismatched", "errors"], 0)
+        counts["checked"] = len(pending)
+        expired_ids = []
+        with timer.phase("confirm"):
+            for payment, status in zip(pending, statuses):
+                if isinstance(status, Exception):
+                    logging.warning(
+                        "Reconciling payment of order %s failed: %r",
+                        payment.order_id,
+                        status,
+                    )
+                    counts["errors"] += 1
+                elif status.status == StatusEnum.SUCCESS:
+                    # A paid order whose webhook and verify poll never arrived
+                    try:
+                        await self.confirm_payment(
+                            provider_for(payment),
+                            status.model_copy(update={"order_id": payment.order_id}),
+                        )
+                    except InvalidRequest:
+                        # Stays pending, and reported every run, until resolved
+                        counts["mismatched"] += 1
+                    else:
+                        counts["confirmed"] += 1
+                elif status.status == StatusEnum.PENDING:
+                    counts["waiting"] += 1
+                else:
+                    expired_ids.append(payment.order_id)
 
-        text_body = (
-            f"Hi,\n\nYour order has been placed for {seller_name}.\n"
-            f"Pickup code: {pickup_code}\n"
-            f"Amount: {total_price}\n"
-            f"Payment method: {pay_method}\n"
-        )
-        if order_time:
-            text_body += f"Please head to the store by: {order_time}\n"
-        text_body += "\nThank you for shopping with us."
+        with timer.phase("expire"):
+            counts["expired"], counts["released_products"] = await self._expire_orders(
+                expired_ids
+            )
+        return counts
 
-        customer_email = payment_rsp.get("customer", {}).get("email")
-        if customer_email:
-            await send_postmark_email(
-                to_email=customer_email,
-                subject="Order confirmed",
-                text_body=text_body,
+    async def _expire_orders(
+        self,
+        order_ids: List[int],
+        unpaid: Tuple[StatusEnum, ...] = (StatusEnum.PENDING,),
+    ) -> Tuple[int, int]:
+        """Cancel orders whose payment is still `unpaid`, in bulk.
+
+        Returns (orders, products restocked).
+        """
+        if not order_ids:
+            return 0, 0
+        async with self.crud_order.transaction():
+            # Row locks keep a webhook from confirming an order we're deleting
+            order_ids = await self.crud_payment.lock_pending(order_ids, unpaid)
+            product_ids = await self.crud_product.release_stock(*order_ids)
+            sales_days = await self.crud_order_item.get_sales_days(*order_ids)
+            order_ids = await self.crud_order.delete_orders(order_ids)
+        await self.crud_order_item.refresh_vendor_sales(sales_days)
+        if product_ids:
+            await self.queue_connection.enqueue_job(
+                "stock_event", StockStatusEnum.RELEASED.value, order_ids, product_ids
             )
+        return len(order_ids), len(product_ids)
 
-        # Fire-and-forget notification to notification microservice (Expo push)
-        await self._send_order_confirm_notification(
-            user_id=order.customer_id if order else payment_rsp["metadata"].get("customer_id"),
-            order_id=order_id,
+    async def _abort_checkout(self, order_id: int):
+        """Cancel an order whose checkout failed after it was committed."""
+        try:
+            # Cash orders are processing rather than pending
+            await self._expire_orders(
+                [order_id], unpaid=(StatusEnum.PENDING, StatusEnum.PROCESSING)
+            )
+        except Exception:
+            # Online orders are still expired by reconcile_pending_payments
+            logging.exception(
+                "Cancelling order %s after a failed checkout failed", order_id
+            )
+
+    async def confirm_payment(
+        self, provider: str, payment: ProviderPayment
+    ) -> PaymentVerified:
+        """Record a successful payment and notify the customer, once per order.
+
+        Shared by the verify endpoints and the provider webhooks; whichever
+        records the payment first sends the confirmations, later calls only
+        return the verified order. A payment whose amount or currency differs
+        from what checkout charged is logged and rejected with InvalidRequest.
+        """
+        order = await self.crud_order.get(payment.order_id)
+        if not order:
+            raise MissingResources(f"Order {payment.order_id} no longer exists")
+        currency = self.payment_providers[provider].currency
+        if (
+            payment.amount is None
+            or round(payment.amount * 100) != order.total_amount * 100
+            # Providers that don't report one charged in their configured currency
+            or (payment.currency and payment.currency.upper() != currency)
+        ):
+            logging.error(
+                "Payment %s of %s %s doesn't match order %s total of %s %s",
+                payment.payment_ref,
+                payment.amount,
+                payment.currency,
+                order.id,
+                order.total_amount,
+                currency,
+            )
+            raise InvalidRequest("Payment amount doesn't match the order")
+        if payment.payment_method is None:
+            # A channel without a PaymentMethodEnum: keep the one chosen at checkout
+            stored = await self.crud_payment.get_payment_method(order.id)
+            payment = payment.model_copy(
+                update={
+                    "payment_method": (
+                        PaymentMethodEnum(stored) if stored else PaymentMethodEnum.CARD
+                    )
+                }
+            )
+
+        recorded = await self.crud_payment.record_payment(
+            PaymentDetailsCreate(
+                order_id=order.id,
+                payment_method=payment.payment_method,
+                amount=payment.amount,
+                payment_ref=payment.payment_ref,
+                status=StatusEnum.SUCCESS,
+                paid_at=payment.paid_at,
+            )
         )
+        if recorded:
+            await self.crud_order_item.refresh_vendor_sales_for_order(order.id)
+            await self._send_order_confirmation(order, payment)
 
         return PaymentVerified(
-            payment_verified=True, order_id=order_id, pickup_code=pickup_code
+            payment_verified=True, order_id=order.id, pickup_code=order.pickup_code
         )
 
-    async def verify_stripe_payment(
-        self,
-        session_id: str,
-    ):
-        """Verify Stripe payment after checkout session completion"""
-        # Check if payment already exists by session_id (stored as payment_ref)
-        payment_details = self.crud_payment.get_by_payment_ref(payment_ref=session_id)
-
-        if payment_details:
-            raise InvalidRequest("Payment Already Successful")
-
-        payment_rsp = await self.stripe.verify_payment(session_id=session_id)
-        order_id = int(payment_rsp["metadata"]["order_id"])
-        pickup_code = payment_rsp["metadata"].get("pickup_code")
-        pay_method = payment_rsp.get("channel", "card")
-
-        # Map Stripe status strings to StatusEnum
-        stripe_status = payment_rsp.get("status", "").lower()
-        if stripe_status == "success":
-            mapped_status = StatusEnum.SUCCESS
-        elif stripe_status == "abandoned":
-            mapped_status = StatusEnum.ABADONED
-        elif stripe_status == "failed":
-            mapped_status = StatusEnum.FAILED
-        else:
-            mapped_status = StatusEnum.FAILED
-
-        match mapped_status:
-            case StatusEnum.ABADONED:
-                raise InvalidRequest(
-                    "You have a pending transaction, Complete Your Payment"
-                )
-            case StatusEnum.FAILED:
-                await self.crud_order.delete(id=order_id)
-                raise InvalidRequest(
-                    "Payment Failed, Checkout again and complete Payment "
-                )
-            case StatusEnum.SUCCESS:
-                pass
-            case _:
-                await self.crud_order.delete(id=order_id)
-                raise InvalidRequest("Contact Stripe and try again")
-
-        payment_details_obj = PaymentDetailsCreate(
-            order_id=order_id,
-            payment_method=pay_method,
-            amount=payment_rsp["amount"],
-            payment_ref=session_id,  # Store session_id as payment_ref
-            status=StatusEnum.SUCCESS,
-            paid_at=payment_rsp.get("paid_at"),
+    async def _recorded_payment(self, payment_ref: str) -> Optional[PaymentVerified]:
+        payment = await self.crud_payment.get_confirmation(payment_ref)
+        if payment is None:
+            return None
+        return PaymentVerified(
+            payment_verified=True,
+            order_id=payment.order_id,
+            pickup_code=payment.pickup_code,
         )
-        await self.queue_connection.enqueue_job("update_stock_after_checkout", order_id)
-        await self.crud_payment.create(payment_details_obj)
 
-        order = self.crud_order.get(order_id)
-        order_items = self.crud_order_item.get_by_order_id(order_id=order_id) or []
+    async def _send_order_confirmation(self, order, payment: ProviderPayment):
+        order_items = (
+            await self.crud_order_item.get_by_order_id(order_id=order.id) or []
+        )
         vendor = None
         if order_items:
-            vendor = self.crud_vendor.get(order_items[0].vendor_id)
+            vendor = await self.crud_vendor.get(order_items[0].vendor_id)
 
         seller_name = (
             f"{vendor.first_name} {vendor.last_name}" if vendor else "the store"
         )
         order_time = vendor.order_time if vendor else None
-        total_price = order.total_amount if order else payment_details_obj.amount
 
         text_body = (
             f"Hi,\n\nYour order has been placed for {seller_name}.\n"
-            f"Pickup code: {pickup_code}\n"
-            f"Amount: {total_price}\n"
-            f"Payment method: {pay_method}\n"
+            f"Pickup code: {order.pickup_code}\n"
+            f"Amount: {order.total_amount}\n"
+            f"Payment method: {payment.payment_method.value}\n"
         )
         if order_time:
             text_body += f"Please head to the store by: {order_time}\n"
         text_body += "\nThank you for shopping with us."
 
-        # Get customer email from order
-        customer = self.crud_customer.get(id=order.customer_id) if order else None
-        customer_email = customer.email if customer else None
-        if customer_email:
-            await send_postmark_email(
-                to_email=customer_email,
-                subject="Order confirmed",
-                text_body=text_body,
+        customer_email = payment.customer_email
+        if not customer_email:
+            customer = await self.crud_customer.get(id=order.customer_id)
+            auth_user = (
+                await self.crud_auth_user.get(customer.auth_id) if customer else None
             )
+            customer_email = auth_user.email if auth_user else None
+        await self._send_order_confirm_email(order.id, customer_email, text_body)
 
-        # Fire-and-forget notification to notification microservice (Expo push)
+        # Notification microservice (Expo push), sent from the worker in batches
         await self._send_order_confirm_notification(
-            user_id=order.customer_id if order else payment_rsp["metadata"].get("customer_id"),
-            order_id=order_id,
+            user_id=order.customer_id, order_id=order.id
         )
 
-        return PaymentVerified(
-            payment_verified=True, order_id=order_id, pickup_code=pickup_code
+    async def _send_order_confirm_email(
+        self, order_id: int, customer_email: str | None, text_body: str
+    ):
+        if not customer_email:
+            return
+        # Keyed by order so a repeated verify can't send the email twice
+        await self.queue_connection.enqueue_job(
+            "send_order_confirmation_email",
+            order_id,
+            customer_email,
+            text_body,
+            _job_id=f"order-confirm-email:{order_id}",
         )
 
     async def _send_order_confirm_notification(self, user_id: int | None, order_id: int):
-        """Notify notification microservice that an order was confirmed."""
+        """Queue an order-confirmed push for the notification microservice."""
         if not settings.NOTIFICATION_SERVICE_ENABLED or not user_id:
             logging.info(
                 "[Notification] Skipping order-confirm push (enabled=%s, user_id=%s)",
@@ -391,35 +654,9 @@ class CartService:
             )
             return
 
-        payload = {
-            "user_id": str(user_id),
-            "order": {"id": str(order_id), "status": "confirmed"},
-            "data": {"type": "order-confirm", "order_id": str(order_id)},
-        }
-        url = f"{settings.NOTIFICATION_SERVICE_URL.rstrip('/')}/notify/order-confirm"
-
-        logging.info(
-            "[Notification] Sending order-confirm push | user_id=%s | order_id=%s | url=%s",
+        await self.queue_connection.enqueue_job(
+            "queue_order_confirm_push",
             user_id,
             order_id,
-            url,
+            _job_id=f"order-confirm-push:{order_id}",
         )
-
-        try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                resp = await client.post(url, json=payload)
-                if resp.status_code >= 400:
-                    # Log but don't block the main flow
-                    logging.error(
-                        "[Notification] Order confirm push failed | status=%s | body=%s",
-                        resp.status_code,
-                        resp.text,
-                    )
-                else:
-                    logging.info(
-                        "[Notification] Order confirm push sent | status=%s",
-                        resp.status_code,
-                    )
-        except Exception as exc:
-            logging.exception("[Notification] Error sending order confirm push: %s", exc)
-
@@ -27,13 +27,13 @@ class CustomerService:
         current_user: AuthUser,
     ):
 
-        auth_user = self.crud_customer.get_by_auth_id(current_user.id)
+        auth_user = await self.crud_customer.get_by_auth_id(current_user.id)
 
         if auth_user:
             raise ResourcesExist("customer exists")
         if current_user.default_role != Roles.CUSTOMER:
             raise InvalidRequest("Role must be customer to create customer account")
-        if self.crud_customer.get_by_username(data_obj.username):
+        if await self.crud_customer.get_by_username(data_obj.username):
             raise ResourcesExist("username taken")
         data_obj.auth_id = current_user.id
         customer = await self.crud_customer.create(data_obj)
@@ -1,60 +1,147 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from core import settings
+from core.cache import AnalyticsCache
 from core.errors import InvalidRequest, MissingResources
 from crud import (
     CRUDCustomer,
     CRUDOrder,
     CRUDOrderItem,
 )
-from schemas.base import OrderStatusEnum
-from schemas import OrderItemStatus
+from crud.base import Page
+from schemas.base import GranularityEnum, OrderStatusEnum, SalesBreakdownEnum
+from schemas import OrderItemStatus, SalesAnalyticsReturn, SalesSeriesPoint
 
 
 class OrderService:
 
+    BUCKET_STEPS = {
+        GranularityEnum.HOUR: timedelta(hours=1),
+        GranularityEnum.DAY: timedelta(days=1),
+        GranularityEnum.WEEK: timedelta(weeks=1),
+    }
+
     def __init__(
         self,
         crud_customer: CRUDCustomer,
         crud_order: CRUDOrder,
         crud_order_item: CRUDOrderItem,
+        analytics_cache: AnalyticsCache,
     ):
 
         self.crud_customer = crud_customer
         self.crud_order = crud_order
         self.crud_order_item = crud_order_item
+        self.analytics_cache = analytics_cache
 
-    async def get_all_orders(self, customer_id: int):
-        return await self.crud_order.get_orders_by_customer(customer_id)
+    async def get_all_orders(
+        self, customer_id: int, cursor: Optional[str], limit: int
+    ) -> Page:
+        return await self.crud_order.get_orders_by_customer(
+            customer_id, cursor=cursor, limit=limit
+        )
 
     async def vendor_dashboard(self, vendor_id: int):
 
-        order_items = await self.crud_order_item.get_order_items_by_vendor_id(
+        total_sales, total_orders = await self.crud_order_item.get_vendor_sales(
             vendor_id=vendor_id
         )
-        if not order_items:
+        if not total_orders:
             raise InvalidRequest("No Orders Completed Yet")
 
-        total_sales = sum([item.price * item.quantity for item in order_items])
-        dashboard = {"total_sales": total_sales, "total_orders": len(order_items)}
+        dashboard = {"total_sales": total_sales, "total_orders": total_orders}
 
         return dashboard
 
     async def get_sales_activity_by_date(self, days: int, vendor_id: int):
-        order_items = await self.crud_order_item.get_order_items_by_vendor_id_and_date(
-            vendor_id=vendor_id, days=days
+        total_sales, total_orders = await self.crud_order_item.get_vendor_sales(
+            vendor_id=vendor_id,
+            since=(datetime.utcnow() - timedelta(days=days)).date(),
+            paid=True,
         )
-        if not order_items:
+        if not total_orders:
             raise InvalidRequest("No Orders Completed Yet")
-        total_sales = sum([item.price * item.quantity for item in order_items])
         total_sales_and_quantity = {
             "total_sales": total_sales,
-            "total_orders": len(order_items),
+            "total_orders": total_orders,
         }
         return total_sales_and_quantity
 
-    async def get_vendors_order_items(self, vendor_id: int):
-        order_items = await self.crud_order_item.get_order_items_by_vendor_id(
-            vendor_id=vendor_id
+    @staticmethod
+    def _bucket_start(moment: datetime, granularity: GranularityEnum) -> datetime:
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        moment = moment.astimezone(timezone.utc).replace(
+            minute=0, second=0, microsecond=0
+        )
+        if granularity != GranularityEnum.HOUR:
+            moment = moment.replace(hour=0)
+        if granularity == GranularityEnum.WEEK:
+            # date_trunc('week') starts weeks on Monday
+            moment -= timedelta(days=moment.weekday())
+        return moment
+
+    async def get_sales_analytics(
+        self,
+        vendor_id: int,
+        granularity: GranularityEnum,
+        breakdown: Optional[SalesBreakdownEnum],
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> SalesAnalyticsReturn:
+        # Widen the range to whole buckets, which also keeps the cache key
+        # stable for "up to now" queries
+        step = self.BUCKET_STEPS[granularity]
+        end = self._bucket_start(end or datetime.now(timezone.utc), granularity) + step
+        start = self._bucket_start(start or end - timedelta(days=30), granularity)
+        if start >= end:
+            raise InvalidRequest("start must be before end")
+        if (end - start) / step > settings.ANALYTICS_MAX_BUCKETS:
+            raise InvalidRequest(f"Range too long for {granularity.value} buckets")
+
+        key = self.analytics_cache.key(
+            vendor_id,
+            start=start,
+            end=end,
+            granularity=granularity,
+            breakdown=breakdown,
+        )
+        cached = await self.analytics_cache.get(key)
+        if cached:
+            return SalesAnalyticsReturn.model_validate_json(cached)
+
+        rows = await self.crud_order_item.get_sales_series(
+            vendor_id=vendor_id,
+            start=start,
+            end=end,
+            granularity=granularity,
+            breakdown=breakdown,
+        )
+        analytics = SalesAnalyticsReturn(
+            start=start,
+            end=end,
+            granularity=granularity,
+            breakdown=breakdown,
+            points=[
+                SalesSeriesPoint(
+                    **{
+                        **row._mapping,
+                        "bucket": row.bucket.replace(tzinfo=timezone.utc),
+                    }
+                )
+                for row in rows
+            ],
+        )
+        await self.analytics_cache.set(key, analytics.model_dump_json())
+        return analytics
+
+    async def get_vendors_order_items(
+        self, vendor_id: int, cursor: Optional[str], limit: int
+    ) -> Page:
+        return await self.crud_order_item.get_order_items_page_by_vendor_id(
+            vendor_id=vendor_id, cursor=cursor, limit=limit
         )
-        return order_items or []
 
     async def update_order_status(
         self,
@@ -62,12 +149,17 @@ class OrderService:
         vendor_id: int,
         data_obj: OrderItemStatus,
     ):
-        order_item = self.crud_order_item.get_or_raise_exception(id=order_item_id)
+        order_item = await self.crud_order_item.get_or_raise_exception(id=order_item_id)
         if order_item.vendor_id != vendor_id:
             raise InvalidRequest("Not Your Item")
         if order_item.status == OrderStatusEnum.PROCESSING:
 
-            return await self.crud_order_item.update(
+            updated = await self.crud_order_item.update(
                 id=order_item_id, data_obj={data_obj.STATUS: data_obj.status}
             )
+            await self.crud_order.promote_shipped_orders([order_item.order_id])
+            await self.crud_order_item.refresh_vendor_sales_for_order(
+                order_item.order_id
+            )
+            return updated
         raise InvalidRequest("Item Status has been changed to Shipped or Refunded")
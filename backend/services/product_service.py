@@ -1,6 +1,10 @@
+import json
 from arq import ArqRedis
+from pydantic import TypeAdapter
 from typing import Optional
 
+from core import settings
+from core.cache import CatalogCache
 from core.errors import InvalidRequest, MissingResources
 from crud import (
     CRUDAuthUser,
@@ -10,6 +14,7 @@ from crud import (
     CRUDProductReview,
     CRUDProductTemplate
 )
+from crud.base import Page
 from models import AuthUser, ProductCategory
 from schemas import (
     ProductCreate,
@@ -18,11 +23,14 @@ from schemas import (
     ProductReviewUpdate,
     ProductUpdate,
     ProductImageCreate,
+    ProductsReturn,
     ProductTemplateCreate,
     ProductTemplateUpdate
 )
 from utils.generate_sku import generate_random_sku
 
+_products_adapter = TypeAdapter(list[ProductsReturn])
+
 
 class ProductService:
 
@@ -35,6 +43,7 @@ class ProductService:
         crud_product_review: CRUDProductReview,
         crud_product_template: CRUDProductTemplate,
         queue_connection: ArqRedis,
+        catalog_cache: CatalogCache,
     ):
         self.crud_auth_user = crud_auth_user
         self.crud_product = crud_product
@@ -43,9 +52,10 @@ class ProductService:
         self.crud_product_review = crud_product_review
         self.crud_product_template = crud_product_template
         self.queue_connection = queue_connection
+        self.catalog_cache = catalog_cache
 
     async def get_product_categories(self):
-        categories = self.crud_product_category.get_multi(limit=1000)
+        categories = await self.crud_product_category.get_multi(limit=1000)
         return categories
 
     async def create_product(
@@ -53,7 +63,7 @@ class ProductService:
         data_obj: ProductCreate,
         current_user: AuthUser,
     ):
-        category = self.crud_product_category.get_by_category_name(
+        category = await self.crud_product_category.get_by_category_name(
             category_name=data_obj.category
         )
         if not category:
@@ -76,51 +86,77 @@ class ProductService:
         ]
         await self.crud_product_image.bulk_insert(data_objs=images_obj)
 
-        new_product = self.crud_product.get_single_product_by_id(id=product.id)
+        new_product = await self.crud_product.get_single_product_by_id(id=product.id)
+        await self.catalog_cache.invalidate()
         return new_product
 
     async def get_products_customer(
         self,
         search: str,
-        skip: int,
+        cursor: Optional[str],
         limit: int,
-    ):
-        products = self.crud_product.get_all_products_public(
-            search=search, skip=skip, limit=limit
+    ) -> Page:
+        key = self.catalog_cache.list_key(search=search, cursor=cursor, limit=limit)
+        cached = await self.catalog_cache.get(key)
+        if cached is not None:
+            return Page(**cached)
+
+        page = await self.crud_product.get_all_products_public(
+            search=search, cursor=cursor, limit=limit
         )
-        if not products:
+        if not page.items and not cursor:
             raise MissingResources("No Products")
-        return products
+        if page.items:
+            items = _products_adapter.validate_python(page.items, from_attributes=True)
+            payload = {
+                "items": _products_adapter.dump_python(items, mode="json"),
+                "next_cursor": page.next_cursor,
+            }
+            await self.catalog_cache.set(
+                key,
+                json.dumps(payload),
+                ttl=settings.CATALOG_LIST_CACHE_TTL,
+                listing=True,
+            )
+        return page
 
     async def get_products_vendor(
         self,
         search: str,
-        skip: int,
+        cursor: Optional[str],
         limit: int,
         vendor_id: int,
-    ):
+    ) -> Page:
 
-        product = self.crud_product.get_products_for_vendor(
-            search=search, vendor_id=vendor_id, skip=skip, limit=limit
+        page = await self.crud_product.get_products_for_vendor(
+            search=search, vendor_id=vendor_id, cursor=cursor, limit=limit
         )
-        if not product:
+        if not page.items and not cursor:
             raise MissingResources("You haven't added any products yet")
-        return product
+        return page
 
     async def sort_product_by_price(
         self,
-        skip: int,
+        cursor: Optional[str],
         limit: int,
-    ):
-        product = self.crud_product.sort_product_by_price(skip=skip, limit=limit)
-        return product
+    ) -> Page:
+        return await self.crud_product.sort_product_by_price(cursor=cursor, limit=limit)
 
     async def get_one_product(
         self,
         product_id: int,
     ):
-        product = self.crud_product.get_active_products(id=product_id)
-
+        key = self.catalog_cache.product_key(product_id)
+        cached = await self.catalog_cache.get(key)
+        if cached is not None:
+            return cached
+
+        product = await self.crud_product.get_active_products(id=product_id)
+        await self.catalog_cache.set(
+            key,
+            ProductsReturn.model_validate(product, from_attributes=True).model_dump_json(),
+            ttl=settings.CATALOG_CACHE_TTL,
+        )
         return product
 
     async def update_product(
@@ -130,7 +166,7 @@ class ProductService:
         vendor_id: int,
     ):
 
-        product = self.crud_product.get_active_products(id=product_id)
+        product = await self.crud_product.get_active_products(id=product_id)
         if product.vendor_id != vendor_id:
             raise InvalidRequest("Product doesn't belong to you")
 
@@ -146,6 +182,7 @@ class ProductService:
         updated_product = await self.crud_product.update(
             id=product_id, data_obj=data_obj
         )
+        await self.catalog_cache.invalidate([product_id])
 
         return updated_product
 
@@ -156,8 +193,12 @@ class ProductService:
         vendor_id: int,
     ):
 
-        product_image = self.crud_product_image.get_or_raise_exception(product_image_id)
-        product = self.crud_product.get_active_products(id=product_image.product_id)
+        product_image = await self.crud_product_image.get_or_raise_exception(
+            product_image_id
+        )
+        product = await self.crud_product.get_active_products(
+            id=product_image.product_id
+        )
         if product.vendor_id != vendor_id.role_id:
             raise InvalidRequest("Product doesn't belong to you")
         data_obj.product_image = str(data_obj.product_image)
@@ -165,6 +206,7 @@ class ProductService:
         updated_product_image = await self.crud_product_image.update(
             id=product_image_id, data_obj=data_obj
         )
+        await self.catalog_cache.invalidate([product.id])
 
         return updated_product_image
 
@@ -173,17 +215,23 @@ class ProductService:
         product_id: int,
         vendor_id: int,
     ):
-        product = self.crud_product.get_active_products(id=product_id)
+        product = await self.crud_product.get_active_products(id=product_id)
         if product.vendor_id != vendor_id:
             raise InvalidRequest("Product doesn't belong to you")
         await self.crud_product.delete(product_id)
+        await self.catalog_cache.invalidate([product_id])
 
     async def create_product_review(
         self,
         data_obj: ProductReviewCreate,
     ):
-        self.crud_product.get_active_products(id=data_obj.product_id)
-        product_review = await self.crud_product_review.create(data_obj)
+        await self.crud_product.get_active_products(id=data_obj.product_id)
+        async with self.crud_product_review.transaction():
+            product_review = await self.crud_product_review.create(data_obj)
+            await self.crud_product.apply_review_rating(
+                data_obj.product_id, data_obj.rating, 1
+            )
+        await self.catalog_cache.invalidate([data_obj.product_id])
         return product_review
 
     async def update_product_review(
@@ -191,12 +239,28 @@ class ProductService:
         review_id: int,
         data_obj: ProductReviewUpdate,
     ):
-        review = self.crud_product_review.get_or_raise_exception(id=review_id)
-        updated_review = await self.crud_product_review.update(
-            id=review.id, data_obj=data_obj
-        )
+        async with self.crud_product_review.transaction():
+            product_id, rating = await self.crud_product_review.lock_rating(review_id)
+            updated_review = await self.crud_product_review.update(
+                id=review_id, data_obj=data_obj
+            )
+            if data_obj.rating is not None and data_obj.rating != rating:
+                await self.crud_product.apply_review_rating(
+                    product_id, data_obj.rating - rating
+                )
+        await self.catalog_cache.invalidate([product_id])
         return updated_review
 
+    async def get_product_reviews(
+        self,
+        product_id: int,
+        cursor: Optional[str],
+        limit: int,
+    ) -> Page:
+        return await self.crud_product_review.get_reviews_page(
+            product_id=product_id, cursor=cursor, limit=limit
+        )
+
     async def create_template(
         self,
         data_obj: ProductTemplateCreate,
@@ -207,7 +271,9 @@ class ProductService:
         template_data["vendor_id"] = current_user.role_id
         
         if template_data.get("category_id"):
-            category = self.crud_product_category.get(id=template_data["category_id"])
+            category = await self.crud_product_category.get(
+                id=template_data["category_id"]
+            )
             if not category:
                 raise InvalidRequest("Category not found")
         
@@ -215,7 +281,9 @@ class ProductService:
         return template
 
     async def get_vendor_templates(self, vendor_id: int):
-        templates = self.crud_product_template.get_templates_by_vendor(vendor_id=vendor_id)
+        templates = await self.crud_product_template.get_templates_by_vendor(
+            vendor_id=vendor_id
+        )
         return templates or []
 
     async def update_template(
@@ -224,14 +292,14 @@ class ProductService:
         vendor_id: int,
         data_obj: ProductTemplateUpdate,
     ):
-        template = self.crud_product_template.get_template_by_id_and_vendor(
+        template = await self.crud_product_template.get_template_by_id_and_vendor(
             template_id=template_id, vendor_id=vendor_id
         )
         if not template:
             raise MissingResources
         
         if data_obj.category_id:
-            category = self.crud_product_category.get(id=data_obj.category_id)
+            category = await self.crud_product_category.get(id=data_obj.category_id)
             if not category:
                 raise InvalidRequest("Category not found")
         
@@ -241,7 +309,7 @@ class ProductService:
         return updated_template
 
     async def delete_template(self, template_id: int, vendor_id: int):
-        template = self.crud_product_template.get_template_by_id_and_vendor(
+        template = await self.crud_product_template.get_template_by_id_and_vendor(
             template_id=template_id, vendor_id=vendor_id
         )
         if not template:
@@ -257,7 +325,7 @@ class ProductService:
         stock: int,
         pickup_time: Optional[str] = None,
     ):
-        template = self.crud_product_template.get_template_by_id_and_vendor(
+        template = await self.crud_product_template.get_template_by_id_and_vendor(
             template_id=template_id, vendor_id=current_user.role_id
         )
         if not template:
@@ -266,10 +334,10 @@ class ProductService:
         # Get or create category
         category = None
         if template.category_id:
-            category = self.crud_product_category.get(id=template.category_id)
+            category = await self.crud_product_category.get(id=template.category_id)
         
         if not category:
-            category = self.crud_product_category.get_by_category_name(
+            category = await self.crud_product_category.get_by_category_name(
                 category_name="food"  # Default category
             )
             if not category:
@@ -27,13 +27,13 @@ class VendorService:
         current_user: AuthUser,
     ):
 
-        auth_user = self.crud_vendor.get_by_auth_id(current_user.id)
+        auth_user = await self.crud_vendor.get_by_auth_id(current_user.id)
 
         if auth_user:
             raise ResourcesExist("Vendor exists")
         if current_user.default_role != Roles.VENDOR:
             raise InvalidRequest("Role must be Vendor to create vendor account")
-        if self.crud_vendor.get_by_username(data_obj.username):
+        if await self.crud_vendor.get_by_username(data_obj.username):
             raise ResourcesExist("username taken")
         data_obj.auth_id = current_user.id
         vendor = await self.crud_vendor.create(data_obj)
@@ -60,7 +60,7 @@ class VendorService:
         if current_user.default_role != Roles.VENDOR:
             raise InvalidRequest("Role must be Vendor to update vendor account")
 
-        vendor = self.crud_vendor.get_by_auth_id(current_user.id)
+        vendor = await self.crud_vendor.get_by_auth_id(current_user.id)
         if not vendor:
             raise InvalidRequest("Create vendor account first")
 
@@ -1,7 +1,11 @@
 from arq import cron
 from arq.cron import CronJob
 
-from .order import check_order_items_and_update_order_status_to_shipped
+from .order import (
+    check_order_items_and_update_order_status_to_shipped,
+    reconcile_pending_payments,
+)
+from .product import refresh_rating_summaries
 
 
 def at_every_x_minutes(x: int, start: int = 0, end: int = 59):
@@ -9,7 +13,11 @@ def at_every_x_minutes(x: int, start: int = 0, end: int = 59):
 
 
 def get_cron_jobs():
-    return [_update_order_status()]
+    return [
+        _update_order_status(),
+        _refresh_rating_summaries(),
+        _reconcile_pending_payments(),
+    ]
 
 
 def _update_order_status() -> CronJob:
@@ -19,3 +27,20 @@ def _update_order_status() -> CronJob:
         unique=True,
         run_at_startup=True,
     )
+
+
+def _refresh_rating_summaries() -> CronJob:
+    return cron(
+        refresh_rating_summaries,  # type:ignore
+        hour={3},
+        minute={30},
+        unique=True,
+    )
+
+
+def _reconcile_pending_payments() -> CronJob:
+    return cron(
+        reconcile_pending_payments,  # type:ignore
+        minute=at_every_x_minutes(5),
+        unique=True,
+    )
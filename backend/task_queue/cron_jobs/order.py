@@ -1,28 +1,54 @@
+import json
+import logging
+from datetime import datetime, timezone
+
+from arq import ArqRedis
+
+from core.payments import get_payment_providers
 from crud import CRUDOrder
+from utils.timing import PhaseTimer
+
+logger = logging.getLogger(__name__)
 
-from models import Order
-from schemas.base import OrderStatusEnum
+RECONCILIATION_RUNS_KEY = "reconciliation:payments:runs"
+RECONCILIATION_RUNS_KEPT = 100
 
 
 async def check_order_items_and_update_order_status_to_shipped(ctx):
+    # Sweep for orders the per-item status update didn't promote
     crud_order: CRUDOrder = ctx["crud_order"]
+    order_ids = await crud_order.promote_shipped_orders()
+    if order_ids:
+        logger.info("Promoted %s orders to shipped: %s", len(order_ids), order_ids)
+
+
+async def reconcile_pending_payments(ctx):
+    # Imported here: services import core.tokens, which imports task_queue.main
+    from services.cart_service import CartService
+
+    redis: ArqRedis = ctx["redis"]
+    cart_service = CartService(
+        crud_auth_user=ctx["crud_auth_user"],
+        crud_product=ctx["crud_product"],
+        crud_cart=ctx["crud_cart"],
+        queue_connection=redis,
+        crud_customer=ctx["crud_customer"],
+        crud_order=ctx["crud_order"],
+        crud_payment=ctx["crud_payment_details"],
+        crud_order_item=ctx["crud_order_item"],
+        crud_vendor=ctx["crud_vendor"],
+        payment_providers=get_payment_providers(),
+    )
+    started_at = datetime.now(timezone.utc)
+    timer = PhaseTimer()
+    with timer.phase("total"):
+        counts = await cart_service.reconcile_pending_payments(timer)
 
-    orders = await crud_order.get_all_orders()
-    processing_orders = [
-        order for order in orders
-        if order.status == OrderStatusEnum.PROCESSING
-    ]
-
-    for order in processing_orders:
-        order_items = order.order_items
-        if not order_items:
-            continue
-        
-        status = [item.status for item in order_items]
-
-        if OrderStatusEnum.PROCESSING in status or OrderStatusEnum.REFUNDED in status:
-            pass
-        else:
-            await crud_order.update(
-                id=order.id, data_obj={Order.STATUS: OrderStatusEnum.SHIPPED}
-            )
+    run = {"started_at": started_at.isoformat(), **counts, "timings_ms": timer.timings}
+    # Recent runs, newest first, for GET /monitoring/reconciliation
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.lpush(RECONCILIATION_RUNS_KEY, json.dumps(run))
+        pipe.ltrim(RECONCILIATION_RUNS_KEY, 0, RECONCILIATION_RUNS_KEPT - 1)
+        await pipe.execute()
+    logger.info("Payment reconciliation %s", run)
+    return counts
@@ -0,0 +1,13 @@
+import logging
+
+from crud import CRUDProduct
+
+logger = logging.getLogger(__name__)
+
+
+async def refresh_rating_summaries(ctx):
+    # Rebuild the incrementally kept rating summaries, undoing any float drift
+    crud_product: CRUDProduct = ctx["crud_product"]
+    corrected = await crud_product.refresh_rating_summaries()
+    if corrected:
+        logger.info("Corrected rating summaries on %s products", corrected)
@@ -1,6 +1,7 @@
-from httpx import AsyncClient
-from arq import create_pool
+from fastapi import Request
+from arq import ArqRedis
 from arq.connections import RedisSettings
+from redis.asyncio import BlockingConnectionPool
 
 from crud import (
     get_crud_customer,
@@ -17,20 +18,58 @@ from crud import (
 )
 from task_queue.cron_jobs.main import get_cron_jobs
 from task_queue.tasks import registered_tasks
-from core.db import get_db
+from core.db import SessionLocal
+from core.http import http_clients
 from core import settings
 
 
-REDIS_SETTINGS = RedisSettings(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+REDIS_SETTINGS = RedisSettings(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+)
+
+
+async def create_queue_pool() -> ArqRedis:
+    """Create the process-wide ArqRedis pool; called once from the app lifespan.
+
+    Once REDIS_MAX_CONNECTIONS are in use, requests wait up to
+    REDIS_POOL_TIMEOUT seconds for a free one instead of failing, and
+    connections idle for REDIS_HEALTH_CHECK_INTERVAL are pinged before reuse.
+    """
+    connection_pool = BlockingConnectionPool(
+        host=REDIS_SETTINGS.host,
+        port=REDIS_SETTINGS.port,
+        db=REDIS_SETTINGS.database,
+        username=REDIS_SETTINGS.username,
+        password=REDIS_SETTINGS.password,
+        socket_connect_timeout=REDIS_SETTINGS.conn_timeout,
+        encoding="utf8",
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    pool = ArqRedis(pool_or_conn=connection_pool)
+    await pool.ping()
+    return pool
+
 
+async def close_queue_pool(pool: ArqRedis):
+    await pool.aclose(close_connection_pool=True)
 
-async def get_queue_connection():
-    return await create_pool(REDIS_SETTINGS)
+
+def get_queue_connection(request: Request) -> ArqRedis:
+    return request.app.state.queue_connection
 
 
 async def startup(ctx):
-    db = get_db()
-    ctx["session"] = AsyncClient()
+    ctx["session"] = http_clients.get()
+
+
+async def on_job_start(ctx):
+    # ctx is copied per job by arq, so every job gets its own session.
+    db = SessionLocal()
+    ctx["db"] = db
     ctx["crud_auth_user"] = get_crud_auth_user(db)
     ctx["crud_otp"] = get_crud_otp(db)
     ctx["crud_product"] = get_crud_product(db)
@@ -44,13 +83,21 @@ async def startup(ctx):
     ctx["crud_order_item"] = get_crud_order_item(db)
 
 
+async def on_job_end(ctx):
+    db = ctx.pop("db", None)
+    if db is not None:
+        db.close()
+
+
 async def shutdown(ctx):
-    await ctx["session"].aclose()
+    await http_clients.aclose()
 
 
 class WorkerSettings:
     on_startup = startup
     on_shutdown = shutdown
+    on_job_start = on_job_start
+    on_job_end = on_job_end
     redis_settings = REDIS_SETTINGS
     functions = registered_tasks
     cron_jobs = get_cron_jobs()
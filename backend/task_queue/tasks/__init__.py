@@ -1,5 +1,9 @@
+from arq.worker import func
+
+from core import settings
 from .auth_user_tasks import *
 from .cart_tasks import *
+from .notification_tasks import *
 from .product_tasks import *
 
 
@@ -7,8 +11,13 @@ registered_tasks = [
     update_auth_password,
     update_auth_details,
     update_stock_after_checkout,
+    stock_event,
     save_product_images,
     add_shipping_details,
     add_order_items,
     send_email_otp,
+    func(send_order_confirmation_email, max_tries=settings.NOTIFICATION_MAX_TRIES),
+    queue_order_confirm_push,
+    flush_order_confirm_pushes,
+    persist_cart,
 ]
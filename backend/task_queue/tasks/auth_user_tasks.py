@@ -1,5 +1,6 @@
 import logging
 
+from core.cache import PrincipalCache
 from crud import CRUDAuthUser, CRUDOtp
 from models import AuthUser
 from utils.password_utils import hash_password
@@ -22,6 +23,7 @@ async def update_auth_details(ctx, auth_id, data_obj):
         id=auth_id,
         data_obj=data_obj,
     )
+    await PrincipalCache(ctx["redis"]).invalidate(auth_id)
 
 
 async def send_email_otp(ctx, data_obj, email):
@@ -1,10 +1,15 @@
-from typing import List, Tuple
+import logging
+from typing import List, Union
 
+from core.cache import CatalogCache
+from core.cart_store import CartStore
 from crud import CRUDProduct, CRUDOrder
 from crud import CRUDCustomer, CRUDShippingDetails, CRUDOrderItem, CRUDCart
-from models import Product
 from models.order import Order
 from schemas import ShippingDetailsCreate, OrderItemsCreate
+from schemas.base import StockStatusEnum
+
+logger = logging.getLogger(__name__)
 
 
 async def add_shipping_details(
@@ -19,9 +24,9 @@ async def add_shipping_details(
         return
 
     # Fetch fresh order from database
-    order = crud_order.get_or_raise_exception(id=order_id)
+    order = await crud_order.get_or_raise_exception(id=order_id)
     
-    customer = crud_customer.get_or_raise_exception(id=order.customer_id)
+    customer = await crud_customer.get_or_raise_exception(id=order.customer_id)
 
     shipping_details.contact_information = (
         shipping_details.contact_information
@@ -46,7 +51,9 @@ async def add_order_items(ctx, order: Order):
     crud_order_item: CRUDOrderItem = ctx["crud_order_item"]
     crud_cart: CRUDCart = ctx["crud_cart"]
 
-    cart_summary = await crud_cart.get_cart_summary(customer_id=order.customer_id)
+    cart_summary = await crud_cart.get_cart_summary(
+        customer_id=order.customer_id, profile="Checkout"
+    )
 
     products_and_quantity_in_cart_tuple = [
         (products.product, products.quantity) for products in cart_summary["cart_items"]
@@ -64,15 +71,27 @@ async def add_order_items(ctx, order: Order):
 
 
 async def update_stock_after_checkout(ctx, order_id):
-    crud_order_item: CRUDOrderItem = ctx["crud_order_item"]
+    # Checkout reserves stock itself now; kept for jobs queued before that change.
     crud_product: CRUDProduct = ctx["crud_product"]
+    product_ids = await crud_product.reserve_stock(order_id)
+    if product_ids:
+        await stock_event(ctx, StockStatusEnum.RESERVED.value, order_id, product_ids)
 
-    order_items = crud_order_item.get_by_order_id(order_id)
-    product_id_and_quantity: List[Tuple[int]] = [
-        (item.product_id, item.quantity) for item in order_items
-    ]
-    for product_id, cart_item_quantity in product_id_and_quantity:
-        product = crud_product.get_active_products(id=product_id)
-        quantity = product.stock - cart_item_quantity
-        await crud_product.update(id=product_id, data_obj={Product.STOCK: quantity})
-    return
+
+async def stock_event(
+    ctx, event: str, order_id: Union[int, List[int]], product_ids: List[int]
+):
+    logger.info("Stock %s for order %s: products %s", event, order_id, product_ids)
+    await CatalogCache(ctx["redis"]).invalidate(product_ids)
+
+
+async def persist_cart(ctx, customer_id: int):
+    # Write-behind for carts kept in Redis: copy the cart as it is now
+    lines = await CartStore(ctx["redis"]).lines(customer_id)
+    if lines is None:
+        # Expired or never hydrated; the table is all there is
+        return
+    crud_cart: CRUDCart = ctx["crud_cart"]
+    await crud_cart.replace_cart(
+        customer_id, {line["product_id"]: line["quantity"] for line in lines}
+    )
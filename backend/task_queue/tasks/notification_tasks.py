@@ -0,0 +1,108 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from arq import ArqRedis, Retry
+
+from core import settings
+from core.http import http_clients
+from utils.postmark_client import send_postmark_email
+
+
+logger = logging.getLogger(__name__)
+
+DEAD_LETTER_KEY = "dead_letter:notifications"
+PENDING_PUSHES_KEY = "notifications:order_confirm:pending"
+
+
+async def _dead_letter(redis: ArqRedis, job: str, payload: dict, error: Exception):
+    entry = {
+        "job": job,
+        "payload": payload,
+        "error": repr(error),
+        "failed_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await redis.lpush(DEAD_LETTER_KEY, json.dumps(entry))
+    logger.error("[Notification] %s dead-lettered: %s | %r", job, payload, error)
+
+
+async def send_order_confirmation_email(ctx, order_id: int, to_email: str, text_body: str):
+    try:
+        await send_postmark_email(
+            to_email=to_email, subject="Order confirmed", text_body=text_body
+        )
+    except Exception as exc:
+        job_try = ctx["job_try"]
+        if job_try < settings.NOTIFICATION_MAX_TRIES:
+            raise Retry(defer=2**job_try) from exc
+        await _dead_letter(
+            ctx["redis"],
+            "send_order_confirmation_email",
+            {"order_id": order_id, "to_email": to_email},
+            exc,
+        )
+
+
+async def _schedule_push_flush(redis: ArqRedis):
+    # One flush job per window: the job id is the window's bucket, so every
+    # push queued within the same window lands on the same flush.
+    window = settings.NOTIFICATION_BATCH_WINDOW
+    bucket = int(time.time() // window) + 1
+    await redis.enqueue_job(
+        "flush_order_confirm_pushes",
+        _job_id=f"flush-order-confirm-pushes:{bucket}",
+        _defer_until=datetime.fromtimestamp(bucket * window, tz=timezone.utc),
+    )
+
+
+async def queue_order_confirm_push(ctx, user_id: int, order_id: int):
+    redis: ArqRedis = ctx["redis"]
+    push = {"user_id": user_id, "order_id": order_id, "attempt": 0}
+    await redis.rpush(PENDING_PUSHES_KEY, json.dumps(push))
+    await _schedule_push_flush(redis)
+
+
+async def _post_order_confirm(push: dict):
+    payload = {
+        "user_id": str(push["user_id"]),
+        "order": {"id": str(push["order_id"]), "status": "confirmed"},
+        "data": {"type": "order-confirm", "order_id": str(push["order_id"])},
+    }
+    rsp = await http_clients.get("notifications").post(
+        "/notify/order-confirm", json=payload
+    )
+    rsp.raise_for_status()
+
+
+async def flush_order_confirm_pushes(ctx):
+    redis: ArqRedis = ctx["redis"]
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.lrange(PENDING_PUSHES_KEY, 0, -1)
+        pipe.delete(PENDING_PUSHES_KEY)
+        pending, _ = await pipe.execute()
+    pushes = [json.loads(push) for push in pending]
+    if not pushes:
+        return 0
+
+    results = await asyncio.gather(
+        *(_post_order_confirm(push) for push in pushes), return_exceptions=True
+    )
+    retry = []
+    for push, result in zip(pushes, results):
+        if not isinstance(result, Exception):
+            continue
+        push["attempt"] += 1
+        if push["attempt"] < settings.NOTIFICATION_MAX_TRIES:
+            retry.append(json.dumps(push))
+        else:
+            await _dead_letter(redis, "order_confirm_push", push, result)
+    if retry:
+        # Failed pushes ride along with the next window's batch
+        await redis.rpush(PENDING_PUSHES_KEY, *retry)
+        await _schedule_push_flush(redis)
+
+    sent = len(pushes) - len(retry)
+    logger.info("[Notification] Order confirm pushes sent=%s retrying=%s", sent, len(retry))
+    return sent
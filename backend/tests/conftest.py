@@ -1,9 +1,12 @@
 from httpx import AsyncClient
 import pytest
 
-from core.db import get_db
+from api.dependencies.services import get_analytics_cache, get_catalog_cache
+from core.db import get_async_db, get_db
 from core.tokens import (
     get_current_auth_user,
+    get_principal_cache,
+    get_token_revocation_list,
     get_current_verified_customer,
     get_current_verified_vendor,
 )
@@ -20,14 +23,18 @@ from tests.sample_datas.samples import (
     sample_get_verified_customer,
     sample_get_verified_vendor,
 )
-from tests.sample_datas.testdb import engine, mock_get_db
+from tests.sample_datas.testdb import engine, mock_get_async_db, mock_get_db
 from models import auth_user, order, product, cart as cartmodel, AuthUser
 from .mock_dependencies import (
+    mock_analytics_cache,
+    mock_catalog_cache,
     mock_crud_auth_user,
     mock_crud_customer,
     mock_queue_connection,
     mock_crud_product_image,
     mock_crud_otp,
+    mock_principal_cache,
+    mock_token_revocation_list,
 )
 
 
@@ -50,7 +57,14 @@ def client():
 @pytest.fixture
 def database_override_dependencies():
     app.dependency_overrides[get_db] = mock_get_db
+    app.dependency_overrides[get_async_db] = mock_get_async_db
     app.dependency_overrides[get_queue_connection] = lambda: mock_queue_connection
+    app.dependency_overrides[get_catalog_cache] = lambda: mock_catalog_cache
+    app.dependency_overrides[get_analytics_cache] = lambda: mock_analytics_cache
+    app.dependency_overrides[get_token_revocation_list] = (
+        lambda: mock_token_revocation_list
+    )
+    app.dependency_overrides[get_principal_cache] = lambda: mock_principal_cache
     app.dependency_overrides[get_crud_otp] = lambda: mock_crud_otp
     yield
     app.dependency_overrides = {}
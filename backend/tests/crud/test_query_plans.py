@@ -0,0 +1,109 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from core.errors import InvalidRequest, MissingResources
+from crud import (
+    CRUDAuthUser,
+    CRUDCart,
+    CRUDCustomer,
+    CRUDOrder,
+    CRUDOrderItem,
+    CRUDOtp,
+    CRUDPaymentDetails,
+    CRUDProduct,
+    CRUDProductReview,
+    CRUDProductTemplate,
+    CRUDRefreshToken,
+    CRUDVendor,
+)
+from models import (
+    OTP,
+    AuthUser,
+    Cart,
+    Customer,
+    Order,
+    OrderItem,
+    PaymentDetails,
+    Product,
+    ProductReview,
+    ProductTemplate,
+    RefreshToken,
+    Vendor,
+)
+from tests.sample_datas.testdb import TestingSessionLocal, engine
+
+
+# (CRUD class, model, method, args, index the first statement must use)
+QUERY_INVENTORY = [
+    (CRUDCart, Cart, "get_cart_items_by_customer_id", (1,), "ix_cart_customer_id_product_id"),
+    (CRUDCart, Cart, "get_by_product_id_and_customer_id", (1, 1), "ix_cart_customer_id_product_id"),
+    (CRUDCart, Cart, "clear_cart", (1,), "ix_cart_customer_id_product_id"),
+    (CRUDCart, Cart, "delete_cart_item_by_product_id", (1, 1), "ix_cart_customer_id_product_id"),
+    (CRUDCart, Cart, "check_if_product_id_exist_in_cart", (1, 1), "ix_cart_customer_id_product_id"),
+    (CRUDCart, Cart, "get_cart_summary_lite", (1,), "ix_cart_customer_id_product_id"),
+    (CRUDProduct, Product, "get_all_products_public", (None,), "ix_products_active_created_timestamp_id"),
+    (CRUDProduct, Product, "get_products_for_vendor", (1, None), "ix_products_vendor_id_created_timestamp_id"),
+    (CRUDProduct, Product, "sort_product_by_price", (), "ix_products_price_id"),
+    (CRUDProductReview, ProductReview, "get_reviews_page", (1,), "ix_product_reviews_product_id_created_timestamp_id"),
+    (CRUDProductTemplate, ProductTemplate, "get_templates_by_vendor", (1,), "ix_product_templates_vendor_id_created_timestamp"),
+    (CRUDOrder, Order, "get_orders_by_customer", (1,), "ix_orders_customer_id_id"),
+    (CRUDOrderItem, OrderItem, "get_by_order_id", (1,), "ix_order_items_order_id_status"),
+    (CRUDOrderItem, OrderItem, "get_order_items_page_by_vendor_id", (1,), "ix_order_items_vendor_id_created_timestamp_id"),
+    (CRUDPaymentDetails, PaymentDetails, "get_confirmation", ("ref",), "payment_details_payment_ref_key"),
+    (CRUDPaymentDetails, PaymentDetails, "get_stale_pending", (datetime(2030, 1, 1), 10), "ix_payment_details_pending_created_timestamp"),
+    (CRUDOtp, OTP, "check_number_of_trials", (1,), "ix_otp_auth_id_id"),
+    (CRUDRefreshToken, RefreshToken, "check_if_refresh_token_exist", ("token",), "ix_refresh_tokens_refresh_token"),
+    (CRUDVendor, Vendor, "get_by_auth_id", (1,), "ix_vendors_auth_id"),
+    (CRUDCustomer, Customer, "get_by_auth_id", (1,), "ix_customers_auth_id"),
+    (CRUDAuthUser, AuthUser, "get_by_email", ("a@b.com",), "auth_details_email_key"),
+]
+
+
+def _index_names(plan: dict):
+    if "Index Name" in plan:
+        yield plan["Index Name"]
+    for child in plan.get("Plans", []):
+        yield from _index_names(child)
+
+
+async def _first_statement(crud_class, model, method, args):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    db = TestingSessionLocal()
+    try:
+        await getattr(crud_class(model=model, db=db), method)(*args)
+    except (InvalidRequest, MissingResources):
+        pass
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+        db.close()
+    return statements[0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "crud_class, model, method, args, index",
+    QUERY_INVENTORY,
+    ids=[f"{case[0].__name__}.{case[2]}" for case in QUERY_INVENTORY],
+)
+async def test_crud_query_uses_index(client, crud_class, model, method, args, index):
+    statement, parameters = await _first_statement(crud_class, model, method, args)
+
+    # The test tables are tiny; ruling out seq scans shows which index the
+    # planner would pick once the table is big enough to need one
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        ).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    assert index in set(_index_names(plan[0]["Plan"]))
@@ -1,16 +1,25 @@
 from typing import Dict, List, Union
 
+import uuid
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from fastapi import status
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from httpx import AsyncClient
+from redis.exceptions import RedisError
 
-from core.errors import InvalidRequest
+from core.errors import InvalidRequest, ServiceUnavailable
+from core.revocation import TokenRevocationList
 from core.tokens import get_current_auth_user, verify_access_token
 from main import app
 from models.auth_user import OTP
 from tests.conftest import database_override_dependencies, mock_crud_auth_user
-from tests.mock_dependencies import mock_crud_otp
+from tests.mock_dependencies import (
+    mock_crud_otp,
+    mock_principal_cache,
+    mock_token_revocation_list,
+)
 from schemas import OTPType, RegisterAuthUserResponse
 from tests.sample_datas.auth_user_samples import (
     sample_auth_user_create_customer,
@@ -233,6 +242,83 @@ async def test_logout_user_invalid_token(
         assert rsp.status_code == status.HTTP_403_FORBIDDEN
 
 
+@pytest.mark.asyncio
+async def test_revoked_token_rejected(client, database_override_dependencies):
+    login_rsp = await login_user(client)
+    access_token = login_rsp.json().get("access_token")
+    headers = sample_header()
+    headers["authorization"] = "Bearer {}".format(access_token)
+
+    mock_token_revocation_list.is_revoked.return_value = True
+    try:
+        rsp = await client.get("/auth/me", headers=headers)
+    finally:
+        mock_token_revocation_list.is_revoked.return_value = False
+
+    jti = verify_access_token(access_token).jti
+    mock_token_revocation_list.is_revoked.assert_called_with(jti)
+    assert rsp.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.asyncio
+async def test_revoke_fails_when_redis_is_down():
+    redis = AsyncMock()
+    redis.set.side_effect = RedisError("connection refused")
+    redis.ttl.return_value = -2
+    revocation_list = TokenRevocationList(redis)
+    jti = uuid.uuid4().hex
+
+    with pytest.raises(ServiceUnavailable):
+        await revocation_list.revoke(
+            jti, datetime.now(timezone.utc) + timedelta(minutes=5)
+        )
+
+    # Nothing cached locally: the revocation reached no other worker either
+    assert await revocation_list.is_revoked(jti) is False
+
+
+@pytest.mark.asyncio
+async def test_revocation_check_fails_closed_when_redis_is_down():
+    redis = AsyncMock()
+    redis.ttl.side_effect = RedisError("connection refused")
+    revocation_list = TokenRevocationList(redis)
+
+    with pytest.raises(ServiceUnavailable):
+        await revocation_list.is_revoked(uuid.uuid4().hex)
+
+    # Verdicts cached before the outage are still served
+    revoked = uuid.uuid4().hex
+    redis.set.return_value = True
+    await revocation_list.revoke(
+        revoked, datetime.now(timezone.utc) + timedelta(minutes=5)
+    )
+    assert await revocation_list.is_revoked(revoked) is True
+
+
+@pytest.mark.asyncio
+async def test_current_user_served_from_principal_cache(
+    client, database_override_dependencies
+):
+    login_rsp = await login_user(client)
+    headers = sample_header()
+    headers["authorization"] = "Bearer {}".format(login_rsp.json()["access_token"])
+
+    mock_principal_cache.reset_mock()
+    rsp = await client.get("/auth/me", headers=headers)
+    mock_principal_cache.set.assert_called_once()
+
+    mock_principal_cache.get.return_value = mock_principal_cache.set.call_args.args[0]
+    try:
+        with patch("crud.auth.CRUDAuthUser.get") as mock_get:
+            cached_rsp = await client.get("/auth/me", headers=headers)
+            mock_get.assert_not_called()
+    finally:
+        mock_principal_cache.get.return_value = None
+
+    assert cached_rsp.status_code == status.HTTP_200_OK
+    assert cached_rsp.json() == rsp.json()
+
+
 @pytest.mark.asyncio
 async def test_get_user_success(
     client, database_override_dependencies, get_current_auth_user_override_dependency
@@ -349,7 +435,7 @@ async def test_refresh_token_success(
 
     headers = sample_header()
     with patch(
-        "core.tokens.crud_refresh_token.check_if_refresh_token_exist"
+        "crud.auth.CRUDRefreshToken.check_if_refresh_token_exist"
     ) as mock_crud_refresh_token:
         mock_crud_refresh_token.return_value = True
         rsp = await client.post(
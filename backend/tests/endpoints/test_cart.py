@@ -1,4 +1,8 @@
 from typing import Dict, List, Union
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from arq import ArqRedis
+import httpx
 from httpx import AsyncClient
 import pytest
 from fastapi import status
@@ -21,7 +25,20 @@ from tests.sample_datas.samples import (
     sample_customer_create,
     sample_vendor_create,
 )
+from api.dependencies.services import get_cart_store, get_idempotency_store
+from core import settings
+from core.cart_store import CartStore
+from core.fake_payment import fake_payment_provider
+from core.idempotency import IdempotencyStore
+from core.payments import get_payment_providers
+from core.paystack import PaystackClient
+from core.stripe_payment import StripeClient
+from crud import CRUDProduct
+from main import app
+from models import Cart, Order, Product
+from task_queue.tasks import update_stock_after_checkout
 from tests.mock_dependencies import mock_queue_connection
+from tests.sample_datas.testdb import TestingSessionLocal, count_queries
 
 
 async def create_multiple_users(
@@ -99,6 +116,40 @@ async def test_add_to_cart_success(
     assert rsp.status_code == status.HTTP_201_CREATED
 
 
+@pytest.mark.asyncio
+async def test_add_to_cart_redis_store(
+    client: AsyncClient,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    cart_store = MagicMock(spec=CartStore)
+    cart_store.lines.return_value = []
+    cart_store.product.return_value = (None, None)
+    cart_store.add.side_effect = lambda customer_id, product, quantity: {
+        "id": 1,
+        "product_id": product["id"],
+        "customer_id": customer_id,
+        "quantity": quantity,
+        "product": product,
+        "created_timestamp": "2024-01-01T00:00:00+00:00",
+    }
+    app.dependency_overrides[get_cart_store] = lambda: cart_store
+
+    rsp = await create_add_to_cart(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+
+    assert rsp.status_code == status.HTTP_201_CREATED
+    assert rsp.json()["quantity"] == sample_add_to_cart()["quantity"]
+    cart_store.cache_product.assert_awaited_once()
+    cart_store.add.assert_awaited_once()
+    # The line is written behind by persist_cart, not by the request
+    with TestingSessionLocal() as db:
+        assert db.query(Cart).count() == 0
+
+
 @pytest.mark.asyncio
 async def test_add_to_cart_too_many_quantity(
     client: AsyncClient,
@@ -252,6 +303,33 @@ async def test_get_cart_summary_success(
     assert rsp.status_code == status.HTTP_200_OK
 
 
+@pytest.mark.asyncio
+async def test_get_cart_summary_lite(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    await create_add_to_cart(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    full = (await client.get("/cart/summary")).json()
+
+    with count_queries() as counts:
+        rsp = await client.get("/cart/summary/lite")
+
+    assert rsp.status_code == status.HTTP_200_OK
+    assert counts.statements == 1
+    summary = rsp.json()
+    assert summary["total_items_quantity"] == full["total_items_quantity"]
+    assert summary["total_amount"] == full["total_amount"]
+    [line] = summary["cart_items"]
+    assert line["line_total"] == line["price"] * line["quantity"]
+    assert line["product_image"] == "http://www.test.org/testhead"
+    assert "customer" not in line
+
+
 @pytest.mark.asyncio
 async def test_get_cart_summary_no_cart_item(
     client,
@@ -280,3 +358,215 @@ async def test_checkout_success(
 
     print(rsp.json())
     assert rsp.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_checkout_reserves_stock_once(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    await create_add_to_cart(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    rsp = await client.post("/cart/checkout", json=sample_checkout_data())
+    assert rsp.status_code == status.HTTP_200_OK
+    mock_queue_connection.enqueue_job.assert_any_await(
+        "stock_event", "reserved", rsp.json()["id"], [1]
+    )
+
+    product = await client.get("/products/1")
+    assert product.json()["stock"] == 195
+
+    # A replayed reservation job for the same order is a no-op
+    with TestingSessionLocal() as db:
+        ctx = {"crud_product": CRUDProduct(db=db, model=Product)}
+        await update_stock_after_checkout(ctx, rsp.json()["id"])
+        assert db.get(Product, 1).stock == 195
+
+
+def dict_backed_redis() -> MagicMock:
+    """An ArqRedis mock storing GET/SET/DELETE, pipelined or not, in a dict."""
+    store = {}
+
+    def set(key, value, ex=None, nx=False):
+        if nx and key in store:
+            return None
+        store[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    redis = MagicMock(spec=ArqRedis)
+    redis.get = AsyncMock(side_effect=store.get)
+    redis.set = AsyncMock(side_effect=set)
+    redis.delete = AsyncMock(side_effect=lambda key: store.pop(key, None))
+    pipe = redis.pipeline.return_value.__aenter__.return_value
+    pipe.set = MagicMock(side_effect=set)
+    pipe.delete = MagicMock(side_effect=lambda key: store.pop(key, None))
+    pipe.execute = AsyncMock()
+    return redis
+
+
+@pytest.mark.asyncio
+async def test_checkout_idempotency_key_replays_first_order(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    idempotency = IdempotencyStore(dict_backed_redis())
+    app.dependency_overrides[get_idempotency_store] = lambda: idempotency
+    await create_add_to_cart(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    headers = {"Idempotency-Key": "checkout-1"}
+
+    first = await client.post("/cart/checkout", json=sample_checkout_data(), headers=headers)
+    retry = await client.post("/cart/checkout", json=sample_checkout_data(), headers=headers)
+
+    assert first.status_code == status.HTTP_200_OK
+    assert retry.status_code == status.HTTP_200_OK
+    assert retry.json() == first.json()
+    with TestingSessionLocal() as db:
+        assert db.query(Order).count() == 1
+
+    other = sample_checkout_data()
+    other["payment_details"]["payment_method"] = "card"
+    rsp = await client.post("/cart/checkout", json=other, headers=headers)
+    assert rsp.status_code == status.HTTP_409_CONFLICT
+
+
+@pytest.mark.asyncio
+async def test_checkout_failing_after_commit_is_undone_for_retry(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    idempotency = IdempotencyStore(dict_backed_redis())
+    app.dependency_overrides[get_idempotency_store] = lambda: idempotency
+    await create_add_to_cart(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    checkout_data = sample_checkout_data()
+    checkout_data["payment_details"]["payment_method"] = "stripe"
+    headers = {"Idempotency-Key": "checkout-1"}
+
+    with patch.object(
+        StripeClient,
+        "create_checkout_session",
+        AsyncMock(side_effect=ValueError("Stripe payment init failed")),
+    ), pytest.raises(ValueError):
+        await client.post("/cart/checkout", json=checkout_data, headers=headers)
+    with TestingSessionLocal() as db:
+        assert db.query(Order).count() == 0
+        assert db.get(Product, 1).stock == 200
+        assert db.query(Cart).count() == 1
+
+    with patch.object(
+        StripeClient,
+        "create_checkout_session",
+        AsyncMock(return_value={"payment_ref": "cs_test_1"}),
+    ):
+        rsp = await client.post("/cart/checkout", json=checkout_data, headers=headers)
+    assert rsp.status_code == status.HTTP_200_OK
+    with TestingSessionLocal() as db:
+        assert db.query(Order).count() == 1
+        assert db.get(Product, 1).stock == 195
+
+
+def paystack_connection_refused(request):
+    raise httpx.ConnectError("connection refused", request=request)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "paystack_api",
+    [
+        paystack_connection_refused,
+        lambda request: httpx.Response(401, json={"status": False, "message": "Bad key"}),
+        lambda request: httpx.Response(200, json={"status": False, "message": "Declined"}),
+    ],
+    ids=["transport", "http-error", "status-false"],
+)
+async def test_paystack_checkout_failure_is_undone_for_retry(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    paystack_api,
+):
+    idempotency = IdempotencyStore(dict_backed_redis())
+    app.dependency_overrides[get_idempotency_store] = lambda: idempotency
+    handler = {"api": paystack_api}
+    paystack = PaystackClient(
+        AsyncClient(
+            transport=httpx.MockTransport(lambda request: handler["api"](request)),
+            base_url="https://api.paystack.test/",
+        )
+    )
+    app.dependency_overrides[get_payment_providers] = lambda: {"paystack": paystack}
+    await create_add_to_cart(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    checkout_data = sample_checkout_data()
+    checkout_data["payment_details"]["payment_method"] = "card"
+    headers = {"Idempotency-Key": "checkout-1"}
+
+    with pytest.raises(ValueError):
+        await client.post("/cart/checkout", json=checkout_data, headers=headers)
+
+    with TestingSessionLocal() as db:
+        assert db.query(Order).count() == 0
+        assert db.get(Product, 1).stock == 200
+        assert db.query(Cart).count() == 1
+
+    handler["api"] = lambda request: httpx.Response(
+        200, json={"status": True, "data": {"reference": "ref-1"}}
+    )
+    response = await client.post("/cart/checkout", json=checkout_data, headers=headers)
+    assert response.status_code == 200, response.text
+    with TestingSessionLocal() as db:
+        assert db.query(Order).count() == 1
+        assert db.get(Product, 1).stock == 195
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failure_rate, verified", [(0.0, True), (1.0, False)])
+async def test_checkout_and_verify_with_fake_provider(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    monkeypatch,
+    failure_rate,
+    verified,
+):
+    monkeypatch.setattr(settings, "PAYMENT_PROVIDER", "fake")
+    monkeypatch.setattr(fake_payment_provider, "latency", 0)
+    monkeypatch.setattr(fake_payment_provider, "failure_rate", failure_rate)
+    await create_add_to_cart(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    checkout_data = sample_checkout_data()
+    checkout_data["payment_details"]["payment_method"] = "card"
+    order = (await client.post("/cart/checkout", json=checkout_data)).json()
+
+    rsp = await client.get(f"/cart/verify-payment/{order['reference']}")
+
+    with TestingSessionLocal() as db:
+        if verified:
+            assert rsp.status_code == status.HTTP_200_OK
+            assert rsp.json()["order_id"] == order["order_id"]
+            assert db.get(Order, order["order_id"]).payment_details is not None
+        else:
+            assert rsp.status_code == status.HTTP_403_FORBIDDEN
+            assert db.get(Order, order["order_id"]) is None
+
+    rsp = await client.get("/cart/verify-payment/fake_not-an-order")
+    assert rsp.status_code == status.HTTP_404_NOT_FOUND
@@ -1,10 +1,15 @@
 from httpx import AsyncClient
 import pytest
 from fastapi import status
+from sqlalchemy import update
+
+from models import PaymentDetails
+from schemas.base import StatusEnum
 
 from tests.endpoints.test_cart import create_add_to_cart
 from tests.sample_datas.samples import sample_checkout_data
-from tests.mock_dependencies import mock_queue_connection
+from tests.mock_dependencies import mock_analytics_cache, mock_queue_connection
+from tests.sample_datas.testdb import count_queries, engine
 
 
 @pytest.mark.asyncio
@@ -38,3 +43,140 @@ async def test_get_all_orders(
     rsp = await client.get("/order/")
     print(rsp.json())
     assert rsp.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_checkout_persists_order_items_and_payment(
+    client: AsyncClient,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    await create_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    rsp = await client.get("/order/")
+
+    [order] = rsp.json()
+    assert [item["quantity"] for item in order["order_items"]] == [5]
+    assert order["payment_details"]["payment_method"] == "cash"
+
+
+@pytest.mark.asyncio
+async def test_order_reads_load_collections_without_fan_out(
+    client: AsyncClient,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    await create_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+
+    with count_queries() as counts:
+        rsp = await client.get("/order/")
+    assert rsp.status_code == status.HTTP_200_OK
+    # order + payment + customer, then one IN query each for items and shipping
+    # (shipping details are written by a queued task, so there are none here)
+    assert (counts.statements, counts.rows) == (3, 2)
+
+    with count_queries() as counts:
+        rsp = await client.get("/order/vendor/")
+    assert rsp.status_code == status.HTTP_200_OK
+    assert (counts.statements, counts.rows) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_order_shipped_when_all_items_shipped(
+    client: AsyncClient,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    await create_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    [order] = (await client.get("/order/")).json()
+    assert order["status"] == "processing"
+
+    for item in order["order_items"]:
+        rsp = await client.put(
+            f"/order/order-items/{item['id']}/status", json={"status": "shipped"}
+        )
+        assert rsp.status_code == status.HTTP_200_OK
+
+    [order] = (await client.get("/order/")).json()
+    assert order["status"] == "shipped"
+
+
+@pytest.mark.asyncio
+async def test_vendor_dashboard_reads_sales_rollup(
+    client: AsyncClient,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    await create_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    [order] = (await client.get("/order/")).json()
+    [item] = order["order_items"]
+
+    rsp = await client.get("/order/vendor/activity")
+    assert rsp.json() == {
+        "total_sales": item["price"] * item["quantity"],
+        "total_orders": 1,
+    }
+
+    await client.put(
+        f"/order/order-items/{item['id']}/status", json={"status": "refunded"}
+    )
+    rsp = await client.get("/order/vendor/activity")
+    assert rsp.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.asyncio
+async def test_vendor_sales_analytics_by_product(
+    client: AsyncClient,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    await create_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    [order] = (await client.get("/order/")).json()
+    [item] = order["order_items"]
+    with engine.begin() as conn:
+        conn.execute(update(PaymentDetails).values(status=StatusEnum.SUCCESS.value))
+
+    mock_analytics_cache.reset_mock()
+    rsp = await client.get(
+        "/order/vendor/analytics", params={"granularity": "hour", "breakdown": "product"}
+    )
+
+    assert rsp.status_code == status.HTTP_200_OK
+    [point] = rsp.json()["points"]
+    assert point["group_id"] == item["product_id"]
+    assert point["units"] == item["quantity"]
+    assert point["sales"] == item["price"] * item["quantity"]
+    assert point["orders"] == 1
+    mock_analytics_cache.set.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_vendor_sales_analytics_range_too_long(
+    client: AsyncClient,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    rsp = await client.get(
+        "/order/vendor/analytics",
+        params={"granularity": "hour", "start": "2020-01-01T00:00:00"},
+    )
+    assert rsp.status_code == status.HTTP_403_FORBIDDEN
@@ -1,3 +1,4 @@
+import json
 import random
 from httpx import AsyncClient
 import pytest
@@ -6,6 +7,8 @@ from fastapi import status
 from schemas.product import ProductReturn
 from tests.conftest import get_current_verified_role_override_dependency
 from tests.endpoints.test_vendor import create_vendor
+from tests.mock_dependencies import mock_catalog_cache
+from tests.sample_datas.testdb import count_queries
 from tests.sample_datas.samples import (
     sample_product_create,
     sample_product_create_second,
@@ -97,6 +100,47 @@ async def test_get_products_and_pagination_success(
     print(len(rsp.json()))
 
 
+@pytest.mark.parametrize(
+    "path", ["/products", "/products/price", "/products?search=gown"]
+)
+@pytest.mark.asyncio
+async def test_get_products_cursor_pagination(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    path,
+):
+    products = [sample_product_create() for _ in range(7)]
+    await create_product(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        sample_product_create_json=products,
+    )
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        rsp = await client.get(path, params=params)
+        assert rsp.status_code == status.HTTP_200_OK
+        seen += [product["id"] for product in rsp.json()]
+        cursor = rsp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert sorted(seen) == sorted(set(seen))
+    assert len(seen) == 7
+
+
+@pytest.mark.asyncio
+async def test_get_products_invalid_cursor(
+    client,
+    database_override_dependencies,
+):
+    rsp = await client.get("/products?cursor=not-a-cursor")
+
+    assert rsp.status_code == status.HTTP_400_BAD_REQUEST
+
+
 @pytest.mark.asyncio
 async def test_get_products_search(
     client,
@@ -117,6 +161,38 @@ async def test_get_products_search(
     rsp = await client.get("/products?search=iphone")
 
     assert rsp.status_code == status.HTTP_200_OK
+    assert [p["product_name"] for p in rsp.json()] == ["Iphone"]
+
+
+@pytest.mark.asyncio
+async def test_get_products_search_prefix_and_category(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    watch = sample_product_create()
+    watch["product_name"] = "Watch"
+    products = [
+        watch,
+        sample_product_create_second(),
+        sample_product_create_third(),
+    ]
+    await create_product(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        sample_product_create_json=products,
+    )
+    rsp = await client.get("/products?search=mac")
+    assert [p["product_name"] for p in rsp.json()] == ["Macbook"]
+
+    rsp = await client.get("/products?search=pets")
+    assert [p["product_name"] for p in rsp.json()] == ["Macbook"]
+
+    # Every product mentions a watch; the name hit outranks newer description hits
+    rsp = await client.get("/products?search=watch")
+    assert len(rsp.json()) == 3
+    assert rsp.json()[0]["product_name"] == "Watch"
 
 
 @pytest.mark.asyncio
@@ -194,6 +270,62 @@ async def test_get_products_by_id_success(
     assert rsp.status_code == status.HTTP_200_OK
 
 
+@pytest.mark.asyncio
+async def test_get_product_read_through_cache(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    mock_catalog_cache.reset_mock()
+    await create_product(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    mock_catalog_cache.invalidate.assert_awaited()
+
+    rsp = await client.get("/products/1")
+    assert rsp.status_code == status.HTTP_200_OK
+    mock_catalog_cache.set.assert_awaited_once()
+    payload = mock_catalog_cache.set.await_args.args[1]
+
+    mock_catalog_cache.get.return_value = json.loads(payload)
+    try:
+        cached_rsp = await client.get("/products/1")
+    finally:
+        mock_catalog_cache.get.return_value = None
+
+    assert cached_rsp.json() == rsp.json()
+    mock_catalog_cache.set.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_product_loads_collections_without_fan_out(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    product = sample_product_create()
+    product["product_images"] = [f"http://www.test.org/image{i}" for i in range(3)]
+    await create_product(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        sample_product_create_json=[product],
+    )
+    for _ in range(2):
+        await client.post("/products/add-review", json=sample_product_review_create())
+
+    with count_queries() as counts:
+        rsp = await client.get("/products/1")
+
+    assert rsp.status_code == status.HTTP_200_OK
+    assert len(rsp.json()["product_images"]) == 3
+    assert rsp.json()["rating_count"] == 2
+    # product + category + vendor, then one IN query for the images
+    assert (counts.statements, counts.rows) == (2, 1 + 3)
+
+
 @pytest.mark.asyncio
 async def test_get_products_by_invalid_id(
     client,
@@ -343,6 +475,54 @@ async def test_update_product_review_success(
     assert rsp.status_code == status.HTTP_201_CREATED
 
 
+@pytest.mark.asyncio
+async def test_review_rating_summary_kept_in_step(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    await create_product(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    for _ in range(2):
+        await client.post("/products/add-review", json=sample_product_review_create())
+    rsp = await client.put("/products/edit-review/2", json={"rating": 4.5})
+    assert rsp.status_code == status.HTTP_201_CREATED
+
+    product = (await client.get("/products/1")).json()
+    assert (product["rating_avg"], product["rating_count"]) == (3.0, 2)
+    assert (product["vendor"]["rating_avg"], product["vendor"]["rating_count"]) == (
+        3.0,
+        2,
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_product_reviews_paginated(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    await create_product(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    for _ in range(3):
+        await client.post("/products/add-review", json=sample_product_review_create())
+
+    rsp = await client.get("/products/1/reviews", params={"limit": 2})
+    assert rsp.status_code == status.HTTP_200_OK
+    assert [review["id"] for review in rsp.json()] == [3, 2]
+
+    rsp = await client.get(
+        "/products/1/reviews", params={"limit": 2, "cursor": rsp.headers["X-Next-Cursor"]}
+    )
+    assert [review["id"] for review in rsp.json()] == [1]
+
+
 @pytest.mark.asyncio
 async def test_update_product_review_nonexistent_review_id(
     client,
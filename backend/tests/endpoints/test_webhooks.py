@@ -0,0 +1,459 @@
+import hashlib
+import hmac
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import status
+
+from core import settings
+from core.payment_provider import PaymentProvider
+from core.paystack import PaystackClient
+from core.stripe_payment import StripeClient
+from crud import (
+    CRUDAuthUser,
+    CRUDCart,
+    CRUDCustomer,
+    CRUDOrder,
+    CRUDOrderItem,
+    CRUDPaymentDetails,
+    CRUDProduct,
+    CRUDVendor,
+)
+from models import (
+    AuthUser,
+    Cart,
+    Customer,
+    Order,
+    OrderItem,
+    PaymentDetails,
+    Product,
+    Vendor,
+)
+from schemas import ProviderPayment
+from schemas.base import StatusEnum
+from services.cart_service import CartService
+from utils.timing import PhaseTimer
+from tests.endpoints.test_cart import create_add_to_cart
+from tests.mock_dependencies import mock_queue_connection
+from tests.sample_datas.samples import sample_checkout_data
+from tests.sample_datas.testdb import TestingSessionLocal
+
+
+async def create_online_order(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    payment_method: str,
+    payment_ref: str = None,
+) -> dict:
+    await create_add_to_cart(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+    )
+    checkout_data = sample_checkout_data()
+    checkout_data["payment_details"]["payment_method"] = payment_method
+    with patch.object(
+        PaystackClient,
+        "initialize_payment",
+        AsyncMock(return_value={"payment_ref": payment_ref}),
+    ), patch.object(
+        StripeClient,
+        "create_checkout_session",
+        AsyncMock(return_value={"payment_ref": payment_ref}),
+    ):
+        rsp = await client.post("/cart/checkout", json=checkout_data)
+    assert rsp.status_code == status.HTTP_200_OK
+    return rsp.json()
+
+
+def cart_service_for(db, payment_providers: dict) -> CartService:
+    return CartService(
+        crud_auth_user=CRUDAuthUser(model=AuthUser, db=db),
+        crud_product=CRUDProduct(model=Product, db=db),
+        crud_cart=CRUDCart(model=Cart, db=db),
+        queue_connection=mock_queue_connection,
+        crud_customer=CRUDCustomer(model=Customer, db=db),
+        crud_order=CRUDOrder(model=Order, db=db),
+        crud_payment=CRUDPaymentDetails(model=PaymentDetails, db=db),
+        crud_order_item=CRUDOrderItem(model=OrderItem, db=db),
+        crud_vendor=CRUDVendor(model=Vendor, db=db),
+        payment_providers=payment_providers,
+    )
+
+
+def confirmation_emails() -> list:
+    return [
+        call
+        for call in mock_queue_connection.enqueue_job.await_args_list
+        if call.args[0] == "send_order_confirmation_email"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_paystack_charge_success_webhook(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    monkeypatch,
+):
+    monkeypatch.setattr(settings.paystack_config, "SECRET_KEY", "sk_test")
+    order = await create_online_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        "card",
+    )
+    payload = json.dumps(
+        {
+            "event": "charge.success",
+            "data": {
+                "status": "success",
+                "reference": "ref-1",
+                "amount": 1000000,
+                "channel": "card",
+                "paid_at": "2024-01-01T10:00:00Z",
+                "metadata": {"order_id": order["order_id"]},
+                "customer": {"email": "customer@test.org"},
+            },
+        }
+    ).encode()
+    signature = hmac.new(b"sk_test", payload, hashlib.sha512).hexdigest()
+    mock_queue_connection.enqueue_job.reset_mock()
+
+    rsp = await client.post(
+        "/webhooks/paystack", content=payload, headers={"x-paystack-signature": "bad"}
+    )
+    assert rsp.status_code == status.HTTP_403_FORBIDDEN
+
+    # Redelivered events confirm the order once
+    for _ in range(2):
+        rsp = await client.post(
+            "/webhooks/paystack",
+            content=payload,
+            headers={"x-paystack-signature": signature},
+        )
+        assert rsp.status_code == status.HTTP_200_OK
+    with TestingSessionLocal() as db:
+        assert db.query(PaymentDetails).filter_by(payment_ref="ref-1").count() == 1
+    assert len(confirmation_emails()) == 1
+
+    # The verify poll is answered from the recorded payment
+    with patch.object(PaystackClient, "verify_payment", AsyncMock()) as verify:
+        rsp = await client.get("/cart/verify-payment/ref-1")
+    verify.assert_not_awaited()
+    assert rsp.status_code == status.HTTP_200_OK
+    assert rsp.json() == {
+        "payment_verified": True,
+        "order_id": order["order_id"],
+        "pickup_code": order["pickup_code"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_paystack_webhook_with_unlisted_channel(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    monkeypatch,
+):
+    monkeypatch.setattr(settings.paystack_config, "SECRET_KEY", "sk_test")
+    order = await create_online_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        "bank_transfer",
+        payment_ref="ref-1",
+    )
+    payload = json.dumps(
+        {
+            "event": "charge.success",
+            "data": {
+                "status": "success",
+                "reference": "ref-1",
+                "amount": 1000000,
+                "channel": "ussd",
+                "metadata": {"order_id": order["order_id"]},
+            },
+        }
+    ).encode()
+    signature = hmac.new(b"sk_test", payload, hashlib.sha512).hexdigest()
+
+    rsp = await client.post(
+        "/webhooks/paystack",
+        content=payload,
+        headers={"x-paystack-signature": signature},
+    )
+
+    assert rsp.status_code == status.HTTP_200_OK
+    with TestingSessionLocal() as db:
+        payment = db.get(Order, order["order_id"]).payment_details
+        assert payment.status == StatusEnum.SUCCESS.value
+        # The method chosen at checkout is kept
+        assert payment.payment_method == "bank_transfer"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("amount, currency", [(100, "NGN"), (1000000, "USD")])
+async def test_webhook_not_matching_order_total_is_rejected(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    monkeypatch,
+    amount,
+    currency,
+):
+    monkeypatch.setattr(settings.paystack_config, "SECRET_KEY", "sk_test")
+    order = await create_online_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        "card",
+        payment_ref="ref-1",
+    )
+    payload = json.dumps(
+        {
+            "event": "charge.success",
+            "data": {
+                "status": "success",
+                "reference": "ref-1",
+                "amount": amount,
+                "currency": currency,
+                "channel": "card",
+                "metadata": {"order_id": order["order_id"]},
+            },
+        }
+    ).encode()
+    signature = hmac.new(b"sk_test", payload, hashlib.sha512).hexdigest()
+    mock_queue_connection.enqueue_job.reset_mock()
+
+    rsp = await client.post(
+        "/webhooks/paystack",
+        content=payload,
+        headers={"x-paystack-signature": signature},
+    )
+
+    assert rsp.status_code == status.HTTP_200_OK
+    with TestingSessionLocal() as db:
+        payment = db.get(Order, order["order_id"]).payment_details
+        assert payment.status == StatusEnum.PENDING.value
+    assert confirmation_emails() == []
+
+
+@pytest.mark.asyncio
+async def test_stripe_checkout_completed_webhook(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, "STRIPE_WEBHOOK_SECRET", "whsec_test")
+    order = await create_online_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        "stripe",
+    )
+    payload = json.dumps(
+        {
+            "type": "checkout.session.completed",
+            "created": 1704103200,
+            "data": {
+                "object": {
+                    "id": "cs_test_1",
+                    "payment_status": "paid",
+                    "amount_total": 1000000,
+                    "metadata": {"order_id": str(order["order_id"])},
+                }
+            },
+        }
+    ).encode()
+
+    def sign(timestamp: int) -> str:
+        signed = f"{timestamp}.".encode() + payload
+        digest = hmac.new(b"whsec_test", signed, hashlib.sha256).hexdigest()
+        return f"t={timestamp},v1={digest}"
+
+    rsp = await client.post(
+        "/webhooks/stripe",
+        content=payload,
+        headers={"stripe-signature": sign(int(time.time()) - 3600)},
+    )
+    assert rsp.status_code == status.HTTP_403_FORBIDDEN
+
+    rsp = await client.post(
+        "/webhooks/stripe",
+        content=payload,
+        headers={"stripe-signature": sign(int(time.time()))},
+    )
+    assert rsp.status_code == status.HTTP_200_OK
+
+    with patch.object(StripeClient, "verify_payment", AsyncMock()) as verify:
+        rsp = await client.get("/stripe/verify/cs_test_1")
+    verify.assert_not_awaited()
+    assert rsp.json()["order_id"] == order["order_id"]
+
+
+@pytest.mark.asyncio
+async def test_failed_verify_keeps_paid_order(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+):
+    order = await create_online_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        "card",
+        payment_ref="ref-new",
+    )
+
+    def reported(payment_status: StatusEnum, ref: str) -> AsyncMock:
+        return AsyncMock(
+            return_value=ProviderPayment(
+                status=payment_status,
+                order_id=order["order_id"],
+                payment_ref=ref,
+                payment_method="card",
+                amount=10000,
+            )
+        )
+
+    with patch.object(
+        PaystackClient, "verify_payment", reported(StatusEnum.SUCCESS, "ref-new")
+    ):
+        rsp = await client.get("/cart/verify-payment/ref-new")
+    assert rsp.status_code == status.HTTP_200_OK
+
+    # A poll with an earlier, failed reference must not cancel the paid order
+    with patch.object(
+        PaystackClient, "verify_payment", reported(StatusEnum.FAILED, "ref-old")
+    ):
+        rsp = await client.get("/cart/verify-payment/ref-old")
+    assert rsp.status_code == status.HTTP_403_FORBIDDEN
+    with TestingSessionLocal() as db:
+        assert db.get(Order, order["order_id"]) is not None
+        assert db.get(Product, 1).stock == 195
+
+
+@pytest.mark.asyncio
+async def test_reconcile_pending_payments(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    monkeypatch,
+):
+    paid = await create_online_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        "card",
+        payment_ref="ref-paid",
+    )
+    await client.post("/cart/add", json={"product_id": 1, "quantity": 5})
+    checkout_data = sample_checkout_data()
+    checkout_data["payment_details"]["payment_method"] = "card"
+    with patch.object(
+        PaystackClient,
+        "initialize_payment",
+        AsyncMock(return_value={"payment_ref": "ref-abandoned"}),
+    ):
+        abandoned = (await client.post("/cart/checkout", json=checkout_data)).json()
+    assert (await client.get("/products/1")).json()["stock"] == 190
+
+    provider = MagicMock(spec=PaymentProvider)
+    provider.currency = "NGN"
+    provider.verify_payment = AsyncMock(
+        side_effect=lambda ref: ProviderPayment(
+            status=StatusEnum.SUCCESS if ref == "ref-paid" else StatusEnum.ABADONED,
+            payment_ref=ref,
+            payment_method="card",
+            amount=10000,
+        )
+    )
+    # Everything created so far counts as stale
+    monkeypatch.setattr(settings, "PAYMENT_RECONCILE_AFTER", -60)
+    with TestingSessionLocal() as db:
+        cart_service = cart_service_for(db, {"paystack": provider})
+        counts = await cart_service.reconcile_pending_payments(PhaseTimer())
+
+        assert counts == {
+            "checked": 2,
+            "confirmed": 1,
+            "waiting": 0,
+            "mismatched": 0,
+            "errors": 0,
+            "expired": 1,
+            "released_products": 1,
+        }
+        assert db.get(Order, abandoned["order_id"]) is None
+        payment = db.get(Order, paid["order_id"]).payment_details
+        assert payment.status == StatusEnum.SUCCESS.value
+        assert db.get(Product, 1).stock == 195
+
+        # Settled payments are no longer pending
+        assert await cart_service.reconcile_pending_payments(PhaseTimer()) == {
+            "checked": 0,
+            "confirmed": 0,
+            "waiting": 0,
+            "mismatched": 0,
+            "errors": 0,
+            "expired": 0,
+            "released_products": 0,
+        }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("paid_meanwhile", [False, True])
+async def test_reconcile_expires_open_stripe_session(
+    client,
+    database_override_dependencies,
+    get_current_verified_role_override_dependency,
+    monkeypatch,
+    paid_meanwhile,
+):
+    order = await create_online_order(
+        client,
+        database_override_dependencies,
+        get_current_verified_role_override_dependency,
+        "stripe",
+        payment_ref="cs_open",
+    )
+    session = {
+        "id": "cs_open",
+        "status": "open",
+        "payment_status": "unpaid",
+        "amount_total": 1000000,
+        "metadata": {"order_id": str(order["order_id"])},
+    }
+    calls = []
+
+    async def stripe_api(method, url, **kwargs):
+        calls.append((method, url))
+        if method == "GET":
+            return session
+        if paid_meanwhile:
+            raise ValueError("Only open sessions can be expired")
+        return {**session, "status": "expired"}
+
+    stripe = StripeClient(client=None)
+    monkeypatch.setattr(stripe, "_request", stripe_api)
+    # Still open, so not abandoned: only expired once it is stale
+    assert (await stripe.verify_payment("cs_open")).status == StatusEnum.PENDING
+
+    monkeypatch.setattr(settings, "PAYMENT_RECONCILE_AFTER", -60)
+    with TestingSessionLocal() as db:
+        counts = await cart_service_for(
+            db, {"stripe": stripe}
+        ).reconcile_pending_payments(PhaseTimer())
+
+        assert ("POST", "checkout/sessions/cs_open/expire") in calls
+        if paid_meanwhile:
+            # Left for the next run, which finds the session paid
+            assert counts["errors"] == 1
+            assert db.get(Order, order["order_id"]) is not None
+        else:
+            assert counts["expired"] == 1
+            assert db.get(Order, order["order_id"]) is None
@@ -2,6 +2,8 @@ from unittest.mock import MagicMock
 
 from arq import ArqRedis
 
+from core.cache import AnalyticsCache, CatalogCache, PrincipalCache
+from core.revocation import TokenRevocationList
 from crud import CRUDAuthUser, CRUDCustomer, CRUDProductImage, CRUDOtp
 
 
@@ -10,3 +12,11 @@ mock_crud_customer = MagicMock(spec=CRUDCustomer)
 mock_queue_connection = MagicMock(spec=ArqRedis)
 mock_crud_product_image = MagicMock(spec=CRUDProductImage)
 mock_crud_otp = MagicMock(spec=CRUDOtp)
+mock_catalog_cache = MagicMock(spec=CatalogCache)
+mock_catalog_cache.get.return_value = None
+mock_token_revocation_list = MagicMock(spec=TokenRevocationList)
+mock_token_revocation_list.is_revoked.return_value = False
+mock_principal_cache = MagicMock(spec=PrincipalCache)
+mock_principal_cache.get.return_value = None
+mock_analytics_cache = MagicMock(spec=AnalyticsCache)
+mock_analytics_cache.get.return_value = None
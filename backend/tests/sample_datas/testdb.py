@@ -1,11 +1,24 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from core import settings
 
 
 engine = create_engine(url=str(settings.TEST_SQLALCHEMY_DATABASE_URL))
 TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# NullPool: every test runs on its own event loop, so connections must not be reused
+async_engine = create_async_engine(
+    url=engine.url.set(drivername="postgresql+asyncpg"), poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def mock_get_db():
     db = TestingSessionLocal()
@@ -13,3 +26,26 @@ def mock_get_db():
         yield db
     finally:
         db.close()
+
+
+async def mock_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+@contextmanager
+def count_queries():
+    """Count the statements run on the async test engine and the rows they return."""
+    counts = SimpleNamespace(statements=0, rows=0)
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counts.statements += 1
+        counts.rows += max(cursor.rowcount, 0)
+
+    event.listen(async_engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    try:
+        yield counts
+    finally:
+        event.remove(
+            async_engine.sync_engine, "after_cursor_execute", after_cursor_execute
+        )
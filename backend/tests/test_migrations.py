@@ -0,0 +1,57 @@
+import pytest
+from alembic import command
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+
+from core.db import Base
+from core.migrations import BASELINE_REVISION, _alembic_config, run_migrations
+from tests.sample_datas.testdb import engine
+
+
+def _reset_schema(connection):
+    Base.metadata.drop_all(bind=connection)
+    connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+
+@pytest.fixture
+def baseline_schema():
+    """The schema create_all built before the app migrated at startup.
+
+    The models at head, downgraded to BASELINE_REVISION, without the
+    alembic_version table.
+    """
+    with engine.connect() as connection:
+        _reset_schema(connection)
+        config = _alembic_config(connection)
+        Base.metadata.create_all(bind=connection)
+        command.stamp(config, "head")
+        command.downgrade(config, BASELINE_REVISION)
+        connection.execute(text("DROP TABLE alembic_version"))
+        connection.commit()
+    yield
+    with engine.connect() as connection:
+        _reset_schema(connection)
+        connection.commit()
+
+
+def test_run_migrations_upgrades_schema_without_alembic_version(baseline_schema):
+    with engine.connect() as connection:
+        available = connection.execute(
+            text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        ).first()
+    if not available:
+        pytest.skip("the product search migration needs the pg_trgm extension")
+
+    run_migrations(engine)
+
+    inspector = inspect(engine)
+    product_columns = {column["name"] for column in inspector.get_columns("products")}
+    order_columns = {column["name"] for column in inspector.get_columns("orders")}
+    assert {"search_vector", "rating_avg", "rating_count"} <= product_columns
+    assert "stock_status" in order_columns
+    with engine.connect() as connection:
+        head = ScriptDirectory.from_config(_alembic_config(connection)).get_current_head()
+        version = connection.execute(
+            text("SELECT version_num FROM alembic_version")
+        ).scalar_one()
+    assert version == head
@@ -0,0 +1,26 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from arq import ArqRedis
+from redis.asyncio import BlockingConnectionPool
+
+from core import settings
+from task_queue.main import close_queue_pool, create_queue_pool
+
+
+@pytest.mark.asyncio
+async def test_queue_pool_waits_for_connections_and_health_checks_them():
+    with patch.object(ArqRedis, "ping", AsyncMock()):
+        pool = await create_queue_pool()
+    try:
+        connection_pool = pool.connection_pool
+        assert isinstance(connection_pool, BlockingConnectionPool)
+        assert connection_pool.max_connections == settings.REDIS_MAX_CONNECTIONS
+        assert connection_pool.timeout == settings.REDIS_POOL_TIMEOUT
+        # Set before any connection is made, so the first one gets it too
+        assert (
+            connection_pool.connection_kwargs["health_check_interval"]
+            == settings.REDIS_HEALTH_CHECK_INTERVAL
+        )
+    finally:
+        await close_queue_pool(pool)
@@ -1,8 +1,7 @@
 from typing import Optional
 
-from httpx import AsyncClient
-
 from core import settings
+from core.http import http_clients
 
 
 async def send_postmark_email(
@@ -23,8 +22,6 @@ async def send_postmark_email(
     if html_body:
         payload["HtmlBody"] = html_body
 
-    headers = {"X-Postmark-Server-Token": settings.POSTMARK_SERVER_TOKEN}
-
-    async with AsyncClient(base_url="https://api.postmarkapp.com") as client:
-        await client.post("/email", json=payload, headers=headers)
+    rsp = await http_clients.get("postmark").post("/email", json=payload)
+    rsp.raise_for_status()
 
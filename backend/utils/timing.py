@@ -0,0 +1,18 @@
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict
+
+
+class PhaseTimer:
+    """Collects wall-clock durations of named phases, in milliseconds."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((perf_counter() - start) * 1000, 2)
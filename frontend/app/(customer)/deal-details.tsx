@@ -82,9 +82,8 @@ export default function DealDetailsScreen() {
   };
 
   const getAverageRating = (): string => {
-    if (product?.reviews && product.reviews.length > 0) {
-      const avg = product.reviews.reduce((sum, r) => sum + r.rating, 0) / product.reviews.length;
-      return avg.toFixed(1);
+    if (product && product.rating_count > 0) {
+      return product.rating_avg.toFixed(1);
     }
     return '4.0';
   };
@@ -100,9 +100,7 @@ export default function HomeScreen() {
         <View style={[styles.ratingBadge, isHotDeal && styles.hotRatingBadge]}>
           <Ionicons name="star" size={12} color={isHotDeal ? Colors.white : Colors.star} />
           <Text style={[styles.ratingText, isHotDeal && styles.hotRatingText]}>
-            {product.reviews && product.reviews.length > 0 
-              ? (product.reviews.reduce((sum, r) => sum + r.rating, 0) / product.reviews.length).toFixed(1)
-              : '4.0'}
+            {product.rating_count > 0 ? product.rating_avg.toFixed(1) : '4.0'}
           </Text>
         </View>
         {product.stock <= 5 && (
@@ -196,7 +196,8 @@ export interface Product {
   product_status: boolean;
   stock: number;
   price: number; // in cents
-  reviews?: ProductReview[];
+  rating_avg: number;
+  rating_count: number;
   created_timestamp: string | null;
   updated_timestamp: string | null;
   pickup_time: string | null;
@@ -467,6 +468,22 @@ async function apiFetch(url: string, options?: RequestInit): Promise<Response> {
   }
 }
 
+// Fetch every page of a cursor-paginated listing. The backend returns plain
+// arrays and puts the next page's cursor in the X-Next-Cursor header.
+async function fetchAllPages<T>(url: string, options?: RequestInit): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const pageUrl: string = cursor
+      ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}`
+      : url;
+    const response = await apiFetch(pageUrl, options);
+    items.push(...(await handleResponse<T[]>(response, pageUrl)));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return items;
+}
+
 // Store tokens after login/register
 async function storeTokens(tokens: Tokens): Promise<void> {
   await AsyncStorage.setItem(ACCESS_TOKEN_KEY, tokens.access_token);
@@ -1162,16 +1179,13 @@ export const ordersApi = {
   // Get all orders for current user
   async getAllOrders(): Promise<Order[]> {
     const authHeader = await getAuthHeader();
-    const url = '/order/';
-
-    const response = await apiFetch(url, {
+    return fetchAllPages<Order>('/order/?limit=100', {
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
         ...authHeader,
       },
     });
-    return handleResponse<Order[]>(response, url);
   },
 
   // Get vendor dashboard stats
@@ -1209,14 +1223,13 @@ export const ordersApi = {
   // Get vendor's order items
   async getVendorOrders(): Promise<VendorOrderItem[]> {
     const authHeader = await getAuthHeader();
-    const response = await fetch(`${API_BASE_URL}/order/vendor/`, {
+    return fetchAllPages<VendorOrderItem>('/order/vendor/?limit=100', {
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
         ...authHeader,
       },
     });
-    return handleResponse<VendorOrderItem[]>(response);
   },
 
   // Update order item status